@@ -10,4 +10,8 @@ class AgentContext:
     summary: Dict[str, Any] = field(default_factory=dict)
     plots: List[str] = field(default_factory=list)
     insights: List[str] = field(default_factory=list)
-    report_path: str | None = None
\ No newline at end of file
+    report_path: str | None = None
+    report_files: Dict[str, str] = field(default_factory=dict)  # format ("md", "html", "json") -> path
+    profile: Any = None  # utils.streaming_stats.DatasetProfile when loaded in chunks
+    stage_errors: Dict[str, str] = field(default_factory=dict)
+    metrics: List[Dict[str, Any]] = field(default_factory=list)
\ No newline at end of file
@@ -0,0 +1,95 @@
+import json
+import re
+
+import pandas as pd
+
+from .llm_client import generate_llm_response
+from .prompt_builder import compact_json
+from utils.query_engine import PLAN_GRAMMAR, CsvSource, QueryEngine
+
+
+class ChatAgent:
+    """Answers dataset questions exactly: the LLM writes a restricted query plan,
+    the plan runs locally over the full frame, and the LLM only phrases the
+    (small) result table."""
+
+    def __init__(self, engine: QueryEngine | None = None, max_example_values: int = 5):
+        self.engine = engine or QueryEngine()
+        self.max_example_values = max_example_values
+
+    def schema(self, df: pd.DataFrame, num_rows: int | None = None):
+        columns = {}
+        for col in df.columns:
+            entry = {"dtype": str(df[col].dtype)}
+            if not pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_datetime64_any_dtype(df[col]):
+                entry["examples"] = df[col].dropna().astype(str).value_counts().index[: self.max_example_values].tolist()
+            columns[str(col)] = entry
+        return {"num_rows": len(df) if num_rows is None else num_rows, "columns": columns}
+
+    def plan(self, df: pd.DataFrame, question: str, num_rows: int | None = None):
+        """Ask the LLM for a query plan; None when the question cannot be expressed as one."""
+        system_prompt = f"""
+You translate questions about a table into a JSON query plan. Reply with ONE JSON object only, no prose.
+
+Grammar (all keys optional):
+{PLAN_GRAMMAR}
+
+- aggregations without group_by give one overall row; group_by without aggregations counts rows.
+- select lists raw columns to show when there is no aggregation.
+- Use exact column names from the schema.
+- If the question cannot be answered with this grammar, reply {{"unsupported": true}}.
+"""
+        user_prompt = f"SCHEMA: {compact_json(self.schema(df, num_rows))}\n\nQUESTION: {question}"
+        text = generate_llm_response(system_prompt, user_prompt)
+
+        match = re.search(r"\{.*\}", text, flags=re.DOTALL)
+        if match is None:
+            return None
+        try:
+            plan = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(plan, dict) or plan.get("unsupported"):
+            return None
+        return plan
+
+    def ask(self, df: pd.DataFrame, question: str, dataset_hash: str, on_chunk=None,
+            source: CsvSource | None = None, num_rows: int | None = None):
+        """Returns {"answer", "plan", "result", "error"}; falls back to schema + sample rows
+        when no valid plan can be produced.
+
+        In large-file mode df is only a sample: pass the full CSV as source (and
+        its row count as num_rows) so plans still run over every row.
+        """
+        plan, result, error = self.plan(df, question, num_rows), None, None
+        if plan is not None:
+            try:
+                plan, result = self.engine.run(df, plan, dataset_hash, source=source)
+            except (ValueError, TypeError, KeyError) as e:
+                plan, error = None, str(e)
+
+        if result is not None:
+            system_prompt = (
+                "You are a data analyst AI. The RESULT table was computed exactly over the full "
+                "dataset with the given query plan. Answer the question from it in concise "
+                "markdown; do not invent numbers that are not in the table."
+            )
+            user_prompt = (
+                f"QUESTION: {question}\n\n"
+                f"QUERY PLAN: {compact_json(plan)}\n\n"
+                f"RESULT ({len(result)} rows, CSV):\n{result.to_csv(index=False)}"
+            )
+        else:
+            system_prompt = (
+                "You are a data analyst AI. Answer questions based strictly "
+                "using the provided schema and sample data. Say so when the "
+                "sample is not enough to answer exactly."
+            )
+            user_prompt = (
+                f"SCHEMA: {compact_json(self.schema(df, num_rows))}\n\n"
+                f"SAMPLE ROWS: {compact_json(df.head(5).to_dict(orient='records'))}\n\n"
+                f"QUESTION: {question}"
+            )
+
+        answer = generate_llm_response(system_prompt, user_prompt, on_chunk=on_chunk)
+        return {"answer": answer, "plan": plan, "result": result, "error": error}
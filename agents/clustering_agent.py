@@ -1,37 +1,126 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import calinski_harabasz_score, silhouette_score
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
 
 from . import AgentContext
+from .visualization_agent import new_figure
+from utils.render_cache import RenderCache
+from utils.streaming_stats import RowSampler
 
 class ClusteringAgent:
-    def __init__(self, plots_dir="plots"):
+    # Context fields used by the planner to build the stage graph
+    reads = ("df",)
+    writes = ("clustering",)
+
+    def __init__(self, plots_dir="plots", use_render_cache=True, render_cache_dir=None,
+                 k_range=(2, 10), selection_sample=10_000, silhouette_sample=5_000,
+                 workers=4, random_state=42, chunksize=None, scatter_per_cluster=2_000):
+        # K selection: candidates in k_range (inclusive) are fitted on a
+        # sample of the scaled data, concurrently, and scored by silhouette
+        self.k_range = k_range
+        self.selection_sample = selection_sample
+        self.silhouette_sample = silhouette_sample
+        self.workers = workers
+        self.random_state = random_state
+        # chunksize: cluster the CSV at context.dataset_path in chunks with
+        # memory independent of its row count (see run_streaming)
+        self.chunksize = chunksize
+        self.scatter_per_cluster = scatter_per_cluster
         self.plots_dir = plots_dir
         os.makedirs(self.plots_dir, exist_ok=True)
+        self.render_cache = (
+            RenderCache(render_cache_dir or os.path.join(plots_dir, "cache")) if use_render_cache else None
+        )
+
+    def score_k(self, sample, k):
+        model = MiniBatchKMeans(
+            n_clusters=k, random_state=self.random_state, n_init=3, batch_size=1024
+        ).fit(sample)
+        labels = model.labels_
+        if len(np.unique(labels)) < 2:
+            silhouette = calinski = float("nan")
+        else:
+            silhouette = silhouette_score(
+                sample, labels,
+                sample_size=min(self.silhouette_sample, len(sample)),
+                random_state=self.random_state,
+            )
+            calinski = calinski_harabasz_score(sample, labels)
+        scores = {
+            "k": k,
+            "silhouette": round(float(silhouette), 4),
+            "calinski_harabasz": round(float(calinski), 2),
+            "inertia": round(float(model.inertia_), 2),
+        }
+        return scores, model.cluster_centers_
+
+    def select_k(self, scaled):
+        """Sweep k on a sample of the scaled data; best silhouette wins (ties: Calinski-Harabasz).
+
+        Returns (k, centers of the winning candidate, score table).
+        """
+        rng = np.random.default_rng(self.random_state)
+        if len(scaled) > self.selection_sample:
+            sample = scaled[rng.choice(len(scaled), self.selection_sample, replace=False)]
+        else:
+            sample = scaled
+
+        low, high = self.k_range
+        candidates = [k for k in range(low, high + 1) if k < len(sample)]
+        if not candidates:
+            raise ValueError("Not enough rows to choose a number of clusters")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(lambda k: self.score_k(sample, k), candidates))
+
+        def rank(item):
+            scores = item[0]
+            return (np.nan_to_num(scores["silhouette"], nan=-1.0), np.nan_to_num(scores["calinski_harabasz"]))
+
+        best_scores, best_centers = max(results, key=rank)
+        table = {
+            "method": "silhouette",
+            "sample_rows": int(len(sample)),
+            "scores": [scores for scores, _ in results],
+        }
+        return best_scores["k"], best_centers, table
+
+    def draw_scatter(self, points: pd.DataFrame, plot_path):
+        fig, ax = new_figure((7, 5))
+        sns.scatterplot(data=points, x="PC1", y="PC2", hue="Cluster", palette="tab10", ax=ax)
+        ax.set_title("Clustering (PCA 2D Visualization)")
+        fig.savefig(plot_path, bbox_inches="tight")
+        if self.render_cache is not None:
+            self.render_cache.evict(keep=(plot_path,))
 
     def run(self, context: AgentContext, n_clusters=None) -> AgentContext:
+        if self.chunksize:
+            return self.run_streaming(context, n_clusters)
+        return self.run_in_memory(context, n_clusters)
+
+    def run_in_memory(self, context: AgentContext, n_clusters=None) -> AgentContext:
         df = context.df.select_dtypes(include="number").dropna()
 
         if df.shape[1] < 2:
             raise ValueError("Need at least 2 numeric columns for clustering")
 
-        # Auto-detect K if not provided
-        if n_clusters is None:
-            inertia_list = []
-            for k in range(2, 8):
-                km = KMeans(n_clusters=k, random_state=42).fit(df)
-                inertia_list.append((k, km.inertia_))
-            # choose elbow (minimum slope change)
-            n_clusters = sorted(inertia_list, key=lambda x: x[1])[0][0]
-
         scaler = StandardScaler()
         scaled = scaler.fit_transform(df)
 
-        km = KMeans(n_clusters=n_clusters, random_state=42)
+        # Auto-select K if not provided; the final fit starts from the winner's centers
+        k_selection = None
+        if n_clusters is None:
+            n_clusters, centers, k_selection = self.select_k(scaled)
+            km = KMeans(n_clusters=n_clusters, init=centers, n_init=1, random_state=self.random_state)
+        else:
+            km = KMeans(n_clusters=n_clusters, random_state=self.random_state)
         labels = km.fit_predict(scaled)
 
         df_clustered = df.copy()
@@ -40,24 +129,141 @@ class ClusteringAgent:
         # Store statistics
         cluster_stats = df_clustered.groupby("Cluster").mean().round(3)
 
-        # PCA for 2D plotting
-        pca = PCA(n_components=2)
-        pcs = pca.fit_transform(scaled)
-        df_clustered["PC1"] = pcs[:, 0]
-        df_clustered["PC2"] = pcs[:, 1]
+        # The scatter only depends on the data and K, so a cached image skips PCA + plotting
+        if self.render_cache is not None:
+            plot_path = self.render_cache.path("cluster_scatter.png", df, n_clusters=n_clusters)
+            cached = self.render_cache.hit(plot_path)
+        else:
+            plot_path = os.path.join(self.plots_dir, "cluster_scatter.png")
+            cached = False
 
-        # Plot cluster scatter
-        plt.figure(figsize=(7, 5))
-        sns.scatterplot(data=df_clustered, x="PC1", y="PC2", hue="Cluster", palette="tab10")
-        plt.title("Clustering (PCA 2D Visualization)")
-        plot_path = os.path.join(self.plots_dir, "cluster_scatter.png")
-        plt.savefig(plot_path, bbox_inches="tight")
-        plt.close()
+        if not cached:
+            # PCA for 2D plotting
+            pca = PCA(n_components=2)
+            pcs = pca.fit_transform(scaled)
+            df_clustered["PC1"] = pcs[:, 0]
+            df_clustered["PC2"] = pcs[:, 1]
+
+            # Plot cluster scatter
+            self.draw_scatter(df_clustered, plot_path)
 
         context.clustering = {
             "n_clusters": n_clusters,
             "cluster_stats": cluster_stats,
-            "plot_path": plot_path
+            "plot_path": plot_path,
+            "k_selection": k_selection,
         }
 
-        return context
\ No newline at end of file
+        return context
+
+    # =======================================================
+    # LARGE-DATA MODE
+    # =======================================================
+    def numeric_chunks(self, context: AgentContext, columns):
+        for chunk in pd.read_csv(context.dataset_path, chunksize=self.chunksize, usecols=columns):
+            chunk = chunk.apply(pd.to_numeric, errors="coerce").dropna()
+            if len(chunk):
+                yield chunk[columns]
+
+    def run_streaming(self, context: AgentContext, n_clusters=None) -> AgentContext:
+        """Cluster the CSV in three chunked passes with bounded memory.
+
+        1. running mean/variance for scaling, plus a row sample for K selection
+        2. MiniBatchKMeans.partial_fit and IncrementalPCA.partial_fit
+        3. labels -> per-cluster sums/counts and a per-cluster scatter sample
+        """
+        print(f"[ClusteringAgent] Clustering in chunks of {self.chunksize} rows...")
+        if context.profile is not None:
+            columns = [col for col in context.profile.columns if col in context.profile.numeric]
+        else:
+            columns = context.df.select_dtypes(include="number").columns.tolist()
+        if len(columns) < 2:
+            raise ValueError("Need at least 2 numeric columns for clustering")
+
+        # Pass 1 — scaling statistics and a uniform sample
+        scaler = StandardScaler()
+        sampler = RowSampler(size=self.selection_sample, seed=self.random_state)
+        for chunk in self.numeric_chunks(context, columns):
+            scaler.partial_fit(chunk.to_numpy(dtype=float))
+            sampler.update(chunk)
+        if sampler.frame is None:
+            raise ValueError("No complete numeric rows to cluster")
+
+        k_selection, centers = None, "k-means++"
+        if n_clusters is None:
+            n_clusters, centers, k_selection = self.select_k(
+                scaler.transform(sampler.frame.to_numpy(dtype=float))
+            )
+
+        # Pass 2 — centroids and 2D projection
+        km = MiniBatchKMeans(
+            n_clusters=n_clusters, init=centers, n_init=1, random_state=self.random_state,
+            batch_size=min(self.chunksize, 4096),
+        )
+        pca = IncrementalPCA(n_components=2)
+        pending = None
+        for chunk in self.numeric_chunks(context, columns):
+            scaled = scaler.transform(chunk.to_numpy(dtype=float))
+            # partial_fit needs at least n_clusters rows per call
+            if pending is not None:
+                scaled = np.vstack([pending, scaled])
+                pending = None
+            if len(scaled) < n_clusters:
+                pending = scaled
+                continue
+            km.partial_fit(scaled)
+            pca.partial_fit(scaled)
+        # Rows still pending after the last chunk
+        if pending is not None:
+            if hasattr(km, "cluster_centers_") or len(pending) >= n_clusters:
+                km.partial_fit(pending)
+            if len(pending) >= pca.n_components:
+                pca.partial_fit(pending)
+        if not hasattr(km, "cluster_centers_") or not hasattr(pca, "components_"):
+            # Too few complete rows to fit incrementally; they fit in memory anyway
+            print("[ClusteringAgent] Too few rows for chunked clustering, using the in-memory path.")
+            return self.run_in_memory(context, n_clusters)
+
+        # Pass 3 — labels, per-cluster sums and a stratified scatter sample
+        sums = np.zeros((n_clusters, len(columns)))
+        counts = np.zeros(n_clusters, dtype=np.int64)
+        samplers = [RowSampler(size=self.scatter_per_cluster, seed=self.random_state + c)
+                    for c in range(n_clusters)]
+        for chunk in self.numeric_chunks(context, columns):
+            values = chunk.to_numpy(dtype=float)
+            scaled = scaler.transform(values)
+            labels = km.predict(scaled)
+            np.add.at(sums, labels, values)
+            counts += np.bincount(labels, minlength=n_clusters)
+
+            pcs = pca.transform(scaled)
+            points = pd.DataFrame({"PC1": pcs[:, 0], "PC2": pcs[:, 1], "Cluster": labels})
+            for cluster, group in points.groupby("Cluster"):
+                samplers[cluster].update(group)
+
+        present = counts > 0
+        cluster_stats = pd.DataFrame(
+            sums[present] / counts[present, None], columns=columns,
+            index=pd.Index(np.flatnonzero(present), name="Cluster"),
+        ).round(3)
+        points = pd.concat([s.frame for s in samplers if s.frame is not None], ignore_index=True)
+
+        if self.render_cache is not None:
+            plot_path = self.render_cache.path("cluster_scatter.png", points, n_clusters=n_clusters)
+            cached = self.render_cache.hit(plot_path)
+        else:
+            plot_path = os.path.join(self.plots_dir, "cluster_scatter.png")
+            cached = False
+        if not cached:
+            self.draw_scatter(points, plot_path)
+
+        context.clustering = {
+            "n_clusters": n_clusters,
+            "cluster_stats": cluster_stats,
+            "plot_path": plot_path,
+            "k_selection": k_selection,
+            "cluster_sizes": dict(zip(np.flatnonzero(present).tolist(), counts[present].tolist())),
+            "rows_clustered": int(counts.sum()),
+        }
+        print(f"[ClusteringAgent] Clustered {int(counts.sum())} rows into {n_clusters} clusters.")
+        return context
@@ -3,6 +3,14 @@ from . import AgentContext
 import json
 
 class ClusteringInsightsAgent:
+    # Context fields used by the planner to build the stage graph
+    reads = ("clustering",)
+    writes = ("insights",)
+
+    def __init__(self, on_chunk=None):
+        # Optional callback receiving response chunks as they stream in
+        self.on_chunk = on_chunk
+
     def run(self, context: AgentContext):
         clustering = context.clustering
         if clustering is None:
@@ -20,10 +28,11 @@ You are an expert ML analyst. Analyze the clustering results:
 
         user_prompt = json.dumps({
             "n_clusters": clustering["n_clusters"],
-            "cluster_stats": clustering["cluster_stats"].to_dict()
+            "cluster_stats": clustering["cluster_stats"].to_dict(),
+            "k_selection": clustering.get("k_selection"),
         }, indent=2)
 
-        insights = generate_llm_response(system_prompt, user_prompt)
+        insights = generate_llm_response(system_prompt, user_prompt, on_chunk=self.on_chunk)
 
         context.insights.append("### 🤖 Clustering Insights\n" + insights)
         return context
\ No newline at end of file
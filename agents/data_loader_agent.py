@@ -1,11 +1,43 @@
+import os
 import pandas as pd
 from . import AgentContext
+from utils.dataset_cache import DatasetCache
+from utils.disk_cache import file_digest
+from utils.dtype_optimizer import optimize_dtypes
+from utils.streaming_stats import DatasetProfile
 
 
 class DataLoaderAgent:
+    # Context fields used by the planner to build the stage graph
+    reads = ("dataset_path",)
+    writes = ("df", "profile", "summary")
+
+    def __init__(
+        self,
+        chunksize: int | None = None,
+        sample_size: int = 50_000,
+        cache: DatasetCache | None = None,
+        optimize: bool = True,
+        state_path: str | None = None,
+    ):
+        # chunksize=None keeps the original in-memory load; otherwise the CSV is
+        # streamed and only a bounded row sample is kept in context.df.
+        # state_path makes streaming append-aware: the saved profile of earlier
+        # batches is loaded, updated with dataset_path's rows and saved back.
+        if state_path and not chunksize:
+            chunksize = 100_000
+        self.chunksize = chunksize
+        self.sample_size = sample_size
+        self.cache = cache
+        self.optimize = optimize
+        self.state_path = state_path
+
     def run(self, context: AgentContext) -> AgentContext:
+        if self.chunksize:
+            return self.run_streaming(context)
+
         print("[DataLoaderAgent] Loading dataset...")
-        df = pd.read_csv(context.dataset_path)
+        df = self.read_dataset(context)
 
         context.df = df
         context.summary["num_rows"] = df.shape[0]
@@ -15,4 +47,80 @@ class DataLoaderAgent:
         context.summary["missing_values"] = df.isna().sum().to_dict()
 
         print("[DataLoaderAgent] Dataset loaded with shape:", df.shape)
+        return context
+
+    def read_dataset(self, context: AgentContext) -> pd.DataFrame:
+        use_cache = self.cache is not None and self.cache.available
+        if use_cache:
+            key = self.cache.key(context.dataset_path, optimize=self.optimize)
+            cached = self.cache.load(key)
+            context.summary["cache_hit"] = cached is not None
+            if cached is not None:
+                df, metadata = cached
+                context.summary.update(metadata)
+                print(f"[DataLoaderAgent] Loaded parsed dataset from cache ({key[:12]}).")
+                return df
+
+        df = pd.read_csv(context.dataset_path)
+        df = self.optimize_frame(df, context)
+
+        if use_cache:
+            metadata = {}
+            if "dtype_optimization" in context.summary:
+                metadata["dtype_optimization"] = context.summary["dtype_optimization"]
+            self.cache.store(key, df, metadata=metadata)
+        return df
+
+    def optimize_frame(self, df: pd.DataFrame, context: AgentContext) -> pd.DataFrame:
+        if not self.optimize:
+            return df
+        df, report = optimize_dtypes(df)
+        context.summary["dtype_optimization"] = report
+        print(
+            "[DataLoaderAgent] Optimised dtypes: "
+            f"{report['memory_before'] / 1024:.1f} KB -> {report['memory_after'] / 1024:.1f} KB"
+        )
+        return df
+
+    def run_streaming(self, context: AgentContext) -> AgentContext:
+        print(f"[DataLoaderAgent] Streaming dataset in chunks of {self.chunksize} rows...")
+        if self.state_path and os.path.exists(self.state_path):
+            profile = DatasetProfile.load(self.state_path)
+            print(f"[DataLoaderAgent] Appending to saved profile of {profile.num_rows} rows.")
+        else:
+            profile = DatasetProfile(sample_size=self.sample_size)
+        previous_rows = profile.num_rows
+
+        # A batch already in the saved state (retry, double submit) is not merged twice
+        batch = file_digest(context.dataset_path) if self.state_path else None
+        if batch in profile.batches:
+            print(f"[DataLoaderAgent] Batch {context.dataset_path} was already merged; skipping it.")
+            context.summary["appended_rows"] = 0
+            context.summary["duplicate_batch"] = profile.batches[batch]
+        else:
+            for chunk in pd.read_csv(context.dataset_path, chunksize=self.chunksize):
+                profile.update(chunk)
+
+            if self.state_path:
+                profile.batches[batch] = {
+                    "path": context.dataset_path, "rows": profile.num_rows - previous_rows,
+                }
+                profile.save(self.state_path)
+                context.summary["appended_rows"] = profile.num_rows - previous_rows
+
+        context.profile = profile
+        context.df = profile.sample
+        if context.df is not None:
+            context.df = self.optimize_frame(context.df, context)
+        context.summary["num_rows"] = profile.num_rows
+        context.summary["num_columns"] = len(profile.columns)
+        context.summary["columns"] = list(profile.columns)
+        context.summary["dtypes"] = dict(profile.dtypes)
+        context.summary["missing_values"] = dict(profile.null_counts)
+        context.summary["sample_rows"] = 0 if context.df is None else len(context.df)
+
+        print(
+            "[DataLoaderAgent] Profiled", (profile.num_rows, len(profile.columns)),
+            "rows/columns; kept a sample of", context.summary["sample_rows"], "rows"
+        )
         return context
\ No newline at end of file
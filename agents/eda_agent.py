@@ -1,11 +1,19 @@
 import pandas as pd
 import numpy as np
 from . import AgentContext
+from utils.stats_kernel import categorical_counts, numeric_summary
 
 class EDAAgent:
+    # Context fields used by the planner to build the stage graph
+    reads = ("df", "profile", "summary")
+    writes = ("summary",)
+
     def run(self, context: AgentContext) -> AgentContext:
         print("[EDAAgent] Running detailed EDA...")
 
+        if context.profile is not None:
+            return self.run_from_profile(context)
+
         df = context.df
         
         # 1. Basic Information
@@ -22,79 +30,126 @@ class EDAAgent:
         context.summary["duplicate_rows"] = df.duplicated().sum()
 
         # 4. Missing Percentage
+        missing = df.isnull().sum()
         context.summary["missing_percentage"] = (
-            df.isna().mean().round(3) * 100
+            (missing / max(len(df), 1)).round(3) * 100
         ).to_dict()
 
-        # 5. Numeric Stats
+        # 5. Numeric Stats (one batched pass over all numeric columns)
         numeric_df = df.select_dtypes(include="number")
-        numeric_stats = {}
-
-        for col in numeric_df.columns:
-            numeric_stats[col] = {
-                "mean": float(numeric_df[col].mean()),
-                "median": float(numeric_df[col].median()),
-                "std": float(numeric_df[col].std()),
-                "min": float(numeric_df[col].min()),
-                "max": float(numeric_df[col].max()),
-                "skewness": float(numeric_df[col].skew()),
-                "kurtosis": float(numeric_df[col].kurt()),
-                "outliers": int(
-                    ((numeric_df[col] < (numeric_df[col].quantile(0.25) - 1.5 * (numeric_df[col].quantile(0.75) - numeric_df[col].quantile(0.25)))) |
-                     (numeric_df[col] > (numeric_df[col].quantile(0.75) + 1.5 * (numeric_df[col].quantile(0.75) - numeric_df[col].quantile(0.25)))))
-                    .sum()
-                ),
-            }
+        self.store_numeric_stats(context, numeric_summary(numeric_df))
 
-        context.summary["numeric_stats"] = numeric_stats
-
-        # 6. Categorical Stats
+        # 6. Categorical Stats (one value_counts per column)
         categorical_df = df.select_dtypes(include=["object", "category"])
-        cat_stats = {}
-
-        for col in categorical_df.columns:
-            cat_stats[col] = {
-                "unique_values": categorical_df[col].nunique(),
-                "top_categories": categorical_df[col].value_counts().head(5).to_dict(),
-            }
-
-        context.summary["categorical_stats"] = cat_stats
+        counts = categorical_counts(categorical_df)
+        self.store_categorical_stats(
+            context,
+            unique={col: len(vc) for col, vc in counts.items()},
+            top={col: vc.head(5) for col, vc in counts.items()},
+        )
 
         # 7. Correlation Analysis
         if len(numeric_df.columns) >= 2:
             corr = numeric_df.corr().round(3)
             context.summary["correlation"] = corr.to_dict()
 
-        # -----------------------------------------
-        # 8. NUMERIC TABLE (NEW)
-        # -----------------------------------------
-        if len(numeric_df.columns) > 0:
-            numeric_table = numeric_df.describe().transpose().reset_index()
-            numeric_table = numeric_table.rename(columns={"index": "Feature"})
+        # 10. Missing Values Table
+        self.store_missing_table(context, missing, len(df))
+
+        print("[EDAAgent] Detailed EDA completed.")
+        return context
+
+    def run_from_profile(self, context: AgentContext) -> AgentContext:
+        """Fill the summary from streamed accumulators instead of the full frame."""
+        profile = context.profile
+        n_rows = profile.num_rows
+
+        # 1. Basic Information
+        context.summary["shape"] = (n_rows, len(profile.columns))
+        context.summary["memory_usage"] = profile.memory_usage
+
+        # 2. Column Types Breakdown
+        dtypes = pd.Series(profile.dtypes)
+        context.summary["numeric_columns"] = list(profile.numeric)
+        context.summary["categorical_columns"] = list(profile.categorical)
+        context.summary["datetime_columns"] = dtypes[dtypes.str.startswith("datetime")].index.tolist()
+        context.summary["boolean_columns"] = dtypes[dtypes == "bool"].index.tolist()
+
+        # 3. Duplicate Rows (needs every row in memory, not tracked when streaming)
+        context.summary["duplicate_rows"] = None
+
+        # 4. Missing Percentage
+        missing = pd.Series(profile.null_counts, dtype="int64")
+        context.summary["missing_percentage"] = (
+            (missing / max(n_rows, 1)).round(3) * 100
+        ).to_dict()
+
+        # 5-6. Numeric + Categorical Stats
+        self.store_numeric_stats(context, profile.numeric_summary())
+        self.store_categorical_stats(
+            context,
+            unique={col: acc.unique_values for col, acc in profile.categorical.items()},
+            top={col: acc.top(5) for col, acc in profile.categorical.items()},
+        )
+
+        # 7. Correlation Analysis (pairwise co-moment sums)
+        if len(profile.numeric) >= 2:
+            corr = profile.co_moments.correlation().round(3)
+            context.summary["correlation"] = corr.to_dict()
+
+        # 10. Missing Values Table
+        self.store_missing_table(context, missing, n_rows)
+
+        print("[EDAAgent] Detailed EDA completed from streamed profile.")
+        return context
+
+    # -----------------------------------------
+    # Shared writers for numeric_stats / numeric_table,
+    # categorical_stats / categorical_table and missing_table
+    # -----------------------------------------
+    def store_numeric_stats(self, context: AgentContext, stats: pd.DataFrame):
+        numeric_stats = {}
+        for col, row in stats.iterrows():
+            numeric_stats[col] = {
+                "mean": float(row["mean"]),
+                "median": float(row["median"]),
+                "std": float(row["std"]),
+                "min": float(row["min"]),
+                "max": float(row["max"]),
+                "skewness": float(row["skewness"]),
+                "kurtosis": float(row["kurtosis"]),
+                "outliers": int(row["outliers"]),
+                "q1": float(row["q1"]),
+                "q3": float(row["q3"]),
+            }
+        context.summary["numeric_stats"] = numeric_stats
+
+        if len(stats) > 0:
+            numeric_table = stats[["count", "mean", "std", "min", "q1", "median", "q3", "max"]]
+            numeric_table = numeric_table.rename(columns={"q1": "25%", "median": "50%", "q3": "75%"})
+            numeric_table = numeric_table.rename_axis("Feature").reset_index()
             context.summary["numeric_table"] = numeric_table
 
-        # -----------------------------------------
-        # 9. CATEGORICAL TABLE (NEW)
-        # -----------------------------------------
-        if len(categorical_df.columns) > 0:
-            categorical_table = pd.DataFrame({
-                "Feature": categorical_df.columns,
-                "Unique Values": [categorical_df[col].nunique() for col in categorical_df.columns],
-                "Top Category": [categorical_df[col].value_counts().idxmax() if categorical_df[col].nunique() > 0 else None for col in categorical_df.columns],
-                "Top Count": [categorical_df[col].value_counts().max() if categorical_df[col].nunique() > 0 else None for col in categorical_df.columns],
+    def store_categorical_stats(self, context: AgentContext, unique: dict, top: dict):
+        context.summary["categorical_stats"] = {
+            col: {
+                "unique_values": unique[col],
+                "top_categories": top[col].to_dict(),
+            }
+            for col in unique
+        }
+
+        if unique:
+            context.summary["categorical_table"] = pd.DataFrame({
+                "Feature": list(unique),
+                "Unique Values": list(unique.values()),
+                "Top Category": [top[col].index[0] if len(top[col]) else None for col in unique],
+                "Top Count": [top[col].iloc[0] if len(top[col]) else None for col in unique],
             })
-            context.summary["categorical_table"] = categorical_table
 
-        # -----------------------------------------
-        # 10. MISSING VALUES TABLE (NEW)
-        # -----------------------------------------
-        missing = df.isnull().sum()
-        missing_table = pd.DataFrame({
+    def store_missing_table(self, context: AgentContext, missing: pd.Series, n_rows: int):
+        context.summary["missing_table"] = pd.DataFrame({
             "Feature": missing.index,
             "Missing Count": missing.values,
-            "Missing %": (missing.values / len(df) * 100).round(2)
-        })
-        context.summary["missing_table"] = missing_table
-
-        print("[EDAAgent] Detailed EDA completed.")
-        return context
\ No newline at end of file
+            "Missing %": (missing.values / max(n_rows, 1) * 100).round(2)
+        })
\ No newline at end of file
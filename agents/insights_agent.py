@@ -1,6 +1,10 @@
 from . import AgentContext
 
 class InsightsAgent:
+    # Context fields used by the planner to build the stage graph
+    reads = ("summary",)
+    writes = ("insights",)
+
     def run(self, context: AgentContext) -> AgentContext:
         print("[InsightsAgent] Generating structured insights...")
 
@@ -0,0 +1,154 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from . import AgentContext
+
+# LLM calls of the stage being measured. A context variable (not a
+# thread-local) so calls made via asyncio.to_thread / LLMClient.agenerate,
+# which copy the caller's context, are still attributed to the stage.
+_llm_calls: ContextVar[list | None] = ContextVar("llm_calls", default=None)
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+
+def process_cpu_seconds():
+    """CPU time of this process (all threads) plus its reaped child processes."""
+    total = time.process_time()
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        total += children.ru_utime + children.ru_stime
+    return total
+
+
+def record_llm_call(
+    prompt_chars, response_chars, latency, model=None, cached=False, first_chunk_latency=None
+):
+    """Called by the LLM client; attached to the stage being measured in this context."""
+    calls = _llm_calls.get()
+    if calls is not None:
+        call = {
+            "model": model,
+            "prompt_chars": prompt_chars,
+            "response_chars": response_chars,
+            "latency_seconds": round(latency, 4),
+            "cached": cached,
+        }
+        if first_chunk_latency is not None:
+            call["first_chunk_seconds"] = round(first_chunk_latency, 4)
+        calls.append(call)
+
+
+@contextmanager
+def measure(name: str, context: AgentContext, trace_memory: bool = False):
+    """Time one agent run and append its record to context.metrics.
+
+    cpu_seconds is process-wide: it covers every thread (e.g. the joblib
+    threads of a random forest) and child processes that exit during the
+    stage (e.g. the plot process pool), but with concurrent stages it also
+    includes the CPU of overlapping stages, and long-lived worker processes
+    (loky) are only counted once they exit. thread_cpu_seconds is the
+    stage's own thread only. tracemalloc and peak RSS are process-wide too,
+    so overlapping stages include each other's allocations.
+    """
+    df = context.df
+    record = {
+        "stage": name,
+        "started_at": time.time(),
+        "input_rows": None if df is None else int(df.shape[0]),
+        "input_columns": None if df is None else int(df.shape[1]),
+        "status": "ok",
+    }
+    if trace_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        mem_before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    token = _llm_calls.set([])
+    wall0, cpu0, thread0 = time.perf_counter(), process_cpu_seconds(), time.thread_time()
+    try:
+        yield record
+    except Exception as e:
+        record["status"] = f"failed: {type(e).__name__}"
+        raise
+    finally:
+        record["wall_seconds"] = round(time.perf_counter() - wall0, 4)
+        record["cpu_seconds"] = round(process_cpu_seconds() - cpu0, 4)
+        record["thread_cpu_seconds"] = round(time.thread_time() - thread0, 4)
+        record["peak_rss_bytes"] = peak_rss_bytes()
+        if trace_memory:
+            record["tracemalloc_peak_delta_bytes"] = tracemalloc.get_traced_memory()[1] - mem_before
+        record["llm_calls"] = _llm_calls.get()
+        _llm_calls.reset(token)
+        context.metrics.append(record)
+
+
+# =======================================================
+# EXPORTERS
+# =======================================================
+def write_json_atomic(payload, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def write_run_record(context: AgentContext, path: str, total_wall_seconds: float | None = None):
+    write_json_atomic({
+        "dataset_path": context.dataset_path,
+        "total_wall_seconds": total_wall_seconds,
+        "stage_errors": context.stage_errors,
+        "stages": context.metrics,
+    }, path)
+    return path
+
+
+def write_prometheus_textfile(context: AgentContext, path: str):
+    """Gauges in node_exporter textfile-collector format (written atomically)."""
+    series = {
+        "insightforge_stage_wall_seconds": ("Wall time per pipeline stage", "wall_seconds"),
+        "insightforge_stage_cpu_seconds": (
+            "Process CPU time (all threads, exited children) during each pipeline stage", "cpu_seconds"
+        ),
+        "insightforge_stage_thread_cpu_seconds": ("CPU time of each stage's own thread", "thread_cpu_seconds"),
+        "insightforge_stage_peak_rss_bytes": ("Process peak RSS after the stage", "peak_rss_bytes"),
+        "insightforge_stage_input_rows": ("Rows in the frame handed to the stage", "input_rows"),
+    }
+    lines = []
+    for metric, (help_text, key) in series.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for record in context.metrics:
+            if record.get(key) is not None:
+                lines.append(f'{metric}{{stage="{record["stage"]}"}} {record[key]}')
+
+    lines.append("# HELP insightforge_llm_latency_seconds Summed LLM latency per stage")
+    lines.append("# TYPE insightforge_llm_latency_seconds gauge")
+    for record in context.metrics:
+        latency = sum(call["latency_seconds"] for call in record["llm_calls"])
+        if record["llm_calls"]:
+            lines.append(f'insightforge_llm_latency_seconds{{stage="{record["stage"]}"}} {latency}')
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+    return path
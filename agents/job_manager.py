@@ -0,0 +1,150 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from . import AgentContext
+from .pipeline_graph import PipelineCancelled
+from utils.workspace import RunWorkspace, prune_workspaces
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+def run_pipeline_job(workspace_root: str, dataset_path: str, planner_kwargs: dict) -> AgentContext:
+    """Worker entry point (module-level so process pools can pickle it).
+
+    Progress and streamed LLM insights are written to the run workspace so the
+    submitting process can poll them; cancellation is read from it.
+    """
+    from .planner_agent import PlannerAgent
+
+    workspace = RunWorkspace(workspace_root)
+    stages = {}
+
+    def on_progress(name, status):
+        stages[name] = status
+        workspace.write_progress(stages)
+
+    def on_chunk(chunk):
+        with open(workspace.live_insights_path, "a", encoding="utf-8") as f:
+            f.write(chunk)
+
+    planner = PlannerAgent(workspace=workspace, llm_on_chunk=on_chunk, **planner_kwargs)
+    context = AgentContext(dataset_path=dataset_path)
+    return planner.run_pipeline(context, on_progress=on_progress, should_stop=workspace.cancel_requested)
+
+
+@dataclass
+class Job:
+    job_id: str
+    workspace: RunWorkspace
+    future: Future
+    submitted_at: float
+
+
+class JobManager:
+    """Bounded pool of pipeline runs, each in its own workspace.
+
+    At most max_workers runs execute at once and max_queued more may wait;
+    further submissions raise JobQueueFull so callers can push back instead
+    of piling work onto the server. executor="process" isolates CPU-heavy
+    agents from the caller (and from each other).
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queued: int = 4,
+        executor: str = "process",
+        base_dir: str = "runs",
+        retention_seconds: float = 24 * 3600,
+    ):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.base_dir = base_dir
+        self.retention_seconds = retention_seconds
+        if executor == "process":
+            # spawn: forking a multi-threaded server process is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def active_count(self):
+        with self._lock:
+            return sum(not job.future.done() for job in self._jobs.values())
+
+    def submit(self, data: bytes, filename: str = "uploaded.csv", **planner_kwargs) -> str:
+        """Queue a pipeline run over the uploaded bytes; returns the job id."""
+        with self._lock:
+            active = [job for job in self._jobs.values() if not job.future.done()]
+            if len(active) >= self.max_workers + self.max_queued:
+                raise JobQueueFull(
+                    f"{len(active)} analyses are already running or queued; try again shortly."
+                )
+            prune_workspaces(
+                self.base_dir, self.retention_seconds, keep={job.workspace.run_id for job in active}
+            )
+
+            workspace = RunWorkspace.create(self.base_dir)
+            dataset_path = workspace.save_upload(data, filename)
+            future = self._pool.submit(run_pipeline_job, workspace.root, dataset_path, planner_kwargs)
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = Job(job_id, workspace, future, time.time())
+        return job_id
+
+    def status(self, job_id: str) -> dict:
+        job = self._jobs[job_id]
+        stages = job.workspace.read_progress()
+        error = None
+
+        if job.future.cancelled():
+            state = "cancelled"
+        elif job.future.done():
+            exc = job.future.exception()
+            if exc is None:
+                state = "done"
+            elif isinstance(exc, PipelineCancelled):
+                state = "cancelled"
+            else:
+                state, error = "failed", f"{type(exc).__name__}: {exc}"
+        elif job.workspace.cancel_requested():
+            state = "cancelling"
+        else:
+            state = "running" if stages else "queued"
+
+        finished = sum(status in ("done", "failed", "skipped") for status in stages.values())
+        return {
+            "state": state,
+            "run_id": job.workspace.run_id,
+            "workspace_root": job.workspace.root,
+            "stages": stages,
+            "completed": finished,
+            "total": len(stages),
+            "error": error,
+            "elapsed_seconds": round(time.time() - job.submitted_at, 1),
+            "live_insights": job.workspace.read_live_insights(),
+        }
+
+    def result(self, job_id: str) -> AgentContext:
+        return self._jobs[job_id].future.result()
+
+    def cancel(self, job_id: str):
+        """Drop a queued job, or ask a running one to stop after its current stages."""
+        job = self._jobs[job_id]
+        if not job.future.cancel():
+            job.workspace.request_cancel()
+
+    def forget(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,17 +1,280 @@
+import asyncio
+import hashlib
 import os
+import random
+import re
+import threading
+import time
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+from .instrumentation import record_llm_call
+from .llm_cache import LLMResponseCache
 
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+DEFAULT_MODEL = "gemini-2.0-flash-lite"
+
+
+# =======================================================
+# BACKENDS
+# =======================================================
+class GeminiBackend:
+    def __init__(self, model_name: str = DEFAULT_MODEL, api_key: str | None = None):
+        import google.generativeai as genai
+        from google.api_core import exceptions as gexc
+
+        genai.configure(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+        self.model_name = model_name
+        # One model object reused for every call (and thread)
+        self._model = genai.GenerativeModel(model_name=model_name)
+        self.retryable = (
+            gexc.ResourceExhausted,
+            gexc.ServiceUnavailable,
+            gexc.DeadlineExceeded,
+            gexc.InternalServerError,
+            ConnectionError,
+            TimeoutError,
+        )
+
+    def generate(self, system_prompt, user_prompt, timeout):
+        response = self._model.generate_content(
+            [
+                {"role": "user", "parts": [system_prompt]},
+                {"role": "user", "parts": [user_prompt]},
+            ],
+            request_options={"timeout": timeout},
+        )
+        return response.text
+
+    def stream(self, system_prompt, user_prompt, timeout):
+        response = self._model.generate_content(
+            [
+                {"role": "user", "parts": [system_prompt]},
+                {"role": "user", "parts": [user_prompt]},
+            ],
+            request_options={"timeout": timeout},
+            stream=True,
+        )
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class StubBackend:
+    """Offline, deterministic backend for tests and load runs (LLM_BACKEND=stub)."""
+
+    retryable = ()
+
+    def __init__(self, model_name: str = "stub", latency: float = 0.0):
+        self.model_name = model_name
+        self.latency = latency
+
+    def generate(self, system_prompt, user_prompt, timeout):
+        if self.latency:
+            time.sleep(self.latency)
+        digest = hashlib.sha256((system_prompt + "\0" + user_prompt).encode()).hexdigest()[:12]
+        headings = re.findall(r"^##\s+.+$", system_prompt, flags=re.MULTILINE)
+        lines = [f"_Stub response {digest} ({len(user_prompt)} prompt chars)._", ""]
+        for heading in headings or ["## Summary"]:
+            lines += [heading, f"- Placeholder insight for {heading.lstrip('# ').strip()}.", ""]
+        return "\n".join(lines)
+
+    def stream(self, system_prompt, user_prompt, timeout):
+        text = self.generate(system_prompt, user_prompt, timeout)
+        for line in text.splitlines(keepends=True):
+            yield line
+
+
+def cache_from_env():
+    if os.getenv("LLM_CACHE", "on").lower() in ("0", "off", "false"):
+        return None
+    return LLMResponseCache(
+        path=os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite"),
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)),
+    )
+
+
+def backend_from_env():
+    name = os.getenv("LLM_BACKEND", "gemini").lower()
+    if name == "stub":
+        return StubBackend(latency=float(os.getenv("LLM_STUB_LATENCY", "0")))
+    return GeminiBackend(model_name=os.getenv("LLM_MODEL", DEFAULT_MODEL))
+
+
+# =======================================================
+# CLIENT
+# =======================================================
+class LLMClient:
+    """Shared client: response cache, bounded concurrency, per-request timeout,
+    retries with exponential backoff and jitter, and an overall deadline per call."""
+
+    def __init__(
+        self,
+        backend=None,
+        cache: LLMResponseCache | None = None,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        timeout: float = 60.0,
+        deadline: float = 180.0,
+        backoff: float = 1.0,
+        max_backoff: float = 16.0,
+    ):
+        self.backend = backend or backend_from_env()
+        self.cache = cache
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.deadline = deadline
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    @property
+    def model_name(self):
+        return self.backend.model_name
+
+    def generate(self, system_prompt: str, user_prompt: str) -> str:
+        start = time.perf_counter()
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(system_prompt, user_prompt, self.model_name)
+            cached = self.cache.get(key)
+            if cached is not None:
+                record_llm_call(
+                    prompt_chars=len(system_prompt) + len(user_prompt),
+                    response_chars=len(cached),
+                    latency=time.perf_counter() - start,
+                    model=self.model_name,
+                    cached=True,
+                )
+                return cached
+
+        give_up_at = time.monotonic() + self.deadline
+        attempt = 0
+
+        with self._slots:
+            while True:
+                remaining = give_up_at - time.monotonic()
+                try:
+                    text = self.backend.generate(
+                        system_prompt, user_prompt, timeout=max(1.0, min(self.timeout, remaining))
+                    )
+                    break
+                except self.backend.retryable as e:
+                    attempt += 1
+                    delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                    delay *= random.uniform(0.5, 1.0)
+                    if attempt > self.max_retries or time.monotonic() + delay >= give_up_at:
+                        raise
+                    print(f"[LLMClient] {type(e).__name__}, retry {attempt} in {delay:.1f}s")
+                    time.sleep(delay)
+
+        if key is not None:
+            self.cache.put(key, self.model_name, text)
+        record_llm_call(
+            prompt_chars=len(system_prompt) + len(user_prompt),
+            response_chars=len(text),
+            latency=time.perf_counter() - start,
+            model=self.model_name,
+        )
+        return text
+
+    def stream(self, system_prompt: str, user_prompt: str):
+        """Yield response chunks as they arrive; the full text is cached on completion.
+
+        Only failures before the first chunk are retried, since chunks already
+        handed to the caller cannot be taken back.
+        """
+        start = time.perf_counter()
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(system_prompt, user_prompt, self.model_name)
+            cached = self.cache.get(key)
+            if cached is not None:
+                record_llm_call(
+                    prompt_chars=len(system_prompt) + len(user_prompt),
+                    response_chars=len(cached),
+                    latency=time.perf_counter() - start,
+                    model=self.model_name,
+                    cached=True,
+                )
+                yield cached
+                return
+
+        give_up_at = time.monotonic() + self.deadline
+        attempt = 0
+        parts = []
+        first_chunk_at = None
+
+        with self._slots:
+            while True:
+                remaining = give_up_at - time.monotonic()
+                try:
+                    for chunk in self.backend.stream(
+                        system_prompt, user_prompt, timeout=max(1.0, min(self.timeout, remaining))
+                    ):
+                        if first_chunk_at is None:
+                            first_chunk_at = time.perf_counter()
+                        parts.append(chunk)
+                        yield chunk
+                    break
+                except self.backend.retryable as e:
+                    attempt += 1
+                    delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                    delay *= random.uniform(0.5, 1.0)
+                    if parts or attempt > self.max_retries or time.monotonic() + delay >= give_up_at:
+                        raise
+                    print(f"[LLMClient] {type(e).__name__}, retry {attempt} in {delay:.1f}s")
+                    time.sleep(delay)
+
+        text = "".join(parts)
+        if key is not None:
+            self.cache.put(key, self.model_name, text)
+        record_llm_call(
+            prompt_chars=len(system_prompt) + len(user_prompt),
+            response_chars=len(text),
+            latency=time.perf_counter() - start,
+            model=self.model_name,
+            first_chunk_latency=None if first_chunk_at is None else first_chunk_at - start,
+        )
+
+    async def agenerate(self, system_prompt: str, user_prompt: str) -> str:
+        # Runs the blocking call on a worker thread; the same slots bound concurrency
+        return await asyncio.to_thread(self.generate, system_prompt, user_prompt)
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client() -> LLMClient:
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = LLMClient(cache=cache_from_env())
+        return _default_client
+
+
+def set_client(client: LLMClient | None):
+    global _default_client
+    with _default_lock:
+        _default_client = client
+
+
+def generate_llm_response(system_prompt, user_prompt, on_chunk=None):
+    """Full response text; with `on_chunk`, the response is streamed and every
+    chunk is passed to on_chunk(chunk) as it arrives."""
+    if on_chunk is None:
+        return get_client().generate(system_prompt, user_prompt)
+    parts = []
+    for chunk in get_client().stream(system_prompt, user_prompt):
+        parts.append(chunk)
+        on_chunk(chunk)
+    return "".join(parts)
+
 
-def generate_llm_response(system_prompt, user_prompt):
-    model = genai.GenerativeModel(model_name="gemini-2.0-flash-lite")
+def stream_llm_response(system_prompt, user_prompt):
+    return get_client().stream(system_prompt, user_prompt)
 
-    response = model.generate_content([
-        {"role": "user", "parts": [system_prompt]},
-        {"role": "user", "parts": [user_prompt]},
-    ])
 
-    return response.text
+async def agenerate_llm_response(system_prompt, user_prompt):
+    return await get_client().agenerate(system_prompt, user_prompt)
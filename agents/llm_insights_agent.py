@@ -1,9 +1,19 @@
-import json
 from . import AgentContext
 from .llm_client import generate_llm_response
+from .prompt_builder import build_dataset_prompt
 
 
 class LLMInsightsAgent:
+    # Context fields used by the planner to build the stage graph
+    reads = ("df", "summary", "visual_structure")
+    writes = ("insights",)
+
+    def __init__(self, token_budget: int = 6000, on_chunk=None):
+        # Upper bound (estimated tokens) for the dataset part of the prompt
+        self.token_budget = token_budget
+        # Optional callback receiving response chunks as they stream in
+        self.on_chunk = on_chunk
+
     def run(self, context: AgentContext) -> AgentContext:
         print("[LLMInsightsAgent] Generating graph-aware LLM insights...")
 
@@ -14,17 +24,6 @@ class LLMInsightsAgent:
         if df is None:
             raise ValueError("DataFrame not loaded in context")
 
-        # Prepare Compact Summary
-        compact_summary = {
-            "num_rows": summary.get("num_rows"),
-            "num_columns": summary.get("num_columns"),
-            "columns": summary.get("columns"),
-            "dtypes": summary.get("dtypes"),
-            "missing_values": summary.get("missing_values"),
-            "numeric_summary": summary.get("numeric_summary"),
-            "correlation": summary.get("correlation"),
-        }
-
         sample_rows = df.head(5).to_dict(orient="records")
 
         # SYSTEM PROMPT — Graph-Aware Analysis
@@ -69,21 +68,18 @@ BE SPECIFIC about what you observe.
 Use facts from the dataset summary AND visual behavior.
 """
 
-        # USER PROMPT — Includes Visual Structure
-        user_prompt = f"""
-DATASET SUMMARY (JSON):
-{json.dumps(compact_summary, indent=2)}
-
-SAMPLE ROWS (JSON):
-{json.dumps(sample_rows, indent=2)}
-
-STRUCTURED VISUALIZATION METADATA (JSON):
-{json.dumps(plot_structure, indent=2)}
-
-Generate graph-aware insights.
-"""
-
-        insights_text = generate_llm_response(system_prompt, user_prompt)
+        # USER PROMPT — compact summary, top correlations, anomalous columns, plot overview
+        user_prompt, prompt_stats = build_dataset_prompt(
+            summary, plot_structure, sample_rows, token_budget=self.token_budget
+        )
+        print(
+            f"[LLMInsightsAgent] Prompt ~{prompt_stats['estimated_tokens']} tokens "
+            f"(compaction level {prompt_stats['level']}"
+            + (f", dropped {', '.join(prompt_stats['dropped'])}" if prompt_stats["dropped"] else "")
+            + ")."
+        )
+
+        insights_text = generate_llm_response(system_prompt, user_prompt, on_chunk=self.on_chunk)
 
         context.insights.append("### 🤖 Graph-Aware LLM Insights\n" + insights_text)
 
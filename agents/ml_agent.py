@@ -1,89 +1,380 @@
+import copy
 import os
-import matplotlib.pyplot as plt
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 import seaborn as sns
 
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
+from sklearn.ensemble import (
+    HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+)
+from sklearn.inspection import permutation_importance
+from sklearn.model_selection import train_test_split
 
 from . import AgentContext
+from .visualization_agent import new_figure
+from utils.dtype_optimizer import date_parse_settings
+from utils.feature_store import FeatureMatrix, FeatureStore, get_feature_store
+from utils.model_registry import ModelRegistry
+from utils.render_cache import RenderCache
+
+
+ESTIMATORS = ("random_forest", "hist_gradient_boosting")
+
+
+def stratified_sample(y: pd.Series, n: int, task_type: str, random_state: int = 42) -> np.ndarray:
+    """Positions of ~n rows keeping the target's class (or, for regression,
+    decile) proportions; every stratum keeps at least one row."""
+    if task_type == "classification":
+        strata = pd.factorize(y)[0]
+    else:
+        strata = pd.qcut(y.rank(method="first"), q=min(10, len(y)), labels=False).to_numpy()
+    keys = pd.Series(np.random.default_rng(random_state).random(len(y)))
+    rank = keys.groupby(strata).rank(method="first").to_numpy()
+    sizes = np.bincount(strata)[strata]
+    quota = np.maximum(1, np.round(sizes * n / len(y)))
+    return np.flatnonzero(rank <= quota)
 
 
 class MLAgent:
-    def __init__(self, output_dir="plots"):
+    # Context fields used by the planner to build the stage graph
+    reads = ("df",)
+    writes = ("feature_importance",)
+
+    def __init__(self, output_dir="plots", use_render_cache=True, render_cache_dir=None,
+                 estimator="random_forest", fast=False, max_rows=100_000, time_budget=20.0,
+                 max_trees=300, tree_batch=25, tolerance=0.005, validation_rows=5_000,
+                 n_jobs=-1, random_state=42, feature_store: FeatureStore | None = None,
+                 registry: ModelRegistry | None = None, held_out=False, permutation_repeats=5):
+        # fast=True trains on a target-stratified sample of at most max_rows rows
+        # and grows the forest in tree_batch steps until the importances move by
+        # less than tolerance, max_trees is reached or time_budget (s) runs out
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"estimator must be one of {ESTIMATORS}")
+        self.estimator = estimator
+        self.fast = fast
+        self.max_rows = max_rows
+        self.time_budget = time_budget
+        self.max_trees = max_trees
+        self.tree_batch = tree_batch
+        self.tolerance = tolerance
+        # held_out=True fits on the training split only and adds permutation
+        # importance measured on a validation sample of at most validation_rows
+        # rows, so its cost does not grow with the dataset
+        self.held_out = held_out
+        self.validation_rows = validation_rows
+        self.permutation_repeats = permutation_repeats
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        # Encoded matrices are shared (per dataset) by every agent using the store
+        self.feature_store = feature_store or get_feature_store()
+        # Fitted models are persisted (and reused) when a registry is given
+        self.registry = registry
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
+        self.render_cache = (
+            RenderCache(render_cache_dir or os.path.join(output_dir, "cache")) if use_render_cache else None
+        )
 
     def detect_task_type(self, series: pd.Series):
         """Detect if task is regression or classification."""
-        if series.dtype in ["float64", "int64"]:
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
             # If too many unique numeric values → regression
             return "regression"
         else:
             return "classification"
 
-    def run(self, context: AgentContext, target_column: str) -> AgentContext:
-        print("[MLAgent] Running AutoML Feature Importance Analysis...")
+    def save_importance_plot(self, feature_importance_df: pd.DataFrame, target_column: str) -> str:
+        if self.render_cache is not None:
+            plot_path = self.render_cache.path(
+                "feature_importance.png", feature_importance_df, target=target_column
+            )
+            if self.render_cache.hit(plot_path):
+                return plot_path
+        else:
+            plot_path = os.path.join(self.output_dir, "feature_importance.png")
 
-        df = context.df
-        if df is None:
-            raise ValueError("DataFrame not loaded")
+        panels = [("importance", "importance_std", "Feature Importance")]
+        if "permutation_importance" in feature_importance_df:
+            panels.append(("permutation_importance", "permutation_std", "Permutation Importance (held-out)"))
+        fig, axes = new_figure((8 * len(panels), 6), ncols=len(panels))
+        axes = np.atleast_1d(axes)
+
+        for ax, (column, spread, title) in zip(axes, panels):
+            sns.barplot(
+                x=feature_importance_df[column],
+                y=feature_importance_df["feature"],
+                ax=ax,
+            )
+            if spread in feature_importance_df:
+                ax.errorbar(
+                    x=feature_importance_df[column],
+                    y=np.arange(len(feature_importance_df)),
+                    xerr=feature_importance_df[spread],
+                    fmt="none", ecolor="black", capsize=2,
+                )
+            ax.set_title(title)
+            ax.set_xlabel("Importance Score")
+            ax.set_ylabel("Feature")
+
+        fig.savefig(plot_path, bbox_inches="tight")
+        if self.render_cache is not None:
+            self.render_cache.evict(keep=(plot_path,))
+        return plot_path
+
+    def fit_forest(self, X, y, task_type):
+        """Random forest on all cores; in fast mode grown in batches with early stopping.
+
+        Importance stability is the std of the per-tree importances.
+        """
+        forest_cls = RandomForestClassifier if task_type == "classification" else RandomForestRegressor
+        start = time.perf_counter()
+        stopped = None
+
+        if not self.fast:
+            model = forest_cls(random_state=self.random_state, n_jobs=self.n_jobs).fit(X, y)
+        else:
+            model = forest_cls(
+                n_estimators=self.tree_batch, warm_start=True,
+                random_state=self.random_state, n_jobs=self.n_jobs,
+            )
+            previous = None
+            while True:
+                model.fit(X, y)
+                current = model.feature_importances_
+                if previous is not None and np.abs(current - previous).max() < self.tolerance:
+                    stopped = "converged"
+                elif time.perf_counter() - start > self.time_budget:
+                    stopped = "time_budget"
+                elif model.n_estimators >= self.max_trees:
+                    stopped = "max_trees"
+                if stopped:
+                    break
+                previous = current
+                model.n_estimators += self.tree_batch
+
+        per_tree = np.array([tree.feature_importances_ for tree in model.estimators_])
+        info = {
+            "n_estimators": len(model.estimators_),
+            "stopped": stopped,
+            "train_seconds": round(time.perf_counter() - start, 3),
+            "importance_method": "impurity",
+        }
+        return model, model.feature_importances_, per_tree.std(axis=0), info
+
+    def split_held_out(self, X, y, task_type):
+        """Training rows and a validation sample of at most validation_rows rows
+        (class-stratified when every class can be represented)."""
+        test_size = min(0.2, self.validation_rows / len(X)) if len(X) > 10 else 0.2
+        stratify = None
+        if task_type == "classification":
+            counts = y.value_counts()
+            if counts.min() >= 2 and len(counts) <= int(test_size * len(X)):
+                stratify = y
+        return train_test_split(X, y, test_size=test_size, stratify=stratify, random_state=self.random_state)
+
+    def permutation_scores(self, model, X_val, y_val):
+        """Permutation importance of an already fitted model on the validation sample.
+
+        Features are shuffled in parallel worker processes (n_jobs); the model
+        itself predicts single-threaded meanwhile to avoid oversubscribing cores.
+        """
+        start = time.perf_counter()
+        inner_jobs = model.get_params().get("n_jobs")
+        if inner_jobs is not None:
+            model.set_params(n_jobs=1)
+        try:
+            result = permutation_importance(
+                model, X_val, y_val, n_repeats=self.permutation_repeats,
+                n_jobs=self.n_jobs, random_state=self.random_state,
+            )
+            score = model.score(X_val, y_val)
+        finally:
+            if inner_jobs is not None:
+                model.set_params(n_jobs=inner_jobs)
+        info = {
+            "validation_rows": len(X_val),
+            "repeats": self.permutation_repeats,
+            # accuracy (classification) or R² (regression) on the held-out rows
+            "validation_score": round(float(score), 4),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        return result.importances_mean, result.importances_std, info
+
+    def fit_hist_gradient_boosting(self, X, y, task_type):
+        """Histogram gradient boosting with built-in early stopping."""
+        booster_cls = (
+            HistGradientBoostingClassifier if task_type == "classification" else HistGradientBoostingRegressor
+        )
+        start = time.perf_counter()
+        model = booster_cls(
+            max_iter=self.max_trees, early_stopping=True, random_state=self.random_state
+        ).fit(X, y)
+        info = {
+            "n_estimators": int(model.n_iter_),
+            "stopped": "converged" if model.n_iter_ < self.max_trees else "max_trees",
+            "train_seconds": round(time.perf_counter() - start, 3),
+            "importance_method": "permutation",
+        }
+        return model, info
 
+    def training_params(self):
+        params = {"estimator": self.estimator, "fast": self.fast, "random_state": self.random_state}
+        if self.fast:
+            # The time budget caps the number of trees, so it changes the model
+            params.update(max_rows=self.max_rows, max_trees=self.max_trees, tree_batch=self.tree_batch,
+                          tolerance=self.tolerance, time_budget=self.time_budget)
+        if self.held_out or self.estimator == "hist_gradient_boosting":
+            params.update(held_out=True, validation_rows=self.validation_rows,
+                          permutation_repeats=self.permutation_repeats)
+        return params
+
+    def analyse_target(self, df: pd.DataFrame, matrix: FeatureMatrix, target_column: str) -> dict:
+        """Fit one model for target_column over the shared encoded matrix
+        (or reuse the registered one for the same data, target and settings)."""
         if target_column not in df.columns:
             raise ValueError(f"Target column '{target_column}' not found")
 
-        # Separate target + features
+        model_key = None
+        if self.registry is not None:
+            model_key = self.registry.key(
+                matrix.dataset_hash, target_column, matrix.spec.digest(), self.training_params()
+            )
+            bundle = self.registry.load(model_key)
+            if bundle is not None:
+                print(f"[MLAgent] Reusing registered model {model_key} for {target_column}.")
+                result = dict(bundle["meta"]["result"])
+                table = pd.DataFrame(result["importance_table"])
+                result["plot_path"] = self.save_importance_plot(table, target_column)
+                return result
+
+        # The target only drops its own column from the shared matrix
+        X = matrix.for_target(target_column)
         y = df[target_column]
-        X = df.drop(columns=[target_column]).copy()
+        if isinstance(y.dtype, pd.CategoricalDtype):
+            y = y.astype(object)
+        # Rows without a target value carry no label to learn from
+        labelled = y.notna().to_numpy()
+        if not labelled.all():
+            X, y = X[labelled], y[labelled]
+        if y.empty:
+            raise ValueError(f"Target column '{target_column}' has no values")
 
-        # Encode categorical features
-        for col in X.select_dtypes(include="object").columns:
-            X[col] = LabelEncoder().fit_transform(X[col].astype(str))
+        task_type = self.detect_task_type(y)
+        print(f"[MLAgent] Detected task type for {target_column}: {task_type}")
 
-        # Drop rows with missing values
-        X = X.fillna(0)
-        y = y.fillna(0)
+        # Fast mode: bounded, target-stratified training sample
+        rows_total = len(X)
+        if self.fast and rows_total > self.max_rows:
+            keep = stratified_sample(y, self.max_rows, task_type, self.random_state)
+            X, y = X.iloc[keep], y.iloc[keep]
 
-        task_type = self.detect_task_type(y)
-        print(f"[MLAgent] Detected task type: {task_type}")
+        # Gradient boosting has no impurity importances, so it is always
+        # evaluated on a held-out sample
+        held_out = self.held_out or self.estimator == "hist_gradient_boosting"
+        if held_out:
+            X_train, X_val, y_train, y_val = self.split_held_out(X, y, task_type)
+        else:
+            X_train, y_train = X, y
 
-        # Choose model
-        if task_type == "classification":
-            model = RandomForestClassifier()
+        # Fit model and compute feature importance (+ its spread)
+        if self.estimator == "hist_gradient_boosting":
+            model, training = self.fit_hist_gradient_boosting(X_train, y_train, task_type)
         else:
-            model = RandomForestRegressor()
-
-        # Fit model
-        model.fit(X, y)
-
-        # Compute feature importance
-        importances = model.feature_importances_
-        feature_importance_df = pd.DataFrame({
-            "feature": X.columns,
-            "importance": importances
-        }).sort_values(by="importance", ascending=False)
-
-        # Save importance graph
-        fig = plt.figure(figsize=(8, 6))
-        sns.barplot(
-            x=feature_importance_df["importance"],
-            y=feature_importance_df["feature"]
-        )
-        plt.title("Feature Importance")
-        plt.xlabel("Importance Score")
-        plt.ylabel("Feature")
+            model, importances, spread, training = self.fit_forest(X_train, y_train, task_type)
+        training.update(estimator=self.estimator, rows_used=len(X_train), rows_total=rows_total)
+        print(f"[MLAgent] Trained {training['n_estimators']} estimators on {len(X_train)} rows "
+              f"in {training['train_seconds']}s.")
 
-        plot_path = os.path.join(self.output_dir, "feature_importance.png")
-        fig.savefig(plot_path, bbox_inches="tight")
-        plt.close(fig)
+        columns = {"feature": X.columns}
+        evaluation = None
+        if held_out:
+            # One fitted model, scored on the bounded validation sample
+            perm_mean, perm_std, evaluation = self.permutation_scores(model, X_val, y_val)
+            print(f"[MLAgent] Permutation importance on {evaluation['validation_rows']} held-out rows "
+                  f"in {evaluation['seconds']}s.")
+        if self.estimator == "hist_gradient_boosting":
+            columns.update(importance=perm_mean, importance_std=perm_std)
+        else:
+            columns.update(importance=importances, importance_std=spread)
+            if held_out:
+                columns.update(permutation_importance=perm_mean, permutation_std=perm_std)
+        feature_importance_df = pd.DataFrame(columns).sort_values(by="importance", ascending=False)
+
+        # Save importance graph (skipped when the same table was already drawn)
+        plot_path = self.save_importance_plot(feature_importance_df, target_column)
 
-        # Store results in context
-        context.feature_importance = {
+        result = {
             "importance_table": feature_importance_df.to_dict(orient="records"),
             "plot_path": plot_path,
             "task_type": task_type,
             "target_column": target_column,
+            "training": training,
+            "evaluation": evaluation,
+            "encoding": {
+                c.name: c.reason for c in matrix.spec.columns if c.reason and c.name != target_column
+            },
+            "model_key": model_key,
         }
+        if self.registry is not None:
+            self.registry.save(model_key, model, matrix.spec, X.columns, {
+                "dataset_hash": matrix.dataset_hash,
+                "target_column": target_column,
+                "task_type": task_type,
+                "params": self.training_params(),
+                "result": result,
+            })
+        return result
+
+    def run(self, context: AgentContext, target_column: str) -> AgentContext:
+        print("[MLAgent] Running AutoML Feature Importance Analysis...")
+
+        df = context.df
+        if df is None:
+            raise ValueError("DataFrame not loaded")
+
+        # Each column is encoded once per dataset and reused across targets
+        matrix = self.feature_store.get(
+            df, date_settings=date_parse_settings(context.summary.get("dtype_optimization"))
+        )
+        context.feature_importance = self.analyse_target(df, matrix, target_column)
 
         print("[MLAgent] Feature importance generated.")
-        return context
\ No newline at end of file
+        return context
+
+    def run_many(self, context: AgentContext, target_columns, workers: int = 4) -> AgentContext:
+        """Importances for several targets in parallel over one shared feature matrix.
+
+        Results go to context.feature_importance_batch ({target: result}); a
+        failing target is reported under "error" instead of aborting the batch.
+        """
+        df = context.df
+        if df is None:
+            raise ValueError("DataFrame not loaded")
+
+        matrix = self.feature_store.get(
+            df, date_settings=date_parse_settings(context.summary.get("dtype_optimization"))
+        )
+        workers = max(1, min(workers, len(target_columns)))
+        # Split the cores between concurrent fits instead of oversubscribing them
+        worker_agent = copy.copy(self)
+        if workers > 1 and self.n_jobs == -1:
+            worker_agent.n_jobs = max(1, (os.cpu_count() or 1) // workers)
+
+        def analyse(target):
+            try:
+                return worker_agent.analyse_target(df, matrix, target)
+            except Exception as e:
+                return {"target_column": target, "error": f"{type(e).__name__}: {e}"}
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(analyse, target_columns))
+
+        context.feature_importance_batch = {r["target_column"]: r for r in results}
+        print(f"[MLAgent] Feature importance generated for {len(results)} targets.")
+        return context
@@ -2,8 +2,26 @@ import json
 from . import AgentContext
 from .llm_client import generate_llm_response
 
+# Wall-clock fields differ on every run; leaving them out of the prompt keeps
+# it byte-identical for the same model so the LLM response cache can hit
+VOLATILE_KEYS = ("train_seconds", "seconds")
+
+
+def stable_fields(info):
+    if not isinstance(info, dict):
+        return info
+    return {k: v for k, v in info.items() if k not in VOLATILE_KEYS}
+
 
 class MLInsightsAgent:
+    # Context fields used by the planner to build the stage graph
+    reads = ("feature_importance",)
+    writes = ("insights",)
+
+    def __init__(self, on_chunk=None):
+        # Optional callback receiving response chunks as they stream in
+        self.on_chunk = on_chunk
+
     def run(self, context: AgentContext) -> AgentContext:
         print("[MLInsightsAgent] Generating ML-based insights...")
 
@@ -15,7 +33,13 @@ class MLInsightsAgent:
 
         system_prompt = """
 You are a senior machine learning engineer and data scientist.
-You analyze feature importance results from RandomForest models.
+You analyze feature importance results from tree-ensemble models
+(random forest or histogram gradient boosting). importance_std is the spread
+of each score (across trees or permutation repeats): treat features whose
+importance is within about one std of each other as equally ranked.
+When permutation_importance is present it was measured on held-out rows:
+prefer it over impurity importance, which is inflated for high-cardinality
+columns, and point out features whose two scores disagree.
 
 Your goal:
 - Explain which features influence the target
@@ -35,12 +59,14 @@ Write in clean markdown with sections:
         user_prompt = f"""
 TARGET COLUMN: {fi['target_column']}
 TASK TYPE: {fi['task_type']}
+TRAINING: {json.dumps(stable_fields(fi.get('training', {})), default=str)}
+HELD-OUT EVALUATION: {json.dumps(stable_fields(fi.get('evaluation')), default=str)}
 
 FEATURE IMPORTANCE TABLE:
 {json.dumps(fi['importance_table'], indent=2)}
 """
 
-        insights_text = generate_llm_response(system_prompt, user_prompt)
+        insights_text = generate_llm_response(system_prompt, user_prompt, on_chunk=self.on_chunk)
 
         context.insights.append("### 🤖 ML Feature Importance Insights\n" + insights_text)
 
@@ -0,0 +1,134 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, List, Tuple
+
+from . import AgentContext
+from .instrumentation import measure
+
+
+class PipelineCancelled(RuntimeError):
+    pass
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[AgentContext], AgentContext]
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+    optional: bool = False
+
+
+def stage_for(name, agent, *args, optional=False, **kwargs) -> Stage:
+    """Wrap agent.run(context, *args, **kwargs) using the agent's declared fields."""
+    return Stage(
+        name=name,
+        fn=lambda context: agent.run(context, *args, **kwargs),
+        reads=tuple(getattr(agent, "reads", ())),
+        writes=tuple(getattr(agent, "writes", ())),
+        optional=optional,
+    )
+
+
+def resolve_dependencies(stages: List[Stage]):
+    """Each stage depends on the latest earlier writer of any field it reads or writes.
+
+    Writers of the same field therefore keep their declaration order (e.g.
+    every agent appending to context.insights), while stages that touch
+    disjoint fields can run concurrently.
+    """
+    last_writer = {}
+    deps = {}
+    for stage in stages:
+        deps[stage.name] = {
+            last_writer[f] for f in (*stage.reads, *stage.writes) if f in last_writer
+        }
+        for f in stage.writes:
+            last_writer[f] = stage.name
+    return deps
+
+
+def run_stage(stage: Stage, context: AgentContext, trace_memory: bool = False):
+    with measure(stage.name, context, trace_memory=trace_memory):
+        stage.fn(context)
+
+
+def run_stages(
+    stages: List[Stage],
+    context: AgentContext,
+    max_workers: int = 4,
+    trace_memory: bool = False,
+    on_progress: Callable[[str, str], None] | None = None,
+    should_stop: Callable[[], bool] | None = None,
+) -> AgentContext:
+    """Run stages on a thread pool as soon as their dependencies have finished.
+
+    A failing optional stage is recorded in context.stage_errors; its
+    optional dependents are skipped, while required dependents (e.g. the
+    report) still run on whatever it left in the context. A failing required
+    stage stops scheduling and is re-raised once running stages have
+    finished.
+
+    on_progress(stage, status) is called from the scheduling thread with
+    "pending", "running", "done", "failed" or "skipped". should_stop() is
+    polled between stages; once it returns True no new stage starts and
+    PipelineCancelled is raised after the running ones finish.
+    """
+    deps = resolve_dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    pending = [stage.name for stage in stages]
+    done, failed = set(), set()
+    running = {}
+    fatal = None
+
+    def report(name, status):
+        if on_progress is not None:
+            on_progress(name, status)
+
+    for name in pending:
+        report(name, "pending")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            if fatal is None and should_stop is not None and should_stop():
+                fatal = PipelineCancelled("Pipeline run cancelled")
+                print("[PlannerAgent] Cancellation requested; waiting for running stages.")
+
+            for name in list(pending):
+                if fatal is not None:
+                    break
+                if by_name[name].optional and deps[name] & failed:
+                    pending.remove(name)
+                    failed.add(name)
+                    context.stage_errors[name] = "skipped: upstream stage failed"
+                    report(name, "skipped")
+                    print(f"[PlannerAgent] Skipping {name} (upstream failure).")
+                elif deps[name] <= done | failed:
+                    pending.remove(name)
+                    running[pool.submit(run_stage, by_name[name], context, trace_memory)] = name
+                    report(name, "running")
+
+            if not running:
+                break
+
+            # Wake up periodically to poll should_stop while long stages run
+            finished, _ = wait(
+                running, timeout=None if should_stop is None else 0.5, return_when=FIRST_COMPLETED
+            )
+            for future in finished:
+                name = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    done.add(name)
+                    report(name, "done")
+                    continue
+                failed.add(name)
+                context.stage_errors[name] = f"{type(error).__name__}: {error}"
+                report(name, "failed")
+                print(f"[PlannerAgent] Stage {name} failed: {error}")
+                if not by_name[name].optional and fatal is None:
+                    fatal = error
+
+    if fatal is not None:
+        raise fatal
+    return context
@@ -1,3 +1,7 @@
+import datetime
+import os
+import time
+
 from . import AgentContext
 from .data_loader_agent import DataLoaderAgent
 from .eda_agent import EDAAgent
@@ -7,46 +11,135 @@ from .llm_insights_agent import LLMInsightsAgent
 from .report_agent import ReportAgent
 from .ml_agent import MLAgent
 from .ml_insights_agent import MLInsightsAgent
+from .clustering_agent import ClusteringAgent
+from .clustering_insights_agent import ClusteringInsightsAgent
+from .pipeline_graph import run_stages, stage_for
+from .instrumentation import measure, write_prometheus_textfile, write_run_record
+from utils.dataset_cache import DatasetCache
+from utils.workspace import RunWorkspace
 
 class PlannerAgent:
-    def __init__(self, use_llm_insights: bool = True):
-        self.data_loader = DataLoaderAgent()
+    def __init__(
+        self,
+        use_llm_insights: bool = True,
+        chunksize: int | None = None,
+        use_cache: bool = True,
+        state_path: str | None = None,
+        plot_workers: int = 1,
+        ml_target: str | None = None,
+        run_clustering: bool = False,
+        max_workers: int = 4,
+        metrics_dir: str | None = "reports",
+        prometheus_textfile: str | None = None,
+        trace_memory: bool = False,
+        llm_on_chunk=None,
+        workspace: RunWorkspace | None = None,
+        render_cache_dir: str = "plots/cache",
+    ):
+        # state_path: persisted EDA profile; each run then only scans the new
+        # batch at context.dataset_path and merges it into the saved state
+        self.data_loader = DataLoaderAgent(
+            chunksize=chunksize,
+            cache=DatasetCache() if use_cache else None,
+            state_path=state_path,
+        )
+        # workspace: per-run plots/reports directories (content-addressed
+        # plots stay in the shared render cache at render_cache_dir)
+        self.workspace = workspace
+        self.plots_dir = workspace.plots_dir if workspace else "plots"
+        self.render_cache_dir = render_cache_dir
+        if workspace is not None and metrics_dir == "reports":
+            metrics_dir = workspace.reports_dir
+
         self.eda_agent = EDAAgent()
-        self.viz_agent = VisualizationAgent()
+        self.viz_agent = VisualizationAgent(
+            plots_dir=self.plots_dir, workers=plot_workers, render_cache_dir=render_cache_dir
+        )
         self.rule_insights_agent = InsightsAgent()
-        self.llm_insights_agent = LLMInsightsAgent() if use_llm_insights else None
-        self.report_agent = ReportAgent()
-
-    def run_pipeline(self, context: AgentContext) -> AgentContext:
-        print("[PlannerAgent] Starting analysis pipeline...")
-
-        # STEP 1 — Load Data
-        context = self.data_loader.run(context)
+        # llm_on_chunk: called with each streamed chunk of the LLM insights (from a worker thread)
+        self.llm_insights_agent = LLMInsightsAgent(on_chunk=llm_on_chunk) if use_llm_insights else None
+        self.report_agent = ReportAgent(reports_dir=workspace.reports_dir if workspace else "reports")
 
-        # STEP 2 — Basic EDA (missing values, stats, correlation, etc.)
-        context = self.eda_agent.run(context)
+        # Optional stages scheduled in the same graph
+        self.ml_target = ml_target
+        self.run_clustering = run_clustering
+        self.max_workers = max_workers
 
-        # STEP 3 — Generate all visuals (10+ advanced plots)
-        context = self.viz_agent.run(context)
+        # Instrumentation: JSON run record per run, optional Prometheus textfile
+        self.metrics_dir = metrics_dir
+        self.prometheus_textfile = prometheus_textfile
+        self.trace_memory = trace_memory
 
-        # STEP 4 — Add rule-based insights (numeric, categorical, outliers)
-        context = self.rule_insights_agent.run(context)
+    def build_stages(self):
+        stages = [
+            # STEP 1 — Load Data
+            stage_for("load", self.data_loader),
+            # STEP 2 — Basic EDA (missing values, stats, correlation, etc.)
+            stage_for("eda", self.eda_agent),
+            # STEP 3 — Generate all visuals (10+ advanced plots)
+            stage_for("visualize", self.viz_agent),
+            # STEP 4 — Add rule-based insights (numeric, categorical, outliers)
+            stage_for("rule_insights", self.rule_insights_agent),
+        ]
 
         # STEP 5 — Add LLM-based advanced analytical insights
         if self.llm_insights_agent is not None:
-            context = self.llm_insights_agent.run(context)
+            stages.append(stage_for("llm_insights", self.llm_insights_agent, optional=True))
+
+        # Optional ML / clustering stages (only need the loaded frame)
+        if self.ml_target is not None:
+            ml_agent = MLAgent(output_dir=self.plots_dir, render_cache_dir=self.render_cache_dir)
+            stages.append(stage_for("ml", ml_agent, self.ml_target, optional=True))
+            stages.append(stage_for("ml_insights", MLInsightsAgent(), optional=True))
+        if self.run_clustering:
+            # In streaming mode clustering also streams the file instead of using the sample
+            clustering_agent = ClusteringAgent(
+                plots_dir=self.plots_dir, render_cache_dir=self.render_cache_dir,
+                chunksize=self.data_loader.chunksize,
+            )
+            stages.append(stage_for("clustering", clustering_agent, optional=True))
+            stages.append(stage_for("clustering_insights", ClusteringInsightsAgent(), optional=True))
 
         # STEP 6 — Generate final report
-        context = self.report_agent.run(context)
+        stages.append(stage_for("report", self.report_agent))
+        return stages
 
-        print("[PlannerAgent] Pipeline completed successfully.")
+    def run_pipeline(self, context: AgentContext, on_progress=None, should_stop=None) -> AgentContext:
+        print("[PlannerAgent] Starting analysis pipeline...")
+
+        # Stages run concurrently wherever their declared context fields allow
+        start = time.perf_counter()
+        try:
+            context = run_stages(
+                self.build_stages(), context,
+                max_workers=self.max_workers, trace_memory=self.trace_memory,
+                on_progress=on_progress, should_stop=should_stop,
+            )
+        finally:
+            self.export_metrics(context, time.perf_counter() - start)
+
+        if context.stage_errors:
+            print("[PlannerAgent] Pipeline completed with stage errors:", context.stage_errors)
+        else:
+            print("[PlannerAgent] Pipeline completed successfully.")
         return context
-    
+
+    def export_metrics(self, context: AgentContext, total_wall_seconds: float):
+        if self.metrics_dir:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = os.path.join(self.metrics_dir, f"run_{timestamp}.json")
+            context.summary["run_record_path"] = write_run_record(context, path, round(total_wall_seconds, 4))
+            print(f"[PlannerAgent] Run record written to {path}")
+        if self.prometheus_textfile:
+            write_prometheus_textfile(context, self.prometheus_textfile)
+
     def run_feature_importance(self, context: AgentContext, target_column: str) -> AgentContext:
-        ml_agent = MLAgent()
+        ml_agent = MLAgent(output_dir=self.plots_dir, render_cache_dir=self.render_cache_dir)
         ml_insight_agent = MLInsightsAgent()
 
-        context = ml_agent.run(context, target_column)
-        context = ml_insight_agent.run(context)
+        with measure("ml", context, trace_memory=self.trace_memory):
+            context = ml_agent.run(context, target_column)
+        with measure("ml_insights", context, trace_memory=self.trace_memory):
+            context = ml_insight_agent.run(context)
 
         return context
\ No newline at end of file
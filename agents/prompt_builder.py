@@ -0,0 +1,152 @@
+import json
+import math
+
+
+# Progressively smaller prompt shapes: (top correlations, columns detailed, sample rows)
+COMPACTION_LEVELS = [(25, 30, 5), (15, 20, 3), (10, 12, 2), (5, 8, 1), (3, 5, 0)]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for JSON-ish English)."""
+    return len(text) // 4 + 1
+
+
+def compact_json(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"), default=str)
+
+
+def _round(value, digits=3):
+    if isinstance(value, float):
+        return None if math.isnan(value) else round(value, digits)
+    return value
+
+
+def top_correlations(correlation: dict, k: int):
+    """Strongest off-diagonal pairs as [col_a, col_b, r], by |r|."""
+    columns = list(correlation)
+    pairs = []
+    for i, a in enumerate(columns):
+        for b in columns[i + 1:]:
+            r = correlation[a].get(b)
+            if r is not None and not math.isnan(r):
+                pairs.append((abs(r), a, b, r))
+    pairs.sort(reverse=True)
+    return [[a, b, _round(r)] for _, a, b, r in pairs[:k]]
+
+
+def rank_anomalous_columns(summary: dict):
+    """Columns ordered by how much they deserve the model's attention."""
+    rows = max(summary.get("num_rows") or 1, 1)
+    missing = summary.get("missing_percentage", {})
+    scores = {}
+    for col, stats in summary.get("numeric_stats", {}).items():
+        skew = stats.get("skewness")
+        skew = 0.0 if skew is None or math.isnan(skew) else abs(skew)
+        scores[col] = skew + 10 * stats.get("outliers", 0) / rows + missing.get(col, 0) / 10
+    for col in summary.get("categorical_stats", {}):
+        scores[col] = missing.get(col, 0) / 10
+    return sorted(scores, key=lambda col: scores[col], reverse=True)
+
+
+def summarize_plots(visual_structure: dict | None, max_columns: int):
+    """Plot counts per section plus the columns they cover, without file paths."""
+    result = {}
+    for section, items in (visual_structure or {}).items():
+        if not items:
+            continue
+        columns = [item.get("column") or item.get("numeric") for item in items]
+        columns = [c for c in columns if c is not None]
+        entry = {"plots": len(items)}
+        if columns:
+            entry["columns"] = columns[:max_columns]
+            if len(columns) > max_columns:
+                entry["more_columns"] = len(columns) - max_columns
+        result[section] = entry
+    return result
+
+
+def build_payload(summary, visual_structure, sample_rows, n_corr, n_cols, n_sample):
+    ranked = rank_anomalous_columns(summary)[:n_cols]
+    numeric_stats = summary.get("numeric_stats", {})
+    cat_stats = summary.get("categorical_stats", {})
+    missing = summary.get("missing_percentage", {})
+
+    payload = {
+        "num_rows": summary.get("num_rows"),
+        "num_columns": summary.get("num_columns"),
+        "column_types": {
+            "numeric": len(summary.get("numeric_columns", [])),
+            "categorical": len(summary.get("categorical_columns", [])),
+            "datetime": summary.get("datetime_columns", [])[:n_cols],
+            "boolean": len(summary.get("boolean_columns", [])),
+        },
+        "duplicate_rows": summary.get("duplicate_rows"),
+        "missing_pct": dict(sorted(
+            ((c, _round(p, 2)) for c, p in missing.items() if p > 0),
+            key=lambda item: item[1], reverse=True,
+        )[:n_cols]),
+        "notable_numeric": {
+            col: {k: _round(v) for k, v in numeric_stats[col].items()}
+            for col in ranked if col in numeric_stats
+        },
+        "notable_categorical": {
+            col: {
+                "unique": cat_stats[col]["unique_values"],
+                "top": dict(list(cat_stats[col]["top_categories"].items())[:3]),
+            }
+            for col in ranked if col in cat_stats
+        },
+        "top_correlations": top_correlations(summary.get("correlation", {}), n_corr),
+        "plots": summarize_plots(visual_structure, n_cols),
+    }
+    if n_sample and sample_rows:
+        keep = set(ranked)
+        payload["sample_rows"] = [
+            {k: v for k, v in row.items() if k in keep} for row in sample_rows[:n_sample]
+        ]
+    return payload
+
+
+# Payload sections dropped (least useful first) when even the last level is too big
+DROP_ORDER = [
+    "plots", "sample_rows", "notable_categorical", "top_correlations",
+    "missing_pct", "notable_numeric", "column_types",
+]
+
+
+def render_prompt(payload) -> str:
+    return (
+        "DATASET SUMMARY (compact JSON; notable_* lists the most anomalous columns, "
+        "top_correlations holds the strongest pairs as [a, b, r]):\n"
+        f"{compact_json(payload)}\n\n"
+        "Generate graph-aware insights."
+    )
+
+
+def build_dataset_prompt(summary, visual_structure, sample_rows, token_budget: int = 6000):
+    """Compact user prompt that fits `token_budget`, shrinking detail as needed.
+
+    Returns (prompt, stats) where stats records the estimated tokens, the
+    compaction level used and any payload sections dropped to fit. Raises
+    ValueError when not even the bare row/column counts fit the budget.
+    """
+    for level, (n_corr, n_cols, n_sample) in enumerate(COMPACTION_LEVELS):
+        payload = build_payload(summary, visual_structure, sample_rows, n_corr, n_cols, n_sample)
+        prompt = render_prompt(payload)
+        tokens = estimate_tokens(prompt)
+        if tokens <= token_budget:
+            break
+
+    # Last resort: drop whole sections of the smallest payload
+    dropped = []
+    for key in DROP_ORDER:
+        if tokens <= token_budget:
+            break
+        if payload.pop(key, None) is not None:
+            dropped.append(key)
+            prompt = render_prompt(payload)
+            tokens = estimate_tokens(prompt)
+    if tokens > token_budget:
+        raise ValueError(f"token_budget={token_budget} is too small for the dataset prompt ({tokens} tokens)")
+
+    return prompt, {"estimated_tokens": tokens, "level": level, "token_budget": token_budget, "dropped": dropped}
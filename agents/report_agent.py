@@ -1,44 +1,28 @@
 import os
 import datetime
 from . import AgentContext
+from utils.report_renderer import ReportRenderer
 
 
 class ReportAgent:
-    def __init__(self, reports_dir: str = "reports"):
+    # Context fields used by the planner to build the stage graph
+    reads = ("summary", "insights", "plots", "feature_importance", "clustering")
+    writes = ("report_path", "report_files")
+
+    def __init__(self, reports_dir: str = "reports", formats=("md", "html", "json")):
         self.reports_dir = reports_dir
+        self.formats = formats
         os.makedirs(self.reports_dir, exist_ok=True)
 
     def run(self, context: AgentContext) -> AgentContext:
-        print("[ReportAgent] Creating markdown report...")
-
-        summary = context.summary
-        insights = context.insights
-        plots = context.plots
+        print("[ReportAgent] Rendering report...")
 
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_path = os.path.join(self.reports_dir, f"report_{timestamp}.md")
-
-        with open(report_path, "w", encoding="utf-8") as f:
-            f.write(f"# 📊 AI Multi-Agent Data Analyst Report\n\n")
-            f.write(f"Generated on: `{timestamp}`\n\n")
-
-            # Basic summary
-            f.write("## 📁 Dataset Overview\n\n")
-            f.write(f"- Rows: **{summary.get('num_rows')}**\n")
-            f.write(f"- Columns: **{summary.get('num_columns')}**\n\n")
-
-            f.write("### Columns & Types\n\n")
-            for col, dtype in summary.get("dtypes", {}).items():
-                f.write(f"- **{col}**: `{dtype}`\n")
-            f.write("\n")
-
 
-            # Insights
-            f.write("## 💡 Key Insights\n\n")
-            for ins in insights:
-                f.write(f"- {ins}\n")
-            f.write("\n")
+        # Markdown, HTML and JSON all come from one pass over the context
+        renderer = ReportRenderer(context)
+        context.report_files = renderer.write(self.reports_dir, stem=f"report_{timestamp}", formats=self.formats)
+        context.report_path = context.report_files.get("md")
 
-        context.report_path = report_path
-        print(f"[ReportAgent] Report generated at: {report_path}")
-        return context
\ No newline at end of file
+        print(f"[ReportAgent] Report generated: {context.report_files}")
+        return context
@@ -1,21 +1,218 @@
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Tuple
+
+import matplotlib
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
 from . import AgentContext
+from utils.plot_aggregates import column_aggregate
+from utils.render_cache import RenderCache
+
+
+# =======================================================
+# PLOT RENDERERS
+# Object-oriented Figure/Agg API only (no pyplot state), so they are safe
+# to run from worker threads or processes.
+# =======================================================
+def new_figure(figsize, ncols=1):
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, (fig.subplots(1, ncols) if ncols > 1 else fig.add_subplot())
+
+
+def horizontal():
+    # Axes.bxp / Axes.violin switched from vert= to orientation= in matplotlib 3.10
+    major, minor = (int(part) for part in matplotlib.__version__.split(".")[:2])
+    return {"orientation": "horizontal"} if (major, minor) >= (3, 10) else {"vert": False}
+
+
+def render_distribution(path, agg, col):
+    fig, ax = new_figure((6, 4))
+    edges = agg["edges"]
+    ax.stairs(agg["counts"], edges, fill=True, alpha=0.5, edgecolor="white")
+    # KDE density rescaled to histogram counts
+    ax.plot(agg["kde_x"], agg["kde_y"] * agg["n"] * (edges[1] - edges[0]))
+    ax.set_xlabel(col)
+    ax.set_ylabel("Count")
+    ax.set_title(f"Distribution of {col}")
+    fig.savefig(path, bbox_inches="tight")
+
+
+def render_boxplot(path, agg, col):
+    fig, ax = new_figure((6, 4))
+    ax.bxp([agg["box"]], widths=0.6, patch_artist=True, **horizontal())
+    ax.set_yticks([])
+    ax.set_xlabel(col)
+    ax.set_title(f"Outlier Detection: {col}")
+    fig.savefig(path, bbox_inches="tight")
+
+
+def render_violin(path, agg, col):
+    fig, ax = new_figure((6, 4))
+    ax.violin([agg["violin"]], showmedians=True, **horizontal())
+    ax.set_yticks([])
+    ax.set_xlabel(col)
+    ax.set_title(f"Violin Plot: {col}")
+    fig.savefig(path, bbox_inches="tight")
+
+
+def render_category_frequency(path, counts, col):
+    fig, ax = new_figure((8, 5))
+    counts.plot(kind="bar", ax=ax)
+    ax.set_title(f"Top 10 Categories: {col}")
+    fig.savefig(path, bbox_inches="tight")
+
+
+def render_category_mean(path, means, col_cat, col_num):
+    fig, ax = new_figure((10, 5))
+    means.plot(kind="bar", ax=ax)
+    ax.set_title(f"Avg {col_num} per Category of {col_cat}")
+    fig.savefig(path, bbox_inches="tight")
+
+
+def render_heatmap(path, corr):
+    fig, ax = new_figure((10, 6))
+    sns.heatmap(corr, annot=True, cmap="coolwarm", ax=ax)
+    ax.set_title("Correlation Heatmap")
+    fig.savefig(path, bbox_inches="tight")
+
+
+def render_time_series(path, dates, values, date_col, num_col):
+    fig, ax = new_figure((10, 5))
+    ax.plot(dates, values)
+    ax.set_title(f"Trend of {num_col} over {date_col}")
+    fig.savefig(path, bbox_inches="tight")
+
+
+@dataclass
+class PlotJob:
+    section: str
+    filename: str
+    renderer: Callable
+    args: Tuple
+    meta: Dict[str, Any] = field(default_factory=dict)
+    path: str = ""
+
+
+def run_plot_job(job: PlotJob) -> str:
+    job.renderer(job.path, *job.args)
+    return job.path
 
 
 class VisualizationAgent:
-    def __init__(self, plots_dir="plots"):
+    # Context fields used by the planner to build the stage graph
+    reads = ("df", "profile", "summary")
+    writes = ("plots", "visual_structure")
+
+    def __init__(self, plots_dir="plots", workers: int = 1, executor: str = "process",
+                 pairplot_rows: int = 5000, use_render_cache: bool = True,
+                 render_cache_dir: str | None = None):
+        # workers > 1 renders independent plots concurrently;
+        # executor is "process" (true parallelism) or "thread"
         self.plots_dir = plots_dir
+        self.pairplot_rows = pairplot_rows
+        self.workers = workers
+        self.executor = executor
         os.makedirs(self.plots_dir, exist_ok=True)
+        # Content-addressed PNGs: unchanged inputs reuse the existing image
+        # (render_cache_dir lets per-run plot directories share one cache)
+        self.render_cache = (
+            RenderCache(render_cache_dir or os.path.join(plots_dir, "cache")) if use_render_cache else None
+        )
 
-    def save_plot(self, fig, filename):
-        path = os.path.join(self.plots_dir, filename)
-        fig.savefig(path, bbox_inches="tight")
-        plt.close(fig)
-        return path
+    def plot_path(self, filename, *inputs):
+        if self.render_cache is None:
+            return os.path.join(self.plots_dir, filename)
+        return self.render_cache.path(filename, *inputs)
+
+    def is_cached(self, path):
+        return self.render_cache is not None and self.render_cache.hit(path)
+
+    def numeric_aggregates(self, context: AgentContext, numeric_cols):
+        """Histogram/box/KDE summaries per column, reusing EDA quantiles.
+
+        With a streamed profile the full-data quantile sketch is used instead
+        of the row sample.
+        """
+        numeric_stats = context.summary.get("numeric_stats", {})
+        profile = context.profile
+        aggregates = {}
+        for col in numeric_cols:
+            if profile is not None and col in profile.numeric:
+                values, weights = profile.numeric[col].sketch.weighted_items()
+            else:
+                values, weights = context.df[col].to_numpy(dtype=float, na_value=float("nan")), None
+            aggregates[col] = column_aggregate(values, weights, stats=numeric_stats.get(col))
+        return aggregates
+
+    def build_jobs(self, df, numeric_cols, categorical_cols, date_cols, aggregates):
+        jobs = []
+        plotted = [col for col in numeric_cols if aggregates.get(col) is not None]
+
+        # 1. DISTRIBUTION PLOTS
+        for col in plotted:
+            jobs.append(PlotJob("distribution", f"dist_{col}.png", render_distribution,
+                                (aggregates[col], col), {"column": col}))
+
+        # 2. OUTLIER DETECTION (Boxplots)
+        for col in plotted:
+            jobs.append(PlotJob("outliers", f"box_{col}.png", render_boxplot,
+                                (aggregates[col], col), {"column": col}))
+
+        # 3. VIOLIN PLOTS (Spread + Shape)
+        for col in plotted:
+            jobs.append(PlotJob("violin", f"violin_{col}.png", render_violin,
+                                (aggregates[col], col), {"column": col}))
+
+        # 4. CATEGORY FREQUENCY (Top 10)
+        for col in categorical_cols:
+            jobs.append(PlotJob("category_frequency", f"cat_top10_{col}.png", render_category_frequency,
+                                (df[col].value_counts().head(10), col), {"column": col}))
+
+        # 5. CATEGORY VS NUMERIC MEAN
+        if numeric_cols and categorical_cols:
+            col_cat = categorical_cols[0]
+            col_num = numeric_cols[0]
+            means = df.groupby(col_cat, observed=True)[col_num].mean().sort_values(ascending=False).head(10)
+            jobs.append(PlotJob("category_numeric_mean", "cat_vs_num_mean.png", render_category_mean,
+                                (means, col_cat, col_num), {"category": col_cat, "numeric": col_num}))
+
+        # 7. CORRELATION HEATMAP
+        if len(numeric_cols) > 1:
+            jobs.append(PlotJob("correlation", "correlation_heatmap.png", render_heatmap,
+                                (df[numeric_cols].corr(),)))
+
+        # 9. TIME SERIES
+        if date_cols and numeric_cols:
+            date_col = date_cols[0]
+            num_col = numeric_cols[0]
+            sorted_df = df.sort_values(by=date_col)
+            jobs.append(PlotJob("time_series", f"time_series_{num_col}.png", render_time_series,
+                                (sorted_df[date_col], sorted_df[num_col], date_col, num_col),
+                                {"date_column": date_col, "numeric": num_col}))
+
+        return jobs
+
+    def render_jobs(self, jobs):
+        """Render jobs, returning paths in job order regardless of completion order."""
+        if self.workers <= 1 or len(jobs) <= 1:
+            return [run_plot_job(job) for job in jobs]
+
+        if self.executor == "process":
+            # spawn: the planner calls this from worker threads, and forking a
+            # multi-threaded process can deadlock the children
+            pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.workers)
+        with pool:
+            return list(pool.map(run_plot_job, jobs))
 
     def run(self, context: AgentContext) -> AgentContext:
         df = context.df
@@ -23,9 +220,11 @@ class VisualizationAgent:
             raise ValueError("DataFrame not loaded.")
 
         print("[VisualizationAgent] Generating structured visualizations...")
+        if self.render_cache is not None:
+            self.render_cache.hits = self.render_cache.misses = 0
 
         numeric_cols = df.select_dtypes(include="number").columns.tolist()
-        categorical_cols = df.select_dtypes(include="object").columns.tolist()
+        categorical_cols = df.select_dtypes(include=["object", "category"]).columns.tolist()
         date_cols = df.select_dtypes(include=["datetime64", "datetime"]).columns.tolist()
 
         # Fully structured dict for plots
@@ -41,102 +240,36 @@ class VisualizationAgent:
             "time_series": [],
         }
 
-        # =======================================================
-        # 1. DISTRIBUTION PLOTS
-        # =======================================================
-        for col in numeric_cols:
-            fig = plt.figure(figsize=(6, 4))
-            sns.histplot(df[col].dropna(), kde=True)
-            plt.title(f"Distribution of {col}")
-            path = self.save_plot(fig, f"dist_{col}.png")
-            visual_structure["distribution"].append({"column": col, "path": path})
-
-        # =======================================================
-        # 2. OUTLIER DETECTION (Boxplots)
-        # =======================================================
-        for col in numeric_cols:
-            fig = plt.figure(figsize=(6, 4))
-            sns.boxplot(x=df[col])
-            plt.title(f"Outlier Detection: {col}")
-            path = self.save_plot(fig, f"box_{col}.png")
-            visual_structure["outliers"].append({"column": col, "path": path})
-
-        # =======================================================
-        # 3. VIOLIN PLOTS (Spread + Shape)
-        # =======================================================
-        for col in numeric_cols:
-            fig = plt.figure(figsize=(6, 4))
-            sns.violinplot(x=df[col])
-            plt.title(f"Violin Plot: {col}")
-            path = self.save_plot(fig, f"violin_{col}.png")
-            visual_structure["violin"].append({"column": col, "path": path})
+        aggregates = self.numeric_aggregates(context, numeric_cols)
+        jobs = self.build_jobs(df, numeric_cols, categorical_cols, date_cols, aggregates)
+        for job in jobs:
+            job.path = self.plot_path(job.filename, job.renderer.__name__, job.args)
+        self.render_jobs([job for job in jobs if not self.is_cached(job.path)])
+        for job in jobs:
+            visual_structure[job.section].append({**job.meta, "path": job.path})
 
         # =======================================================
-        # 4. CATEGORY FREQUENCY (Top 10)
-        # =======================================================
-        for col in categorical_cols:
-            fig = plt.figure(figsize=(8, 5))
-            df[col].value_counts().head(10).plot(kind='bar')
-            plt.title(f"Top 10 Categories: {col}")
-            path = self.save_plot(fig, f"cat_top10_{col}.png")
-            visual_structure["category_frequency"].append({"column": col, "path": path})
-
-        # =======================================================
-        # 5. CATEGORY VS NUMERIC MEAN
-        # =======================================================
-        if numeric_cols and categorical_cols:
-            col_cat = categorical_cols[0]
-            col_num = numeric_cols[0]
-
-            fig = plt.figure(figsize=(10, 5))
-            df.groupby(col_cat)[col_num].mean().sort_values(ascending=False).head(10).plot(kind='bar')
-            plt.title(f"Avg {col_num} per Category of {col_cat}")
-            path = self.save_plot(fig, "cat_vs_num_mean.png")
-            visual_structure["category_numeric_mean"].append(
-                {"category": col_cat, "numeric": col_num, "path": path}
-            )
-
-        # =======================================================
-        # 7. CORRELATION HEATMAP
-        # =======================================================
-        if len(numeric_cols) > 1:
-            fig = plt.figure(figsize=(10, 6))
-            sns.heatmap(df[numeric_cols].corr(), annot=True, cmap="coolwarm")
-            plt.title("Correlation Heatmap")
-            path = self.save_plot(fig, "correlation_heatmap.png")
-            visual_structure["correlation"].append({"path": path})
-
-        # =======================================================
-        # 8. PAIRPLOT
+        # 8. PAIRPLOT (figure-level seaborn API, rendered in this thread)
         # =======================================================
         if 2 <= len(numeric_cols) <= 5:
-            sns_plot = sns.pairplot(df[numeric_cols].dropna())
-            path = os.path.join(self.plots_dir, "pairplot.png")
-            sns_plot.savefig(path)
-            plt.close()
+            pair_df = df[numeric_cols].dropna()
+            if len(pair_df) > self.pairplot_rows:
+                pair_df = pair_df.sample(self.pairplot_rows, random_state=42)
+            path = self.plot_path("pairplot.png", "pairplot", pair_df)
+            if not self.is_cached(path):
+                sns_plot = sns.pairplot(pair_df)
+                sns_plot.savefig(path)
+                plt.close()
             visual_structure["pairplot"].append({"columns": numeric_cols, "path": path})
 
-        # =======================================================
-        # 9. TIME SERIES
-        # =======================================================
-        if date_cols:
-            date_col = date_cols[0]
-            sorted_df = df.sort_values(by=date_col)
-            num_col = numeric_cols[0]
-
-            fig = plt.figure(figsize=(10, 5))
-            plt.plot(sorted_df[date_col], sorted_df[num_col])
-            plt.title(f"Trend of {num_col} over {date_col}")
-            path = self.save_plot(fig, f"time_series_{num_col}.png")
-            visual_structure["time_series"].append(
-                {"date_column": date_col, "numeric": num_col, "path": path}
-            )
-
         # SAVE IN CONTEXT
         context.visual_structure = visual_structure
         context.plots = [item["path"] for section in visual_structure.values() for item in section]
-        context.summary["plot_list"] = context.plots
-        context.summary["structured_plots"] = visual_structure
 
-        print("[VisualizationAgent] Structured visualization complete.")
-        return context
\ No newline at end of file
+        if self.render_cache is not None:
+            self.render_cache.evict(keep=context.plots)
+            print(f"[VisualizationAgent] Render cache: {self.render_cache.hits} reused, "
+                  f"{self.render_cache.misses} rendered.")
+
+        print(f"[VisualizationAgent] Structured visualization complete ({len(context.plots)} plots).")
+        return context
@@ -1,10 +1,143 @@
 import os
+import tempfile
 import streamlit as st
 import pandas as pd
 
 from agents import AgentContext
-from agents.planner_agent import PlannerAgent
-from agents.llm_client import generate_llm_response
+from agents.job_manager import JobManager, JobQueueFull
+from agents.llm_client import stream_llm_response
+from agents.chat_agent import ChatAgent
+from utils.disk_cache import data_digest, file_digest, touch
+from utils.dtype_optimizer import date_parse_settings
+from utils.lru_store import LRUStore
+from utils.model_registry import ModelRegistry
+from utils.query_engine import CsvSource, QueryEngine
+from utils.report_renderer import ReportRenderer
+from utils.workspace import RunWorkspace
+
+
+# ==========================================
+# SHARED RESULT CACHES (all sessions)
+# ==========================================
+@st.cache_resource
+def get_job_manager():
+    # Shared by every session: bounded worker processes plus a short queue
+    return JobManager(max_workers=2, max_queued=4)
+
+
+@st.cache_resource
+def get_query_engine():
+    # One result cache shared by every session (keyed by dataset hash + plan)
+    return QueryEngine()
+
+
+@st.cache_resource
+def get_model_registry():
+    # Fitted models on disk (models/), reused across sessions and server restarts
+    return ModelRegistry("models")
+
+
+@st.cache_resource
+def get_insight_store():
+    # LLM insight texts keyed by (dataset hash, agent, parameters). They are
+    # streamed into placeholders, which st.cache_data cannot replay.
+    return LRUStore(max_entries=64)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def run_ml_analysis(dataset_hash, target_col, estimator, fast, time_budget, held_out, _df, _dataset_path):
+    from agents.ml_agent import MLAgent
+
+    context = AgentContext(dataset_path=_dataset_path)
+    context.df = _df
+    ml = MLAgent(estimator=estimator, fast=fast, time_budget=time_budget, held_out=held_out,
+                 registry=get_model_registry())
+    return ml.run(context, target_col).feature_importance
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def run_ml_batch(dataset_hash, target_cols, estimator, fast, time_budget, held_out, _df, _dataset_path):
+    from agents.ml_agent import MLAgent
+
+    context = AgentContext(dataset_path=_dataset_path)
+    context.df = _df
+    ml = MLAgent(estimator=estimator, fast=fast, time_budget=time_budget, held_out=held_out,
+                 registry=get_model_registry())
+    return ml.run_many(context, list(target_cols)).feature_importance_batch
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def run_clustering(dataset_hash, chunksize, _df, _dataset_path):
+    from agents.clustering_agent import ClusteringAgent
+
+    context = AgentContext(dataset_path=_dataset_path)
+    context.df = _df
+    return ClusteringAgent(chunksize=chunksize).run(context).clustering
+
+
+def pdf_exporter(workspace_root):
+    from utils.pdf_exporter import PDFExporter
+
+    # Downsampled plot images are shared across runs; section manifests stay in the run's workspace
+    reports_dir = RunWorkspace(workspace_root).reports_dir
+    return PDFExporter(image_cache_dir="plots/cache/pdf", manifest_dir=os.path.join(reports_dir, "manifests"))
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def export_pdf(workspace_root, dataset_hash, report_digest, changed_only, manifest_digest, _report_text, _plots):
+    """Build the PDF in the run's reports directory; returns (stats, bytes).
+
+    Cached per run, dataset, report content and mode; changed-only exports
+    are also keyed by the manifest of the full export they are compared with.
+    """
+    output_path = os.path.join(RunWorkspace(workspace_root).reports_dir, "report.pdf")
+    stats = pdf_exporter(workspace_root).export(
+        _report_text, _plots, output_path, changed_only=changed_only, manifest_key=dataset_hash
+    )
+    with open(stats["path"], "rb") as f:
+        return stats, f.read()
+
+
+def show_image(path):
+    # Shared plot caches are LRU-bounded, so a long-lived session can outlive its files
+    if path and os.path.exists(path):
+        st.image(path, use_container_width=True)
+    else:
+        st.caption(f"🗑️ {os.path.basename(path or '')} is no longer cached; re-run the analysis to redraw it.")
+
+
+def keep_session_files_alive():
+    """Refresh this session's workspace and plots so pruning and LRU eviction skip them."""
+    workspace_root = st.session_state.get("workspace_root")
+    if workspace_root and not RunWorkspace(workspace_root).touch():
+        st.warning("This analysis' files have expired; upload and run the analysis again.")
+    for path in st.session_state.get("plots") or []:
+        if os.path.exists(path):
+            touch(path)
+
+
+def cached_insights(key, agent, context, placeholder):
+    """Run an insight agent (streaming into placeholder) unless its text is already stored."""
+    store = get_insight_store()
+    text = store.get(key)
+    if text is None:
+        agent.on_chunk = markdown_stream(placeholder)
+        text = agent.run(context).insights[-1]
+        store.put(key, text)
+    placeholder.markdown(text, unsafe_allow_html=True)
+    return text
+
+
+def markdown_stream(placeholder, header=""):
+    """on_chunk callback re-rendering the streamed text so far into a placeholder."""
+    parts = []
+
+    def on_chunk(chunk):
+        parts.append(chunk)
+        placeholder.markdown(header + "".join(parts) + "▌", unsafe_allow_html=True)
+
+    return on_chunk
+
 
 # ==========================================
 # SESSION STATE INITIALIZATION
@@ -21,6 +154,9 @@ if "plots" not in st.session_state:
 if "report_path" not in st.session_state:
     st.session_state["report_path"] = None
 
+if "report_renderer" not in st.session_state:
+    st.session_state["report_renderer"] = None
+
 # ==========================================
 # STREAMLIT CONFIG
 # ==========================================
@@ -44,30 +180,77 @@ Upload a CSV, explore visualizations, generate insights, and chat with your data
 uploaded_file = st.file_uploader("📤 Upload your CSV file", type=["csv"])
 
 if uploaded_file is not None:
-    os.makedirs("data", exist_ok=True)
-    dataset_path = os.path.join("data", "uploaded.csv")
-
-    with open(dataset_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-
     st.success("✅ File uploaded successfully!")
 
+    large_file_mode = st.checkbox(
+        "🐘 Large file mode (stream the CSV in chunks, analyse a bounded sample)",
+        help="Statistics are computed over every row in one pass; plots and ML use a sample.",
+    )
+
     # ----------------------------
-    # RUN FULL ANALYSIS
+    # RUN FULL ANALYSIS (queued job in its own run workspace)
     # ----------------------------
-    if st.button("🚀 Run Full Analysis"):
-        with st.spinner("Running multi-agent analysis pipeline..."):
-            context = AgentContext(dataset_path=dataset_path)
-            planner = PlannerAgent(use_llm_insights=True)
-            context = planner.run_pipeline(context)
-
-        # Save to session_state
+    if st.button("🚀 Run Full Analysis", disabled=st.session_state.get("job_id") is not None):
+        try:
+            st.session_state["job_id"] = get_job_manager().submit(
+                uploaded_file.getvalue(),
+                use_llm_insights=True,
+                chunksize=200_000 if large_file_mode else None,
+            )
+        except JobQueueFull as e:
+            st.warning(f"⏳ Server busy: {e}")
+
+
+@st.fragment(run_every=1.0)
+def job_status_panel():
+    job_id = st.session_state.get("job_id")
+    if job_id is None:
+        return
+
+    manager = get_job_manager()
+    status = manager.status(job_id)
+
+    if status["state"] in ("queued", "running", "cancelling"):
+        running = [name for name, state in status["stages"].items() if state == "running"]
+        label = {
+            "queued": "⏳ Waiting for a free worker...",
+            "running": f"⚙️ Running: {', '.join(running) or 'starting'}",
+            "cancelling": "✖️ Cancelling after the current stages...",
+        }[status["state"]]
+        st.progress(status["completed"] / max(status["total"], 1), text=label)
+        if status["live_insights"]:
+            st.markdown("### 🤖 Graph-Aware LLM Insights\n" + status["live_insights"] + "▌")
+        if status["state"] != "cancelling" and st.button("✖️ Cancel analysis"):
+            manager.cancel(job_id)
+        return
+
+    # Finished: hand the result to the session and redraw the whole page
+    if status["state"] == "done":
+        context = manager.result(job_id)
         st.session_state["context"] = context
+        st.session_state["workspace_root"] = status["workspace_root"]
         st.session_state["df"] = context.df
+        st.session_state["dataset_hash"] = data_digest(context.df)
         st.session_state["plots"] = context.plots
         st.session_state["report_path"] = context.report_path
+        # Sections are built once per run; every format renders from them
+        st.session_state["report_renderer"] = ReportRenderer(context)
+        st.toast("🎉 Analysis Completed!")
+    elif status["state"] == "cancelled":
+        st.toast("Analysis cancelled.")
+    else:
+        st.session_state["job_error"] = status["error"]
+
+    manager.forget(job_id)
+    st.session_state["job_id"] = None
+    st.rerun()
 
-        st.success("🎉 Analysis Completed!")
+
+job_status_panel()
+keep_session_files_alive()
+
+if st.session_state.get("job_error"):
+    st.error(f"Analysis failed: {st.session_state.pop('job_error')}")
 
 
 # ==========================================
@@ -89,9 +272,12 @@ with tab1:
         st.info("Run full analysis to generate the report.")
         st.stop()
 
-    # Show report markdown
-    with open(context.report_path, "r", encoding="utf-8") as f:
-        st.markdown(f.read(), unsafe_allow_html=True)
+    renderer = st.session_state.get("report_renderer")
+    if renderer is None:
+        renderer = st.session_state["report_renderer"] = ReportRenderer(context)
+
+    # Overview and insights as text; the tables below are interactive
+    st.markdown(renderer.markdown(include=("overview", "insights")), unsafe_allow_html=True)
 
     # -----------------------------
     # NUMERIC TABLE
@@ -114,22 +300,62 @@ with tab1:
         st.subheader("❗ Missing Value Table")
         st.dataframe(context.summary["missing_table"])
 
-    # PDF EXPORT
-    from utils.pdf_exporter import export_report_to_pdf
+    # -----------------------------
+    # PIPELINE TIMING BREAKDOWN
+    # -----------------------------
+    if context.metrics:
+        with st.expander("⏱️ Pipeline Timing Breakdown"):
+            metrics_df = pd.DataFrame(context.metrics)
+            metrics_df["llm_seconds"] = metrics_df["llm_calls"].apply(
+                lambda calls: sum(c["latency_seconds"] for c in calls)
+            )
+            st.bar_chart(metrics_df.set_index("stage")[["wall_seconds", "cpu_seconds"]])
+            st.dataframe(metrics_df.drop(columns=["llm_calls", "started_at"]))
+            if context.stage_errors:
+                st.warning(f"Stage errors: {context.stage_errors}")
+
+    # HTML / JSON EXPORT (rendered from the in-memory sections)
+    st.markdown("### 📥 Download Report")
+    col_html, col_json, col_md = st.columns(3)
+    col_html.download_button(
+        "🌐 HTML (self-contained)", renderer.html(), "AI_Data_Analysis_Report.html", "text/html"
+    )
+    col_json.download_button(
+        "🧾 JSON summary", renderer.json(), "AI_Data_Analysis_Report.json", "application/json"
+    )
+    col_md.download_button(
+        "📝 Markdown", renderer.markdown(), "AI_Data_Analysis_Report.md", "text/markdown"
+    )
 
+    # PDF EXPORT
     st.markdown("### 📥 Download Report as PDF")
+    changed_only = st.checkbox(
+        "Only sections changed since the last full export",
+        help="Builds a small PDF with just the report sections and plots that differ from the last full "
+             "export of this dataset (from this or an earlier run).",
+    )
     if st.button("Generate PDF"):
-        pdf_path = export_report_to_pdf(
-            report_text=open(context.report_path, "r", encoding="utf-8").read(),
-            plots=context.plots
-        )
-        with open(pdf_path, "rb") as pdf_file:
-            st.download_button(
-                label="📄 Download PDF",
-                data=pdf_file,
-                file_name="AI_Data_Analysis_Report.pdf",
-                mime="application/pdf",
+        with st.spinner("Building PDF..."):
+            workspace_root = st.session_state["workspace_root"]
+            dataset_hash = st.session_state["dataset_hash"]
+            manifest_digest = None
+            if changed_only:
+                manifest_path = pdf_exporter(workspace_root).manifest_path(dataset_hash)
+                manifest_digest = file_digest(manifest_path) if os.path.exists(manifest_path) else None
+            pdf_stats, pdf_bytes = export_pdf(
+                workspace_root, dataset_hash, data_digest(renderer.digests), changed_only, manifest_digest,
+                renderer.markdown(header=False, images=False), renderer.images(),
             )
+        st.caption(
+            f"{pdf_stats['sections']} sections, {pdf_stats['plots']} plots, "
+            f"{pdf_stats['bytes'] / 1024 ** 2:.1f} MB in {pdf_stats['seconds']}s"
+        )
+        st.download_button(
+            label="📄 Download PDF",
+            data=pdf_bytes,
+            file_name="AI_Data_Analysis_Report_changes.pdf" if changed_only else "AI_Data_Analysis_Report.pdf",
+            mime="application/pdf",
+        )
 
 
 # ==========================================
@@ -154,7 +380,7 @@ with tab2:
 
         for i, p in enumerate(plots):
             with cols[i % 2]:
-                st.image(p["path"], use_container_width=True)
+                show_image(p["path"])
 
         st.markdown("---")
 
@@ -207,20 +433,54 @@ with tab4:
         st.stop()
 
     question = st.text_input("Ask your dataset something:")
+    exact_mode = st.checkbox(
+        "🧮 Compute answers over the full dataset",
+        value=True,
+        help="The AI writes a query plan (filter / group by / aggregate / sort / top-k) that runs "
+             "locally on every row; only the small result table is sent back for phrasing.",
+    )
 
     if st.button("Ask AI"):
-        schema_info = {
-            "columns": list(df.columns),
-            "dtypes": df.dtypes.astype(str).to_dict(),
-        }
-        sample_rows = df.head(5).to_dict(orient="records")
-
-        system_prompt = (
-            "You are a data analyst AI. Answer questions based strictly "
-            "using the provided schema and sample data."
-        )
+        st.markdown("### 🧠 Answer:")
+
+        if exact_mode:
+            answer_box = st.empty()
+            chat = ChatAgent(engine=get_query_engine())
+            # Large-file runs only keep a sample in memory: plans then scan the CSV in chunks
+            full_context = st.session_state["context"]
+            source, num_rows = None, None
+            if full_context.profile is not None:
+                source = CsvSource(
+                    full_context.dataset_path,
+                    date_settings=date_parse_settings(full_context.summary.get("dtype_optimization")),
+                )
+                num_rows = full_context.profile.num_rows
+            outcome = chat.ask(
+                df, question, st.session_state["dataset_hash"], on_chunk=markdown_stream(answer_box),
+                source=source, num_rows=num_rows,
+            )
+            answer_box.markdown(outcome["answer"], unsafe_allow_html=True)
+
+            if outcome["result"] is not None:
+                with st.expander("🔎 Query plan and exact result"):
+                    st.json(outcome["plan"])
+                    st.dataframe(outcome["result"])
+            elif outcome["error"]:
+                st.caption(f"Query plan rejected ({outcome['error']}); answered from a data sample.")
+
+        else:
+            schema_info = {
+                "columns": list(df.columns),
+                "dtypes": df.dtypes.astype(str).to_dict(),
+            }
+            sample_rows = df.head(5).to_dict(orient="records")
+
+            system_prompt = (
+                "You are a data analyst AI. Answer questions based strictly "
+                "using the provided schema and sample data."
+            )
 
-        user_prompt = f"""
+            user_prompt = f"""
 Schema:
 {schema_info}
 
@@ -231,11 +491,7 @@ User Question:
 {question}
 """
 
-        with st.spinner("AI interpreting data..."):
-            answer = generate_llm_response(system_prompt, user_prompt)
-
-        st.markdown("### 🧠 Answer:")
-        st.write(answer)
+            answer = st.write_stream(stream_llm_response(system_prompt, user_prompt))
 
 
 # ==========================================
@@ -251,25 +507,110 @@ with tab5:
 
     target_col = st.selectbox("Select Target Column", df.columns)
 
+    col_a, col_b, col_c = st.columns(3)
+    fast_mode = col_a.checkbox(
+        "⚡ Fast mode", value=True,
+        help="Train on a target-stratified sample (≤100k rows) and stop adding trees once the ranking is stable.",
+    )
+    estimator = col_b.selectbox(
+        "Model", ["random_forest", "hist_gradient_boosting"],
+        format_func=lambda name: name.replace("_", " ").title(),
+    )
+    time_budget = col_c.slider("Time budget (s)", 5, 120, 20, disabled=not fast_mode)
+    held_out = st.checkbox(
+        "Held-out permutation importance", value=False,
+        help="Also score each feature by how much shuffling it hurts the model on a held-out sample "
+             "(≤5k rows). Unlike impurity scores, this is not inflated for high-cardinality columns.",
+    )
+
     if st.button("Run ML Analysis"):
-        from agents.ml_agent import MLAgent
         from agents.ml_insights_agent import MLInsightsAgent
 
+        dataset_hash = st.session_state["dataset_hash"]
         with st.spinner("Training model & computing importance..."):
-            context = AgentContext(dataset_path="data/uploaded.csv")
+            dataset_path = st.session_state["context"].dataset_path
+            context = AgentContext(dataset_path=dataset_path)
             context.df = df
+            context.feature_importance = run_ml_analysis(
+                dataset_hash, target_col, estimator, fast_mode, time_budget, held_out,
+                _df=df, _dataset_path=dataset_path,
+            )
 
-            ml = MLAgent()
-            context = ml.run(context, target_col)
+        training = context.feature_importance["training"]
+        st.caption(
+            f"{training['estimator'].replace('_', ' ')}: {training['n_estimators']} estimators on "
+            f"{training['rows_used']:,} of {training['rows_total']:,} rows in {training['train_seconds']}s"
+            + (f" (stopped: {training['stopped']})" if training["stopped"] else "")
+        )
+        evaluation = context.feature_importance["evaluation"]
+        if evaluation:
+            st.caption(
+                f"Held-out score {evaluation['validation_score']} on {evaluation['validation_rows']:,} rows; "
+                f"permutation importance ({evaluation['repeats']} repeats) in {evaluation['seconds']}s"
+            )
 
-            ml_insights = MLInsightsAgent()
-            context = ml_insights.run(context)
+        st.session_state["model_key"] = context.feature_importance["model_key"]
 
         st.subheader("📊 Feature Importance Plot")
-        st.image(context.feature_importance["plot_path"], use_container_width=True)
+        show_image(context.feature_importance["plot_path"])
+        st.dataframe(pd.DataFrame(context.feature_importance["importance_table"]).set_index("feature"))
 
         st.subheader("🧠 ML Insights")
-        st.markdown(context.insights[-1], unsafe_allow_html=True)
+        cached_insights(
+            (dataset_hash, "MLInsightsAgent", target_col, estimator, fast_mode, time_budget, held_out),
+            MLInsightsAgent(), context, st.empty(),
+        )
+
+    # -----------------------------
+    # SCORE NEW DATA WITH THE LAST MODEL
+    # -----------------------------
+    model_key = st.session_state.get("model_key")
+    if model_key:
+        with st.expander(f"📦 Score a new CSV with model `{model_key}`"):
+            st.caption(f"From the command line: `python score.py {model_key} input.csv predictions.csv`")
+            to_score = st.file_uploader("CSV to score", type=["csv"], key="score_upload")
+            if to_score is not None and st.button("Score file"):
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    input_path = os.path.join(tmp_dir, "input.csv")
+                    with open(input_path, "wb") as f:
+                        f.write(to_score.getvalue())
+                    output_path = os.path.join(tmp_dir, "predictions.csv")
+                    try:
+                        with st.spinner("Scoring in chunks..."):
+                            scored = get_model_registry().score_csv(model_key, input_path, output_path)
+                        with open(output_path, "rb") as f:
+                            predictions = f.read()
+                    except ValueError as e:
+                        scored = None
+                        st.error(f"Could not score the file: {e}")
+                if scored is not None:
+                    st.success(f"Scored {scored['rows']:,} rows.")
+                    st.download_button("📄 Download predictions", predictions, "predictions.csv", "text/csv")
+
+    # -----------------------------
+    # BATCH: SEVERAL TARGETS AT ONCE
+    # -----------------------------
+    with st.expander("🎯 Compare several targets"):
+        batch_targets = st.multiselect("Target columns", df.columns)
+        if st.button("Run batch analysis", disabled=not batch_targets):
+            with st.spinner(f"Training {len(batch_targets)} models in parallel..."):
+                batch = run_ml_batch(
+                    st.session_state["dataset_hash"], tuple(batch_targets), estimator, fast_mode,
+                    time_budget, held_out, _df=df, _dataset_path=st.session_state["context"].dataset_path,
+                )
+            rows = []
+            for target, result in batch.items():
+                if "error" in result:
+                    st.warning(f"{target}: {result['error']}")
+                    continue
+                top = result["importance_table"][:5]
+                rows.append({
+                    "target": target,
+                    "task": result["task_type"],
+                    **{f"#{i + 1}": f"{r['feature']} ({r['importance']:.3f})" for i, r in enumerate(top)},
+                })
+            if rows:
+                st.dataframe(pd.DataFrame(rows).set_index("target"))
 
 with tab6:
     st.header("🌀 Clustering Analysis (KMeans)")
@@ -279,7 +620,6 @@ with tab6:
         st.info("Run analysis first.")
         st.stop()
 
-    from agents.clustering_agent import ClusteringAgent
     from agents.clustering_insights_agent import ClusteringInsightsAgent
 
     num_cols = df.select_dtypes(include="number").columns.tolist()
@@ -288,21 +628,32 @@ with tab6:
         st.stop()
 
     if st.button("Run Clustering"):
+        dataset_hash = st.session_state["dataset_hash"]
         with st.spinner("Clustering data..."):
-            context = AgentContext("data/uploaded.csv")
+            # Large-file runs cluster the whole CSV in chunks, not just the sample
+            full_context = st.session_state["context"]
+            chunksize = 200_000 if full_context.profile is not None else None
+            context = AgentContext(full_context.dataset_path)
             context.df = df
-
-            cluster_agent = ClusteringAgent()
-            context = cluster_agent.run(context)
-
-            cluster_insights = ClusteringInsightsAgent()
-            context = cluster_insights.run(context)
+            context.clustering = run_clustering(
+                dataset_hash, chunksize, _df=df, _dataset_path=full_context.dataset_path
+            )
 
         st.subheader("📊 Cluster Scatter Plot")
-        st.image(context.clustering["plot_path"], use_container_width=True)
+        show_image(context.clustering["plot_path"])
 
         st.subheader("📘 Cluster Summary Table")
         st.dataframe(context.clustering["cluster_stats"])
 
+        k_selection = context.clustering.get("k_selection")
+        if k_selection:
+            with st.expander(f"📐 How K={context.clustering['n_clusters']} was chosen"):
+                scores = pd.DataFrame(k_selection["scores"]).set_index("k")
+                st.line_chart(scores[["silhouette"]])
+                st.dataframe(scores)
+                st.caption(f"Scored on a sample of {k_selection['sample_rows']} scaled rows.")
+
         st.subheader("🧠 LLM Insights")
-        st.markdown(context.insights[-1], unsafe_allow_html=True)
+        cached_insights(
+            (dataset_hash, "ClusteringInsightsAgent"), ClusteringInsightsAgent(), context, st.empty()
+        )
@@ -0,0 +1,32 @@
+import argparse
+
+from utils.model_registry import ModelRegistry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV with a registered model.")
+    parser.add_argument("model_key", nargs="?", help="Key shown in the ML tab (omit with --list)")
+    parser.add_argument("input_csv", nargs="?")
+    parser.add_argument("output_csv", nargs="?")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--models-dir", default="models")
+    parser.add_argument("--list", action="store_true", help="List registered models")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.models_dir)
+    if args.list:
+        for entry in registry.entries():
+            print(f"{entry['key']}  target={entry['target_column']}  task={entry['task_type']}  "
+                  f"params={entry['params']}")
+        return
+
+    if not (args.model_key and args.input_csv and args.output_csv):
+        parser.error("model_key, input_csv and output_csv are required")
+    try:
+        registry.score_csv(args.model_key, args.input_csv, args.output_csv, chunksize=args.chunksize)
+    except ValueError as e:
+        parser.exit(1, f"error: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from agents import AgentContext
+from agents.clustering_agent import ClusteringAgent
+
+
+def test_streaming_cluster_stats_cover_every_row(tmp_path):
+    rng = np.random.default_rng(0)
+    centers = np.array([[0.0, 0.0], [10.0, 10.0], [-10.0, 10.0]])
+    values = np.vstack([c + rng.normal(size=(400, 2)) for c in centers])
+    values = values[rng.permutation(len(values))]  # chunks mix the blobs
+    df = pd.DataFrame(values, columns=["x", "y"])
+    df["label"] = "row"
+    df.loc[5, "x"] = np.nan  # incomplete rows are left out
+    path = tmp_path / "blobs.csv"
+    df.to_csv(path, index=False)
+
+    agent = ClusteringAgent(plots_dir=str(tmp_path / "plots"), use_render_cache=False, chunksize=250)
+    context = AgentContext(dataset_path=str(path))
+    context.df = df.sample(200, random_state=0)
+    clustering = agent.run(context, n_clusters=3).clustering
+
+    assert clustering["rows_clustered"] == len(df) - 1
+    assert sum(clustering["cluster_sizes"].values()) == len(df) - 1
+    stats = clustering["cluster_stats"]
+    assert list(stats.columns) == ["x", "y"]
+    # The chunked centroids land on the generating centers
+    found = sorted(map(tuple, stats.to_numpy().round()))
+    assert found == sorted(map(tuple, centers))
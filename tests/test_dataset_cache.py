@@ -0,0 +1,66 @@
+import os
+
+import pandas as pd
+import pytest
+
+from agents import AgentContext
+from agents.data_loader_agent import DataLoaderAgent
+from utils.dataset_cache import DatasetCache
+
+pytest.importorskip("pyarrow")
+
+
+CSV = "when,city,amount\n" + "2024-01-05,Paris,1.5\n2024-01-06,Lyon,2.5\n2024-01-07,Paris,3.0\n" * 20
+
+
+def load(path, cache, **kwargs):
+    context = AgentContext(dataset_path=str(path))
+    return DataLoaderAgent(cache=cache, **kwargs).run(context)
+
+
+def test_key_follows_content_and_options(tmp_path):
+    cache = DatasetCache(str(tmp_path / "cache"))
+    a, b = tmp_path / "a.csv", tmp_path / "b.csv"
+    a.write_text(CSV)
+    b.write_text(CSV)
+    assert cache.key(str(a)) == cache.key(str(b))  # same bytes, other path
+    assert cache.key(str(a), optimize=True) != cache.key(str(a), optimize=False)
+    b.write_text(CSV + "2024-01-08,Nice,4.0\n")
+    assert cache.key(str(a)) != cache.key(str(b))
+
+
+def test_second_load_is_a_cache_hit_with_the_same_frame(tmp_path):
+    cache = DatasetCache(str(tmp_path / "cache"))
+    path = tmp_path / "data.csv"
+    path.write_text(CSV)
+
+    first = load(path, cache)
+    assert first.summary["cache_hit"] is False
+    second = load(path, cache)
+    assert second.summary["cache_hit"] is True
+    pd.testing.assert_frame_equal(second.df, first.df)
+    # The dtype report (incl. date parse settings) is restored with the frame
+    assert second.summary["dtype_optimization"] == first.summary["dtype_optimization"]
+    assert pd.api.types.is_datetime64_any_dtype(second.df["when"])
+
+
+def test_edited_file_is_reparsed(tmp_path):
+    cache = DatasetCache(str(tmp_path / "cache"))
+    path = tmp_path / "data.csv"
+    path.write_text(CSV)
+    load(path, cache)
+
+    path.write_text(CSV + "2024-01-08,Nice,4.0\n")
+    edited = load(path, cache)
+    assert edited.summary["cache_hit"] is False
+    assert len(edited.df) == 61 and "Nice" in set(edited.df["city"].astype(str))
+
+
+def test_cache_is_bounded(tmp_path):
+    cache = DatasetCache(str(tmp_path / "cache"), max_bytes=1)
+    for i in range(3):
+        path = tmp_path / f"d{i}.csv"
+        path.write_text(CSV + f"2024-02-0{i + 1},X,{i}\n")
+        load(path, cache)
+    # Only the entry just written is kept once the cap is exceeded
+    assert len(os.listdir(cache.cache_dir)) == 1
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from utils.dtype_optimizer import date_parse_settings, optimize_dtypes, parse_dates_with
+
+
+def test_numeric_downcasts_are_lossless():
+    df = pd.DataFrame({
+        "small": np.arange(100, dtype=np.int64),
+        "big": np.arange(100, dtype=np.int64) * 10_000_000_000,
+        "halves": np.arange(100) / 2.0,
+        "precise": np.linspace(0, 1, 100) / 3.0,
+        "flag": np.arange(100) % 2 == 0,
+    })
+    out, report = optimize_dtypes(df)
+
+    assert out["small"].dtype == np.int8
+    assert out["big"].dtype == np.int64
+    assert out["halves"].dtype == np.float32  # exactly representable
+    assert out["precise"].dtype == np.float64  # float32 would round
+    assert out["flag"].dtype == bool
+    pd.testing.assert_frame_equal(out.astype(df.dtypes.to_dict()), df)
+    assert report["memory_after"] < report["memory_before"]
+    assert set(report["changes"]) == {"small", "halves"}
+
+
+def test_low_cardinality_text_becomes_category():
+    df = pd.DataFrame({
+        "color": ["red", "green", "blue", None] * 50,
+        "id": [f"user-{i}" for i in range(200)],
+    })
+    out, _ = optimize_dtypes(df)
+    assert isinstance(out["color"].dtype, pd.CategoricalDtype)
+    assert out["color"].isna().sum() == 50
+    assert not isinstance(out["id"].dtype, pd.CategoricalDtype)
+
+
+def test_date_columns_are_parsed_with_recorded_settings():
+    df = pd.DataFrame({
+        "iso": ["2024-01-05", "2024-02-10", None, "2023-12-31"] * 25,
+        "day_first": ["13/01/2024", "02/03/2024", "25/12/2023", "01/02/2024"] * 25,
+        "mostly_text": ["2024-01-05", "n/a", "unknown", "tbd"] * 25,
+    })
+    out, report = optimize_dtypes(df)
+
+    assert pd.api.types.is_datetime64_any_dtype(out["iso"]) and out["iso"].isna().sum() == 25
+    assert out["day_first"].iloc[1] == pd.Timestamp("2024-03-02")
+    assert not pd.api.types.is_datetime64_any_dtype(out["mostly_text"])
+
+    settings = date_parse_settings(report)
+    assert set(settings) == {"iso", "day_first"}
+    # The same settings read later data the same way (ambiguous day/month included)
+    replayed = parse_dates_with(pd.Series(["05/04/2024"]), settings["day_first"])
+    assert replayed.iloc[0] == pd.Timestamp("2024-04-05")
+
+
+def test_dates_can_be_left_as_text():
+    df = pd.DataFrame({"iso": ["2024-01-05", "2024-02-10"] * 10})
+    out, report = optimize_dtypes(df, parse_dates=False)
+    assert not pd.api.types.is_datetime64_any_dtype(out["iso"])
+    assert date_parse_settings(report) == {}
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from utils.feature_store import FeatureStore, fit_encoder
+
+
+def make_frame(n=500):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "num": rng.normal(size=n),
+        "flag": rng.random(n) > 0.5,
+        "when": pd.date_range("2024-01-01", periods=n, freq="h"),
+        "color": rng.choice(["red", "green", "blue"], n),
+        "city": [f"city{i % 80}" for i in range(n)],
+        "id": [f"user-{i}" for i in range(n)],
+    })
+
+
+def test_encoder_kinds():
+    spec = fit_encoder(make_frame(), max_categories=50)
+    kinds = {c.name: c.kind for c in spec.columns}
+    assert kinds == {
+        "num": "numeric", "flag": "numeric", "when": "datetime",
+        "color": "codes", "city": "codes", "id": "dropped",
+    }
+    city = next(c for c in spec.columns if c.name == "city")
+    assert len(city.categories) == 50 and city.other_code == 50
+    assert "id" not in spec.feature_names
+
+
+def test_transform_replays_on_new_data():
+    spec = fit_encoder(make_frame(), max_categories=50)
+    new = pd.DataFrame({"color": ["blue", "purple", None], "city": ["city1", "city79", None]})
+    X = spec.transform(new)
+
+    assert list(X.columns) == spec.feature_names
+    assert X.dtypes.eq(np.float32).all()
+    color = next(c for c in spec.columns if c.name == "color")
+    assert X["color"].iloc[0] == color.categories.index("blue")
+    assert X["color"].iloc[1] == -1  # unseen level without an "other" bucket
+    city = next(c for c in spec.columns if c.name == "city")
+    expected_city79 = city.categories.index("city79") if "city79" in city.categories else city.other_code
+    assert X["city"].iloc[1] == expected_city79
+    # Missing columns and values become 0 (except unseen codes above)
+    assert (X["num"] == 0).all() and X["color"].iloc[2] == -1
+
+
+def test_store_reuses_matrix_per_dataset():
+    df = make_frame()
+    store = FeatureStore(max_entries=2)
+    first = store.get(df)
+    assert store.get(df) is first
+    assert list(first.for_target("num").columns) == [c for c in first.spec.feature_names if c != "num"]
+    assert store.get(df.head(100)) is not first
+
+
+def test_transform_reuses_load_time_date_parsing():
+    from utils.dtype_optimizer import date_parse_settings, optimize_dtypes
+
+    raw = pd.DataFrame({"day": ["13/01/2024", "02/03/2024", "25/12/2023", "01/02/2024"] * 25})
+    df, report = optimize_dtypes(raw)
+    assert df["day"].iloc[1] == pd.Timestamp("2024-03-02")
+
+    spec = fit_encoder(df, date_settings=date_parse_settings(report))
+    # Scoring sees the raw strings again; they must encode like the training frame
+    np.testing.assert_array_equal(spec.transform(raw)["day"], spec.transform(df)["day"])
+    ambiguous = spec.transform(pd.DataFrame({"day": ["05/04/2024"]}))["day"].iloc[0]
+    assert ambiguous == np.float32((pd.Timestamp("2024-04-05") - pd.Timestamp(0)).total_seconds())
@@ -0,0 +1,40 @@
+import threading
+import time
+
+from agents import AgentContext
+from agents.instrumentation import measure, record_llm_call, write_prometheus_textfile
+
+
+def spin(seconds):
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+def test_cpu_seconds_include_worker_threads():
+    context = AgentContext(dataset_path="x")
+    with measure("fit", context):
+        workers = [threading.Thread(target=spin, args=(0.2,)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    record = context.metrics[0]
+    assert record["thread_cpu_seconds"] < 0.1
+    assert record["cpu_seconds"] >= 0.35
+    assert record["status"] == "ok" and record["llm_calls"] == []
+
+
+def test_llm_calls_and_prometheus_export(tmp_path):
+    context = AgentContext(dataset_path="x")
+    record_llm_call(10, 20, 0.5)  # outside any stage: ignored
+    with measure("llm", context):
+        record_llm_call(100, 50, 0.25, model="stub")
+    assert [c["prompt_chars"] for c in context.metrics[0]["llm_calls"]] == [100]
+
+    path = write_prometheus_textfile(context, str(tmp_path / "metrics.prom"))
+    text = open(path).read()
+    assert 'insightforge_stage_cpu_seconds{stage="llm"}' in text
+    assert 'insightforge_stage_thread_cpu_seconds{stage="llm"}' in text
+    assert 'insightforge_llm_latency_seconds{stage="llm"} 0.25' in text
@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+from agents.eda_agent import EDAAgent
+from agents.job_manager import JobManager, JobQueueFull
+from utils.workspace import RunWorkspace, prune_workspaces
+
+
+CSV = b"a,b,c\n1,2.5,x\n2,3.5,y\n3,1.0,x\n4,0.5,z\n"
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    # Keep the shared caches (plots/cache, cache/) out of the repository
+    monkeypatch.chdir(tmp_path)
+    manager = JobManager(max_workers=1, max_queued=1, executor="thread", base_dir=str(tmp_path / "runs"))
+    yield manager
+    manager.shutdown()
+
+
+def wait_for(manager, job_id, states=("done", "failed", "cancelled"), timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = manager.status(job_id)
+        if status["state"] in states:
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job stuck in {status['state']}")
+
+
+def test_job_reports_stage_progress_and_result(manager):
+    job_id = manager.submit(CSV, use_llm_insights=False, use_cache=False)
+    status = wait_for(manager, job_id)
+
+    assert status["state"] == "done"
+    assert status["completed"] == status["total"] == len(status["stages"])
+    assert set(status["stages"].values()) == {"done"}
+    assert status["workspace_root"].startswith(manager.base_dir)
+    context = manager.result(job_id)
+    assert os.path.exists(context.report_path)
+    assert context.report_path.startswith(status["workspace_root"])
+
+
+def test_queue_is_bounded_and_jobs_can_be_cancelled(manager, monkeypatch):
+    slow_run = EDAAgent.run
+
+    def slow(self, context):
+        time.sleep(1.0)
+        return slow_run(self, context)
+
+    monkeypatch.setattr(EDAAgent, "run", slow)
+    running = manager.submit(CSV, use_llm_insights=False, use_cache=False)
+    queued = manager.submit(CSV, use_llm_insights=False, use_cache=False)
+    with pytest.raises(JobQueueFull):
+        manager.submit(CSV, use_llm_insights=False, use_cache=False)
+
+    manager.cancel(queued)
+    assert manager.status(queued)["state"] == "cancelled"
+
+    wait_for(manager, running, states=("running",))
+    manager.cancel(running)
+    status = wait_for(manager, running)
+    assert status["state"] == "cancelled"
+    assert status["stages"].get("report") == "pending"
+
+
+def test_prune_skips_touched_workspaces(tmp_path):
+    base = tmp_path / "runs"
+    stale, active = RunWorkspace.create(str(base)), RunWorkspace.create(str(base))
+    old = time.time() - 2 * 24 * 3600
+    for workspace in (stale, active):
+        os.utime(workspace.root, (old, old))
+
+    assert active.touch()
+    assert prune_workspaces(str(base)) == [stale.root]
+    assert os.path.isdir(active.root) and not stale.touch()
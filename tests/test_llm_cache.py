@@ -0,0 +1,61 @@
+from agents import llm_cache
+from agents.llm_cache import LLMResponseCache
+from agents.llm_client import LLMClient, StubBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(tmp_path, monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return LLMResponseCache(str(tmp_path / "llm.sqlite"), **kwargs), clock
+
+
+def test_key_ignores_whitespace_but_not_model():
+    key = LLMResponseCache.key
+    assert key("sys", "a  b\n c", "m") == key(" sys ", "a b c", "m")
+    assert key("sys", "a b c", "m") != key("sys", "a b c", "other")
+    assert key("sys", "a b", "m") != key("sys", "a b c", "m")
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, ttl_seconds=60)
+    cache.put("k", "m", "answer")
+    clock.now += 59
+    assert cache.get("k") == "answer"
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 0, "bytes": 0}
+
+
+def test_byte_cap_evicts_least_recently_used(tmp_path, monkeypatch):
+    cache, clock = make_cache(tmp_path, monkeypatch, max_bytes=25)
+    for key in ("a", "b"):
+        cache.put(key, "m", "x" * 10)
+        clock.now += 1
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    clock.now += 1
+    cache.put("c", "m", "y" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10 and cache.get("c") == "y" * 10
+    assert cache.stats()["bytes"] == 20
+
+
+def test_client_serves_repeated_prompts_from_the_cache(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    client = LLMClient(backend=StubBackend(), cache=cache)
+    first = client.generate("## Summary", "rows: 10")
+    assert "".join(client.stream("## Summary", "rows:   10")) == first
+    assert cache.stats()["hits"] == 1 and cache.stats()["entries"] == 1
+
+    # Persisted: a new process (fresh cache object) still hits
+    reopened = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    assert LLMClient(backend=StubBackend(), cache=reopened).generate("## Summary", "rows: 10") == first
+    assert reopened.hits == 1
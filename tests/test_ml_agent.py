@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents import AgentContext
+from agents import ml_insights_agent
+from agents.ml_agent import MLAgent
+from agents.ml_insights_agent import MLInsightsAgent
+from utils.feature_store import FeatureStore
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(1)
+    n = 3_000
+    df = pd.DataFrame({
+        "signal": rng.normal(size=n),
+        "noise": rng.normal(size=n),
+        "group": rng.choice(["a", "b", "c"], n, p=[0.7, 0.2, 0.1]),
+    })
+    df["label"] = np.where(df["signal"] > 0, "yes", "no")
+    return df
+
+
+def analyse(tmp_path, df, **kwargs):
+    context = AgentContext(dataset_path="unused.csv")
+    context.df = df
+    agent = MLAgent(
+        output_dir=str(tmp_path / "plots"), use_render_cache=False, n_jobs=1,
+        feature_store=FeatureStore(), **kwargs,
+    )
+    return agent.run(context, "label")
+
+
+def test_fast_mode_samples_and_stops_early(tmp_path, data):
+    fi = analyse(tmp_path, data, fast=True, max_rows=1_000, tree_batch=10, max_trees=200,
+                 time_budget=600).feature_importance
+    training = fi["training"]
+    assert training["rows_used"] == 1_000 and training["rows_total"] == len(data)
+    assert training["stopped"] in ("converged", "max_trees")
+    assert training["n_estimators"] % 10 == 0 and training["n_estimators"] <= 200
+    assert fi["importance_table"][0]["feature"] == "signal"
+    assert fi["evaluation"] is None
+
+
+def test_insights_prompt_is_stable_across_runs(tmp_path, data, monkeypatch):
+    prompts = []
+    monkeypatch.setattr(
+        ml_insights_agent, "generate_llm_response",
+        lambda system, user, on_chunk=None: prompts.append(user) or "ok",
+    )
+    for _ in range(2):
+        context = analyse(tmp_path, data, fast=True, max_rows=1_000, time_budget=600, held_out=True)
+        MLInsightsAgent().run(context)
+
+    assert prompts[0] == prompts[1]
+    assert "seconds" not in prompts[0]
+
+
+@pytest.mark.parametrize("estimator", ["random_forest", "hist_gradient_boosting"])
+def test_held_out_importance_uses_bounded_validation_sample(tmp_path, data, estimator):
+    fi = analyse(tmp_path, data, estimator=estimator, held_out=True, validation_rows=400,
+                 permutation_repeats=3).feature_importance
+    evaluation = fi["evaluation"]
+    assert evaluation["validation_rows"] == 400
+    assert evaluation["repeats"] == 3
+    assert evaluation["validation_score"] > 0.9
+    assert fi["training"]["rows_used"] == len(data) - 400
+
+    table = pd.DataFrame(fi["importance_table"])
+    assert table.iloc[0]["feature"] == "signal"
+    if estimator == "random_forest":
+        # Impurity and permutation importance side by side
+        assert {"permutation_importance", "permutation_std"} <= set(table.columns)
+        assert table.set_index("feature")["permutation_importance"].idxmax() == "signal"
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents import AgentContext
+from agents.ml_agent import MLAgent
+from utils.feature_store import FeatureStore
+from utils.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    n = 2_000
+    df = pd.DataFrame({
+        "a": rng.normal(size=n),
+        "b": rng.normal(size=n),
+        "color": rng.choice(["red", "green", "blue"], n),
+    })
+    df["label"] = np.where(df["a"] + (df["color"] == "red") > 0.5, "yes", "no")
+    return df
+
+
+def train(tmp_path, df, **kwargs):
+    context = AgentContext(dataset_path="unused.csv")
+    context.df = df
+    agent = MLAgent(
+        output_dir=str(tmp_path / "plots"), use_render_cache=False, fast=True, n_jobs=1,
+        feature_store=FeatureStore(), registry=ModelRegistry(str(tmp_path / "models")), **kwargs,
+    )
+    return agent, agent.run(context, "label").feature_importance
+
+
+def test_round_trip_reuses_and_scores(tmp_path, data):
+    agent, first = train(tmp_path, data)
+    key = first["model_key"]
+    bundle = agent.registry.load(key)
+    assert bundle["meta"]["target_column"] == "label"
+    assert [e["key"] for e in agent.registry.entries()] == [key]
+
+    # Same data, target and settings: the stored result comes back
+    _, second = train(tmp_path, data)
+    assert second["model_key"] == key
+    assert second["importance_table"] == first["importance_table"]
+
+    input_path = tmp_path / "new.csv"
+    data.drop(columns="label").to_csv(input_path, index=False)
+    output_path = tmp_path / "out" / "scored.csv"
+    result = agent.registry.score_csv(key, str(input_path), str(output_path), chunksize=300)
+
+    scored = pd.read_csv(output_path)
+    assert result["rows"] == len(scored) == len(data)
+    X = bundle["spec"].transform(data)[bundle["feature_names"]]
+    np.testing.assert_array_equal(scored["prediction"], bundle["model"].predict(X))
+    assert scored["prediction_confidence"].between(0, 1).all()
+
+
+def test_key_depends_on_training_settings(tmp_path, data):
+    _, short = train(tmp_path, data, time_budget=5)
+    _, long = train(tmp_path, data, time_budget=120)
+    _, held_out = train(tmp_path, data, time_budget=5, held_out=True)
+    assert len({short["model_key"], long["model_key"], held_out["model_key"]}) == 3
+
+
+def test_scoring_rejects_missing_columns(tmp_path, data):
+    agent, result = train(tmp_path, data)
+    input_path = tmp_path / "bad.csv"
+    pd.DataFrame({"zzz": [1, 2]}).to_csv(input_path, index=False)
+    output_path = tmp_path / "scored.csv"
+
+    with pytest.raises(ValueError, match="missing columns"):
+        agent.registry.score_csv(result["model_key"], str(input_path), str(output_path))
+    assert not os.path.exists(output_path)
+    assert not os.path.exists(str(output_path) + ".tmp")
+
+    with pytest.raises(ValueError, match="No model"):
+        agent.registry.score_csv("unknown", str(input_path), str(output_path))
@@ -0,0 +1,74 @@
+import json
+import os
+
+from PIL import Image
+
+from utils.pdf_exporter import PDFExporter, markdown_blocks, split_sections, table_rows
+
+
+REPORT = """# Report
+
+## Overview
+Rows: **100**
+
+## Missing Values
+| column | missing |
+| --- | --- |
+| a \\| b | 3 |
+
+## Insights
+- first
+- second
+"""
+
+
+def make_plot(path, color):
+    Image.new("RGBA", (400, 300), color).save(path)
+    return str(path)
+
+
+def exporter(tmp_path):
+    return PDFExporter(image_cache_dir=str(tmp_path / "img_cache"), manifest_dir=str(tmp_path / "manifests"))
+
+
+def test_markdown_structure():
+    assert [title for title, _ in split_sections(REPORT)] == ["Report", "Overview", "Missing Values", "Insights"]
+    kinds = [kind for kind, _ in markdown_blocks(REPORT)]
+    assert kinds == ["heading", "heading", "paragraph", "heading", "table", "heading", "list"]
+    table = next(lines for kind, lines in markdown_blocks(REPORT) if kind == "table")
+    assert table_rows(table) == [["column", "missing"], ["a | b", "3"]]
+    assert table_rows(["| --- | --- |"]) == []
+
+
+def test_changed_only_export_compares_with_last_full_export(tmp_path):
+    plot = make_plot(tmp_path / "hist.png", "red")
+    output = str(tmp_path / "run1" / "report.pdf")
+    full = exporter(tmp_path).export(REPORT, [plot], output, manifest_key="dataset")
+    assert full["path"] == output and full["sections"] == 4 and full["plots"] == 1
+    with open(tmp_path / "manifests" / "dataset.json") as f:
+        manifest = json.load(f)
+    assert set(manifest["sections"]) == {"Report", "Overview", "Missing Values", "Insights"}
+
+    # A later run of the same data: same plot bytes under a new path, one edited section
+    copy = make_plot(tmp_path / "hist_copy.png", "red")
+    edited = REPORT.replace("- second", "- second, revised")
+    changes = exporter(tmp_path).export(
+        edited, [copy], str(tmp_path / "run2" / "report.pdf"), changed_only=True, manifest_key="dataset"
+    )
+    assert changes["path"].endswith("report.changes.pdf") and os.path.exists(changes["path"])
+    assert changes["sections"] == 1 and changes["plots"] == 0
+    assert not os.path.exists(tmp_path / "run2" / "report.pdf")
+
+    # Changed-only exports leave the manifest alone
+    with open(tmp_path / "manifests" / "dataset.json") as f:
+        assert json.load(f) == manifest
+    redrawn = make_plot(tmp_path / "hist_copy.png", "blue")
+    again = exporter(tmp_path).export(
+        edited, [redrawn], str(tmp_path / "run2" / "report.pdf"), changed_only=True, manifest_key="dataset"
+    )
+    assert again["sections"] == 1 and again["plots"] == 1
+
+
+def test_missing_plots_are_skipped(tmp_path):
+    stats = exporter(tmp_path).export(REPORT, [str(tmp_path / "gone.png")], str(tmp_path / "r.pdf"))
+    assert stats["plots"] == 0 and os.path.getsize(stats["path"]) > 0
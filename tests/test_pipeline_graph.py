@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+
+import pytest
+
+from agents import AgentContext
+from agents.pipeline_graph import PipelineCancelled, Stage, resolve_dependencies, run_stages
+
+
+def stage(name, reads=(), writes=(), fn=None, optional=False):
+    return Stage(name, fn or (lambda context: context), tuple(reads), tuple(writes), optional)
+
+
+def test_dependencies_follow_latest_writer():
+    stages = [
+        stage("load", writes=["df"]),
+        stage("eda", reads=["df"], writes=["summary"]),
+        stage("viz", reads=["df"], writes=["plots"]),
+        stage("rules", reads=["summary"], writes=["insights"]),
+        stage("llm", reads=["summary"], writes=["insights"]),
+        stage("report", reads=["summary", "insights", "plots"], writes=["report_path"]),
+    ]
+    deps = resolve_dependencies(stages)
+    assert deps["load"] == set()
+    assert deps["eda"] == deps["viz"] == {"load"}
+    assert deps["llm"] == {"eda", "rules"}  # appenders to insights keep their order
+    assert deps["report"] == {"eda", "llm", "viz"}
+
+
+def test_independent_stages_run_concurrently():
+    started = threading.Barrier(2, timeout=5)
+    stages = [
+        stage("load", writes=["df"]),
+        stage("a", reads=["df"], writes=["summary"], fn=lambda c: started.wait()),
+        stage("b", reads=["df"], writes=["plots"], fn=lambda c: started.wait()),
+    ]
+    context = run_stages(stages, AgentContext(dataset_path="x"), max_workers=2)
+    assert [m["stage"] for m in context.metrics][0] == "load"
+    assert context.stage_errors == {}
+
+
+def test_optional_failure_skips_optional_dependents_only():
+    def boom(context):
+        raise RuntimeError("no backend")
+
+    def write_report(context):
+        context.report_path = "report.md"
+
+    progress = []
+    stages = [
+        stage("load", writes=["df"]),
+        stage("llm", reads=["df"], writes=["insights"], fn=boom, optional=True),
+        stage("llm_followup", reads=["insights"], writes=["insights"], optional=True),
+        stage("viz", reads=["df"], writes=["plots"]),
+        stage("report", reads=["insights", "plots"], writes=["report_path"], fn=write_report),
+    ]
+    context = run_stages(
+        stages, AgentContext(dataset_path="x"), on_progress=lambda n, s: progress.append((n, s))
+    )
+    assert context.stage_errors == {
+        "llm": "RuntimeError: no backend",
+        "llm_followup": "skipped: upstream stage failed",
+    }
+    assert ("viz", "done") in progress
+    assert ("report", "done") in progress
+    assert context.report_path == "report.md"
+
+
+def test_planner_writes_report_when_llm_insights_fail(tmp_path, monkeypatch):
+    from agents.llm_insights_agent import LLMInsightsAgent
+    from agents.planner_agent import PlannerAgent
+    from utils.workspace import RunWorkspace
+
+    def no_network(self, context):
+        raise RuntimeError("no network")
+
+    monkeypatch.setattr(LLMInsightsAgent, "run", no_network)
+    monkeypatch.chdir(tmp_path)  # shared caches default to relative paths
+    workspace = RunWorkspace.create(str(tmp_path / "runs"))
+    path = workspace.save_upload(b"a,b,c\n1,2.5,x\n2,3.5,y\n3,1.0,x\n4,0.5,z\n")
+
+    planner = PlannerAgent(
+        use_cache=False, workspace=workspace, render_cache_dir=str(tmp_path / "render_cache")
+    )
+    context = planner.run_pipeline(AgentContext(dataset_path=path))
+
+    assert context.stage_errors == {"llm_insights": "RuntimeError: no network"}
+    assert context.report_path is not None and os.path.exists(context.report_path)
+
+
+def test_required_failure_is_raised():
+    def boom(context):
+        raise ValueError("bad data")
+
+    with pytest.raises(ValueError, match="bad data"):
+        run_stages([stage("load", writes=["df"], fn=boom), stage("eda", reads=["df"])],
+                   AgentContext(dataset_path="x"))
+
+
+def test_cancellation_stops_scheduling():
+    stop = threading.Event()
+    ran = []
+
+    def slow(context):
+        stop.set()
+        time.sleep(0.6)
+        ran.append("slow")
+
+    stages = [
+        stage("slow", writes=["df"], fn=slow),
+        stage("next", reads=["df"], fn=lambda c: ran.append("next")),
+    ]
+    with pytest.raises(PipelineCancelled):
+        run_stages(stages, AgentContext(dataset_path="x"), should_stop=stop.is_set)
+    assert ran == ["slow"]
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents import AgentContext
+from agents.data_loader_agent import DataLoaderAgent
+
+
+def write_batch(path, start, n):
+    rng = np.random.default_rng(start)
+    pd.DataFrame({
+        "value": rng.normal(size=n),
+        "kind": rng.choice(["a", "b"], n),
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def load(path, state_path):
+    agent = DataLoaderAgent(chunksize=250, state_path=str(state_path), optimize=False)
+    return agent.run(AgentContext(dataset_path=path))
+
+
+def test_appends_accumulate_and_match_a_single_pass(tmp_path):
+    state = tmp_path / "state" / "profile.pkl"
+    first = write_batch(tmp_path / "day1.csv", 0, 1_000)
+    second = write_batch(tmp_path / "day2.csv", 1, 600)
+
+    assert load(first, state).summary["appended_rows"] == 1_000
+    appended = load(second, state)
+    assert appended.summary["appended_rows"] == 600
+
+    both = tmp_path / "both.csv"
+    pd.concat([pd.read_csv(first), pd.read_csv(second)]).to_csv(both, index=False)
+    single = DataLoaderAgent(chunksize=400, optimize=False).run(AgentContext(dataset_path=str(both)))
+
+    assert appended.profile.num_rows == single.profile.num_rows == 1_600
+    cols = ["count", "mean", "std", "min", "max"]
+    np.testing.assert_allclose(
+        appended.profile.numeric_summary()[cols], single.profile.numeric_summary()[cols], rtol=1e-9
+    )
+    assert appended.profile.categorical["kind"].count == 1_600
+
+
+def test_rerunning_a_batch_is_not_double_counted(tmp_path):
+    state = tmp_path / "profile.pkl"
+    batch = write_batch(tmp_path / "day1.csv", 0, 1_000)
+    load(batch, state)
+
+    retry = load(batch, state)
+    assert retry.summary["appended_rows"] == 0
+    assert retry.summary["duplicate_batch"]["rows"] == 1_000
+    assert retry.profile.num_rows == 1_000
+    assert retry.profile.numeric["value"].count == 1_000
+
+    # Same bytes under another name is the same batch
+    renamed = tmp_path / "day1_copy.csv"
+    renamed.write_bytes(open(batch, "rb").read())
+    assert load(str(renamed), state).profile.num_rows == 1_000
+
+
+def test_merging_profiles_with_a_shared_batch_is_rejected(tmp_path):
+    batch = write_batch(tmp_path / "day1.csv", 0, 300)
+    a = load(batch, tmp_path / "a.pkl").profile
+    b = load(batch, tmp_path / "b.pkl").profile
+    with pytest.raises(ValueError, match="both contain"):
+        a.merge(b)
@@ -0,0 +1,45 @@
+import pytest
+
+from agents.prompt_builder import build_dataset_prompt, estimate_tokens, top_correlations
+
+
+def wide_summary(n_cols=300, name_length=60):
+    cols = [f"column_{'x' * name_length}_{i}" for i in range(n_cols)]
+    return {
+        "num_rows": 1_000,
+        "num_columns": n_cols,
+        "numeric_columns": cols,
+        "datetime_columns": cols[:40],
+        "missing_percentage": {c: float(i % 7) for i, c in enumerate(cols)},
+        "numeric_stats": {
+            c: {"mean": 1.5, "std": 0.5, "skewness": i / 10, "outliers": i % 5}
+            for i, c in enumerate(cols)
+        },
+        "correlation": {a: {b: 0.9 if a != b else 1.0 for b in cols[:30]} for a in cols[:30]},
+    }
+
+
+@pytest.mark.parametrize("budget", [8_000, 4_000, 1_500, 600, 200, 80])
+def test_prompt_never_exceeds_budget(budget):
+    sample = [{"column_x": i} for i in range(10)]
+    prompt, stats = build_dataset_prompt(wide_summary(), {}, sample, token_budget=budget)
+    assert estimate_tokens(prompt) == stats["estimated_tokens"] <= budget
+
+
+def test_generous_budget_keeps_full_detail():
+    _, stats = build_dataset_prompt(wide_summary(n_cols=5), {}, [], token_budget=100_000)
+    assert stats["level"] == 0 and stats["dropped"] == []
+
+
+def test_impossible_budget_raises():
+    with pytest.raises(ValueError):
+        build_dataset_prompt(wide_summary(), {}, [], token_budget=10)
+
+
+def test_top_correlations_skips_diagonal_and_nan():
+    corr = {
+        "a": {"a": 1.0, "b": -0.9, "c": float("nan")},
+        "b": {"a": -0.9, "b": 1.0, "c": 0.2},
+        "c": {"a": float("nan"), "b": 0.2, "c": 1.0},
+    }
+    assert top_correlations(corr, 5) == [["a", "b", -0.9], ["b", "c", 0.2]]
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.query_engine import MAX_LIMIT, CsvSource, QueryEngine, validate_plan
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "region": rng.choice(["north", "south", "east"], 500),
+        "sales": rng.gamma(2.0, 50.0, 500),
+        "units": rng.integers(1, 20, 500),
+    })
+
+
+@pytest.mark.parametrize("plan", [
+    "select everything",
+    {"drop": ["sales"]},
+    {"filters": ["sales > 1"]},
+    {"filters": {"column": "sales", "op": ">", "value": 1}},
+    {"filters": [{"column": "missing", "op": ">", "value": 1}]},
+    {"filters": [{"column": "sales", "op": "like", "value": 1}]},
+    {"filters": [{"column": "region", "op": "contains", "value": 3}]},
+    {"aggregations": [1]},
+    {"aggregations": [{"column": "region", "func": "mean"}]},
+    {"aggregations": [{"column": "*", "func": "sum"}]},
+    {"group_by": [["region"]]},
+    {"select": "sales"},
+    {"sort": ["sales"]},
+    {"sort": [{"column": "units"}], "aggregations": [{"column": "sales", "func": "sum"}]},
+    {"limit": True},
+    {"limit": 0},
+    {"limit": "10"},
+])
+def test_invalid_plans_raise_value_error(df, plan):
+    with pytest.raises(ValueError):
+        validate_plan(plan, df)
+
+
+def test_grouped_plan_matches_pandas(df):
+    plan = {
+        "filters": [{"column": "units", "op": ">=", "value": 5}],
+        "group_by": ["region"],
+        "aggregations": [{"column": "sales", "func": "sum", "alias": "total"}],
+        "sort": [{"column": "total", "descending": True}],
+    }
+    _, result = QueryEngine().run(df, plan, "hash")
+
+    expected = (
+        df[df["units"] >= 5].groupby("region")["sales"].sum()
+        .sort_values(ascending=False).rename("total").reset_index()
+    )
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_limit_is_capped_and_defaults_apply(df):
+    plan = validate_plan({"limit": 10_000}, df)
+    assert plan["limit"] == MAX_LIMIT
+    assert validate_plan({"group_by": ["region"]}, df)["aggregations"] == [
+        {"column": "*", "func": "count", "alias": "count"}
+    ]
+
+
+def test_results_are_cached_per_dataset_and_plan(df):
+    engine = QueryEngine()
+    plan = {"aggregations": [{"column": "sales", "func": "mean"}]}
+    _, first = engine.run(df, plan, "hash")
+    first.iloc[0, 0] = -1  # callers get a copy, not the cached frame
+    _, second = engine.run(df, plan, "hash")
+    assert engine.results.hits == 1
+    assert second.iloc[0, 0] == pytest.approx(df["sales"].mean())
+    engine.run(df, plan, "other-hash")
+    assert engine.results.misses == 2
+
+
+def test_chunked_plans_match_the_full_frame(df, tmp_path):
+    path = tmp_path / "full.csv"
+    df.to_csv(path, index=False)
+    source = CsvSource(str(path), chunksize=97)
+    sample = df.sample(50, random_state=0)
+    engine = QueryEngine()
+    plans = [
+        {"filters": [{"column": "units", "op": ">", "value": 3}], "group_by": ["region"],
+         "aggregations": [{"column": "sales", "func": "median", "alias": "m"},
+                          {"column": "*", "func": "count", "alias": "n"}],
+         "sort": [{"column": "region", "descending": False}]},
+        {"select": ["region", "sales"], "sort": [{"column": "sales", "descending": True}], "limit": 7},
+        {"filters": [{"column": "region", "op": "==", "value": "north"}], "limit": 5},
+    ]
+    for plan in plans:
+        _, result = engine.run(sample, plan, "hash", source=source)
+        expected = engine.run(df, plan, "full-hash")[1]
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
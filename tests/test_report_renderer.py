@@ -0,0 +1,71 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from agents import AgentContext
+from utils.report_renderer import ReportRenderer
+
+
+def make_context(tmp_path, color="red"):
+    plot = tmp_path / "hist.png"
+    Image.new("RGB", (300, 200), color).save(plot)
+    context = AgentContext(dataset_path="data.csv")
+    context.summary = {
+        "num_rows": 3,
+        "dtypes": {"a": "float64", "b|c": "object"},
+        "numeric_table": pd.DataFrame({"Column": ["a"], "Mean": [1.23456789], "Std": [np.nan]}),
+        "missing_table": pd.DataFrame({"Column": ["a", "b|c"], "Missing Count": [0, 2]}),
+    }
+    context.insights = ["- **a** is skewed"]
+    context.plots = [str(plot)]
+    context.metrics = [{"stage": "eda", "wall_seconds": 0.5, "cpu_seconds": 0.4}]
+    return context
+
+
+def renderer_for(context, tmp_path):
+    return ReportRenderer(context, thumbnail_dir=str(tmp_path / "thumbs"))
+
+
+def test_formats_share_sections(tmp_path):
+    renderer = renderer_for(make_context(tmp_path), tmp_path)
+    ids = [s.id for s in renderer.sections]
+    assert ids == ["overview", "numeric_summary", "missing_values", "insights", "visualizations", "timings"]
+
+    md = renderer.markdown()
+    assert "## ❗ Missing Values" in md and "b\\|c" in md and "1.2346" in md
+    assert "![hist.png](" in md
+    body = renderer.markdown(header=False, images=False)
+    assert not body.startswith("# ") and "![" not in body and "Visualizations" not in body
+    assert renderer.images() == make_context(tmp_path).plots
+
+    html = renderer.html()
+    assert html.count("data:image/jpeg;base64,") == 1
+    assert str(tmp_path) not in html  # self-contained: no file references
+    assert "<strong>a</strong> is skewed" in html
+
+    data = json.loads(renderer.json())
+    assert list(data["sections"]) == ids
+    assert data["sections"]["numeric_summary"]["data"][0]["Std"] is None  # NaN -> null
+
+
+def test_write_and_render_cache(tmp_path):
+    context = make_context(tmp_path)
+    paths = renderer_for(context, tmp_path).write(str(tmp_path / "out"), stem="r")
+    assert sorted(paths) == ["html", "json", "md"] and all(os.path.exists(p) for p in paths.values())
+
+    cache = ReportRenderer._cache
+    first = renderer_for(context, tmp_path)
+    first.markdown()
+    hits = cache.hits
+    again = renderer_for(context, tmp_path)
+    assert again.markdown() == first.markdown()
+    assert cache.hits > hits
+
+    # Redrawing a plot in place changes its section's digest
+    changed = make_context(tmp_path, color="blue")
+    redrawn = renderer_for(changed, tmp_path)
+    changed_ids = {s.id for s, d in zip(redrawn.sections, redrawn.digests) if d not in first.digests}
+    assert changed_ids == {"visualizations"}
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from utils.stats_kernel import categorical_counts, numeric_summary
+
+
+def test_numeric_summary_matches_pandas():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "a": rng.normal(size=1_000),
+        "b": rng.gamma(2.0, size=1_000),
+        "ints": rng.integers(0, 10, 1_000),
+    })
+    df.loc[::7, "b"] = np.nan
+
+    stats = numeric_summary(df, block_size=2)
+    np.testing.assert_allclose(stats["count"], df.count())
+    np.testing.assert_allclose(stats["mean"], df.mean())
+    np.testing.assert_allclose(stats["std"], df.std())
+    np.testing.assert_allclose(stats["median"], df.median())
+    np.testing.assert_allclose(stats["q1"], df.quantile(0.25))
+    np.testing.assert_allclose(stats["skewness"], df.skew())
+    np.testing.assert_allclose(stats["kurtosis"], df.kurt())
+
+    q1, q3 = df["a"].quantile([0.25, 0.75])
+    iqr = q3 - q1
+    assert stats.loc["a", "outliers"] == ((df["a"] < q1 - 1.5 * iqr) | (df["a"] > q3 + 1.5 * iqr)).sum()
+
+
+def test_numeric_summary_degenerate_columns():
+    df = pd.DataFrame({"constant": [3.0] * 5, "empty": [np.nan] * 5, "short": [1.0, 2.0, np.nan, np.nan, np.nan]})
+    stats = numeric_summary(df)
+    assert stats.loc["constant", "std"] == 0
+    assert stats.loc["constant", "skewness"] == 0
+    assert stats.loc["empty", "count"] == 0
+    assert np.isnan(stats.loc["short", "skewness"])
+    assert numeric_summary(pd.DataFrame()).empty
+
+
+def test_categorical_counts_drop_unused_categories():
+    df = pd.DataFrame({"c": pd.Categorical(["x", "x", "y"], categories=["x", "y", "z"])})
+    counts = categorical_counts(df)["c"]
+    assert counts.to_dict() == {"x": 2, "y": 1}
@@ -0,0 +1,171 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.stats_kernel import numeric_summary
+from utils.streaming_stats import (
+    DatasetProfile,
+    DistinctSketch,
+    HeavyHitters,
+    QuantileSketch,
+    RowSampler,
+    column_hashes,
+)
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    df = pd.DataFrame({
+        "x": rng.normal(10, 3, n),
+        "y": rng.exponential(2.0, n),
+        "z": rng.integers(0, 100, n).astype(float),
+        "cat": rng.choice(["a", "b", "c", "d"], n, p=[0.6, 0.2, 0.15, 0.05]),
+    })
+    df["y"] += 0.5 * df["x"]
+    df.loc[rng.random(n) < 0.05, "y"] = np.nan
+    return df
+
+
+def profile_of(df, chunksize):
+    profile = DatasetProfile(sample_size=1_000)
+    for start in range(0, len(df), chunksize):
+        profile.update(df.iloc[start:start + chunksize])
+    return profile
+
+
+def test_chunked_moments_match_full_frame(frame):
+    streamed = profile_of(frame, chunksize=3_001).numeric_summary()
+    exact = numeric_summary(frame[["x", "y", "z"]])
+
+    exact_cols = ["count", "mean", "std", "min", "max", "skewness", "kurtosis"]
+    np.testing.assert_allclose(streamed[exact_cols], exact[exact_cols], rtol=1e-8)
+    # Quantiles come from the sketch: compare by rank error
+    for col in ["x", "y"]:
+        values = frame[col].dropna().to_numpy()
+        for q, stat in [(0.25, "q1"), (0.5, "median"), (0.75, "q3")]:
+            rank = (values <= streamed.loc[col, stat]).mean()
+            assert abs(rank - q) < 0.02
+
+
+def test_merged_profiles_equal_single_pass(frame):
+    half = len(frame) // 2
+    merged = profile_of(frame.iloc[:half], chunksize=2_500)
+    merged.merge(profile_of(frame.iloc[half:], chunksize=4_000))
+    single = profile_of(frame, chunksize=5_000)
+
+    assert merged.num_rows == single.num_rows == len(frame)
+    assert merged.null_counts == single.null_counts
+    cols = ["count", "mean", "std", "min", "max", "skewness", "kurtosis"]
+    np.testing.assert_allclose(merged.numeric_summary()[cols], single.numeric_summary()[cols], rtol=1e-8)
+    np.testing.assert_allclose(
+        merged.co_moments.correlation(), single.co_moments.correlation(), rtol=1e-8
+    )
+
+
+def test_correlation_is_pairwise_complete(frame):
+    streamed = profile_of(frame, chunksize=1_234).co_moments.correlation()
+    exact = frame[["x", "y", "z"]].corr()
+    np.testing.assert_allclose(streamed.loc[exact.index, exact.columns], exact, atol=1e-9)
+
+
+def test_categorical_counts_are_exact_under_capacity(frame):
+    profile = profile_of(frame, chunksize=999)
+    acc = profile.categorical["cat"]
+    assert acc.unique_values == 4
+    pd.testing.assert_series_equal(
+        acc.top(4), frame["cat"].value_counts(), check_names=False, check_dtype=False
+    )
+
+
+def test_quantile_sketch_rank_error_is_bounded():
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(size=200_000)
+    sketch = QuantileSketch(k=256)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+    qs = np.array([0.01, 0.1, 0.5, 0.9, 0.99])
+    ranks = np.searchsorted(np.sort(values), sketch.quantiles(qs), side="right") / values.size
+    assert np.max(np.abs(ranks - qs)) < 0.02
+
+
+def test_distinct_sketch_estimates_cardinality():
+    values = pd.Series(np.arange(100_000) % 60_000).astype(str)
+    left, right = DistinctSketch(k=2048), DistinctSketch(k=2048)
+    left.update(column_hashes(values[:50_000]))
+    right.update(column_hashes(values[50_000:]))
+    left.merge(right)
+    assert abs(left.estimate() - 60_000) / 60_000 < 0.1
+
+    small = DistinctSketch(k=2048)
+    small.update(column_hashes(pd.Series(["a", "b", "a"])))
+    assert small.estimate() == 2
+
+
+def test_heavy_hitters_keep_frequent_items():
+    rng = np.random.default_rng(2)
+    heavy = np.repeat(["h1", "h2", "h3"], [5_000, 3_000, 2_000])
+    tail = np.array([f"t{i}" for i in rng.integers(0, 5_000, 20_000)])
+    stream = rng.permutation(np.concatenate([heavy, tail]))
+
+    hitters = HeavyHitters(capacity=100)
+    for chunk in np.array_split(stream, 10):
+        hitters.update(pd.Series(chunk).value_counts())
+    top = hitters.top(3)
+    assert list(top.index) == ["h1", "h2", "h3"]
+    # Misra-Gries undercounts by at most the accumulated error
+    true = {"h1": 5_000, "h2": 3_000, "h3": 2_000}
+    for item, count in top.items():
+        assert true[item] - hitters.error <= count <= true[item]
+
+
+def test_row_sampler_is_bounded_and_mergeable():
+    df = pd.DataFrame({"i": np.arange(10_000)})
+    left, right = RowSampler(size=500, seed=1), RowSampler(size=500, seed=2)
+    for start in range(0, 6_000, 850):
+        left.update(df.iloc[start:min(start + 850, 6_000)])
+    right.update(df.iloc[6_000:])
+    left.merge(right)
+    assert len(left.frame) == 500
+    assert left.frame["i"].is_unique
+    # Both halves are represented roughly in proportion
+    assert 0.45 < (left.frame["i"] < 6_000).mean() < 0.75
+
+
+def test_all_null_leading_text_column_becomes_categorical():
+    n = 1_200
+    df = pd.DataFrame({
+        "x": np.arange(n, dtype=float),
+        "note": [None] * 600 + [f"tag{i % 3}" for i in range(600)],
+        "later_number": [None] * 600 + list(range(600)),
+    })
+    profile = DatasetProfile(sample_size=100)
+    for start in range(0, n, 300):
+        profile.update(df.iloc[start:start + 300].copy())
+
+    assert list(profile.categorical) == ["note"]
+    assert set(profile.numeric) == {"x", "later_number"}
+    assert profile.co_moments.columns == ["x", "later_number"]
+    note = profile.categorical["note"]
+    assert note.count == 600 and note.nulls == 600
+    assert note.top(3).sum() == 600
+    assert profile.numeric_summary().loc["later_number", "count"] == 600
+
+
+def test_merge_settles_all_null_columns_from_the_other_side():
+    first = DatasetProfile(sample_size=10)
+    first.update(pd.DataFrame({"x": [1.0, 2.0], "note": [None, None]}))
+    second = DatasetProfile(sample_size=10)
+    second.update(pd.DataFrame({"x": [3.0, 4.0], "note": ["a", "b"]}))
+
+    swapped = copy.deepcopy(second)
+    swapped.merge(first)
+    first.merge(second)
+    for merged in (first, swapped):
+        assert list(merged.categorical) == ["note"] and list(merged.numeric) == ["x"]
+        assert merged.categorical["note"].count == 2 and merged.categorical["note"].nulls == 2
+        assert merged.null_counts["note"] == 2
+    assert list(second.numeric) == ["x"] and "note" in second.categorical
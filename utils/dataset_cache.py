@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from utils.disk_cache import evict_lru, file_digest, touch
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:  # cache is skipped without pyarrow
+    pa = None
+    feather = None
+
+
+METADATA_KEY = b"insightforge"
+
+
+class DatasetCache:
+    """Parsed CSVs stored as uncompressed Feather, keyed by file content hash."""
+
+    def __init__(self, cache_dir="cache/datasets", max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def available(self):
+        return feather is not None
+
+    def key(self, dataset_path, **options):
+        digest = file_digest(dataset_path)
+        if options:
+            opts = json.dumps(options, sort_keys=True, default=str)
+            digest += "-" + hashlib.sha256(opts.encode()).hexdigest()[:12]
+        return digest
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.feather")
+
+    def load(self, key):
+        """Return (df, metadata) for a cached key, or None on a miss."""
+        path = self._path(key)
+        if not self.available or not os.path.exists(path):
+            return None
+        table = feather.read_table(path, memory_map=True)
+        touch(path)
+        raw = (table.schema.metadata or {}).get(METADATA_KEY)
+        metadata = json.loads(raw) if raw else {}
+        return table.to_pandas(), metadata
+
+    def store(self, key, df: pd.DataFrame, metadata=None):
+        if not self.available:
+            return None
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if metadata:
+                table = table.replace_schema_metadata({
+                    **(table.schema.metadata or {}),
+                    METADATA_KEY: json.dumps(metadata).encode(),
+                })
+            feather.write_feather(table, tmp_path, compression="uncompressed")
+        except (pa.ArrowException, ValueError, TypeError) as e:
+            # e.g. object columns holding mixed Python types
+            print(f"[DatasetCache] Skipping cache for {key[:12]}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, path)
+        evict_lru(self.cache_dir, self.max_bytes, keep=(path,))
+        return path
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 of a file's bytes, read in blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _update_digest(h, obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        if isinstance(obj, pd.DataFrame):
+            names, dtypes = list(obj.columns), obj.dtypes.astype(str).tolist()
+        else:
+            names, dtypes = [obj.name], [str(obj.dtype)]
+        h.update(repr((type(obj).__name__, names, dtypes)).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(str(obj.dtype).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=repr):
+            h.update(repr(key).encode())
+            _update_digest(h, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"seq{len(obj)}".encode())
+        for item in obj:
+            _update_digest(h, item)
+    else:
+        h.update(repr(obj).encode())
+
+
+def data_digest(*objects):
+    """SHA-256 over pandas objects, arrays and plain values (recursively)."""
+    h = hashlib.sha256()
+    for obj in objects:
+        _update_digest(h, obj)
+    return h.hexdigest()
+
+
+def touch(path):
+    """Mark a cache entry as recently used (LRU order follows mtime)."""
+    now = time.time()
+    os.utime(path, (now, now))
+
+
+def directory_size(directory):
+    total = 0
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            total += entry.stat().st_size
+    return total
+
+
+def evict_lru(directory, max_bytes, keep=()):
+    """Delete least recently used files until the directory fits in max_bytes."""
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    evicted = []
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        evicted.append(path)
+    return evicted
@@ -0,0 +1,118 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+
+def _is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def _downcast_float(series: pd.Series) -> pd.Series:
+    # Only downcast when float32 round-trips every value exactly
+    values = series.to_numpy()
+    narrowed = values.astype(np.float32)
+    with np.errstate(over="ignore", invalid="ignore"):
+        lossless = np.array_equal(narrowed.astype(np.float64), values, equal_nan=True)
+    return series.astype(np.float32) if lossless else series
+
+
+def parse_dates_with(series: pd.Series, settings: dict | None) -> pd.Series:
+    """pd.to_datetime with the settings optimize_dtypes chose for a column, so new
+    data (later chunks, files to score) is read the same way."""
+    settings = settings or {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return pd.to_datetime(
+            series, errors="coerce", format=settings.get("format"), dayfirst=settings.get("dayfirst", False)
+        )
+
+
+def _parse_dates(series: pd.Series, sample_size: int, min_ratio: float):
+    """(parsed series, parse settings) when the column holds dates, else None."""
+    non_null = series.dropna()
+    if non_null.empty:
+        return None
+    sample = non_null.sample(min(sample_size, len(non_null)), random_state=0).astype(str)
+    # Cheap pre-check: date strings have digits and a separator
+    if not sample.str.contains(r"\d", regex=True).all():
+        return None
+    if not sample.str.contains(r"[-/:.\s]", regex=True).mean() >= min_ratio:
+        return None
+
+    for dayfirst in (False, True):
+        # An explicit format is preferred: it parses every chunk the same way
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            fmt = guess_datetime_format(sample.iloc[0], dayfirst=dayfirst)
+        candidates = [{"format": fmt, "dayfirst": dayfirst}] if fmt else []
+        candidates.append({"format": None, "dayfirst": dayfirst})
+        for settings in candidates:
+            if parse_dates_with(sample, settings).notna().mean() < min_ratio:
+                continue
+            parsed = parse_dates_with(series, settings)
+            if parsed.notna().sum() >= min_ratio * len(non_null):
+                return parsed, settings
+    return None
+
+
+def optimize_dtypes(
+    df: pd.DataFrame,
+    category_ratio: float = 0.5,
+    max_categories: int = 1000,
+    parse_dates: bool = True,
+    date_sample_size: int = 200,
+    date_min_ratio: float = 0.9,
+):
+    """Downcast numerics, convert low-cardinality text to category and parse dates.
+
+    Returns the optimised frame and a report with the memory footprint before
+    and after plus the dtype change of every converted column (date columns
+    also record the "parse" settings used, see parse_dates_with).
+    """
+    memory_before = int(df.memory_usage(deep=True).sum())
+    converted = {}
+    changes = {}
+    date_settings = {}
+
+    for col in df.columns:
+        series = df[col]
+        new = series
+
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        elif pd.api.types.is_integer_dtype(series):
+            new = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            new = _downcast_float(series)
+        elif _is_text(series):
+            parsed = _parse_dates(series, date_sample_size, date_min_ratio) if parse_dates else None
+            if parsed is not None:
+                new, date_settings[col] = parsed
+            else:
+                n_unique = series.nunique(dropna=True)
+                if n_unique <= max_categories and n_unique <= category_ratio * max(len(series), 1):
+                    new = series.astype("category")
+
+        if new.dtype != series.dtype:
+            converted[col] = new
+            changes[col] = {"from": str(series.dtype), "to": str(new.dtype)}
+            if col in date_settings:
+                changes[col]["parse"] = date_settings[col]
+
+    if converted:
+        df = df.assign(**converted)
+
+    report = {
+        "memory_before": memory_before,
+        "memory_after": int(df.memory_usage(deep=True).sum()),
+        "changes": changes,
+    }
+    return df, report
+
+
+def date_parse_settings(report: dict | None) -> dict:
+    """{column: parse settings} of the date columns in an optimize_dtypes report."""
+    changes = (report or {}).get("changes", {})
+    return {col: change["parse"] for col, change in changes.items() if "parse" in change}
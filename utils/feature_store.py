@@ -0,0 +1,132 @@
+from dataclasses import asdict, dataclass, field
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from utils.disk_cache import data_digest
+from utils.dtype_optimizer import parse_dates_with
+from utils.lru_store import LRUStore
+
+
+@dataclass
+class ColumnEncoding:
+    name: str
+    # "numeric", "datetime", "codes" (categories -> integer codes) or "dropped"
+    kind: str
+    categories: List = field(default_factory=list)
+    # Codes of values outside `categories` (rare levels of high-cardinality columns)
+    other_code: int | None = None
+    reason: str | None = None
+    # Date parse settings chosen at load time (utils.dtype_optimizer), replayed on new data
+    parse: dict | None = None
+
+
+@dataclass
+class EncoderSpec:
+    """How each column becomes a float32 feature; replayable on new data."""
+
+    columns: List[ColumnEncoding]
+
+    @property
+    def feature_names(self):
+        return [c.name for c in self.columns if c.kind != "dropped"]
+
+    def digest(self):
+        return data_digest([asdict(c) for c in self.columns])
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Vectorised encoding of df (missing columns and values become 0)."""
+        encoded = {}
+        for enc in self.columns:
+            if enc.kind == "dropped":
+                continue
+            if enc.name not in df:
+                encoded[enc.name] = np.zeros(len(df), dtype=np.float32)
+                continue
+            series = df[enc.name]
+            if enc.kind == "numeric":
+                values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            elif enc.kind == "datetime":
+                seconds = (parse_dates_with(series, enc.parse) - pd.Timestamp(0)).dt.total_seconds()
+                values = seconds.to_numpy(dtype=float, na_value=np.nan)
+            else:
+                # -1 for missing values and levels outside `categories`
+                codes = pd.Index(enc.categories).get_indexer(series).astype(np.float32)
+                if enc.other_code is not None:
+                    codes[(codes < 0) & series.notna().to_numpy()] = enc.other_code
+                values = codes
+            encoded[enc.name] = np.nan_to_num(np.asarray(values, dtype=np.float32), nan=0.0)
+        return pd.DataFrame(encoded, index=df.index)
+
+
+def fit_encoder(df: pd.DataFrame, max_categories: int = 50, id_unique_ratio: float = 0.95,
+                date_settings: dict | None = None) -> EncoderSpec:
+    """Choose an encoding per column.
+
+    date_settings ({column: parse settings}, see utils.dtype_optimizer) is
+    kept with each datetime column so scoring parses raw dates the same way.
+
+    Text/categorical columns keep their max_categories most frequent levels
+    as codes (the rest share one "other" code); near-unique text columns
+    (identifiers, free text) are dropped since no model can generalise from them.
+    """
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series) or (
+            pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype)
+        ):
+            columns.append(ColumnEncoding(col, "numeric"))
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            columns.append(ColumnEncoding(col, "datetime", parse=(date_settings or {}).get(col)))
+        else:
+            counts = series.value_counts()
+            non_null = int(counts.sum())
+            if non_null and len(counts) / non_null > id_unique_ratio and len(counts) > max_categories:
+                columns.append(ColumnEncoding(col, "dropped", reason="near-unique identifier"))
+            elif len(counts) > max_categories:
+                columns.append(ColumnEncoding(
+                    col, "codes", counts.index[:max_categories].tolist(), other_code=max_categories,
+                    reason=f"{len(counts)} levels, top {max_categories} kept",
+                ))
+            else:
+                columns.append(ColumnEncoding(col, "codes", counts.index.tolist()))
+    return EncoderSpec(columns)
+
+
+@dataclass
+class FeatureMatrix:
+    X: pd.DataFrame
+    spec: EncoderSpec
+    dataset_hash: str
+
+    def for_target(self, target: str) -> pd.DataFrame:
+        """Features for one target: the shared matrix without the target's own column."""
+        return self.X.drop(columns=[target], errors="ignore")
+
+
+class FeatureStore:
+    """Encoded feature matrices cached per (dataset hash, encoder settings)."""
+
+    def __init__(self, max_entries: int = 4, max_categories: int = 50):
+        self.max_categories = max_categories
+        self.matrices = LRUStore(max_entries=max_entries)
+
+    def get(self, df: pd.DataFrame, dataset_hash: str | None = None,
+            date_settings: dict | None = None) -> FeatureMatrix:
+        dataset_hash = dataset_hash or data_digest(df)
+        key = (dataset_hash, self.max_categories)
+        matrix = self.matrices.get(key)
+        if matrix is None:
+            spec = fit_encoder(df, max_categories=self.max_categories, date_settings=date_settings)
+            matrix = FeatureMatrix(spec.transform(df), spec, dataset_hash)
+            self.matrices.put(key, matrix)
+        return matrix
+
+
+_default_store = FeatureStore()
+
+
+def get_feature_store() -> FeatureStore:
+    return _default_store
@@ -0,0 +1,111 @@
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from utils.disk_cache import data_digest, touch
+
+
+class ModelRegistry:
+    """Fitted models stored with joblib next to the encoder that produced their inputs.
+
+    Entries are keyed by (dataset hash, target, encoder state, training
+    parameters), so the same request never trains twice, and any stored model
+    can score new files without the original data.
+    """
+
+    VERSION = 1
+
+    def __init__(self, root: str = "models"):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def key(self, dataset_hash, target_column, encoder_digest, params: dict) -> str:
+        return data_digest(self.VERSION, dataset_hash, target_column, encoder_digest, params)[:24]
+
+    def model_path(self, key):
+        return os.path.join(self.root, f"{key}.joblib")
+
+    def meta_path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def save(self, key, model, spec, feature_names, meta: dict):
+        bundle = {
+            "version": self.VERSION,
+            "model": model,
+            "spec": spec,
+            "feature_names": list(feature_names),
+            "meta": meta,
+        }
+        tmp_path = self.model_path(key) + ".tmp"
+        joblib.dump(bundle, tmp_path, compress=3)
+        os.replace(tmp_path, self.model_path(key))
+
+        tmp_path = self.meta_path(key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "saved_at": time.time(), **meta}, f, indent=2, default=str)
+        os.replace(tmp_path, self.meta_path(key))
+        return key
+
+    def load(self, key):
+        """The stored bundle (model, spec, feature_names, meta) or None."""
+        path = self.model_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            bundle = joblib.load(path)
+        except Exception as e:
+            print(f"[ModelRegistry] Ignoring unreadable model {key}: {e}")
+            return None
+        if bundle.get("version") != self.VERSION:
+            return None
+        touch(path)
+        return bundle
+
+    def entries(self):
+        """Metadata of every stored model, most recent first."""
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith(".json"):
+                with open(os.path.join(self.root, name), "r", encoding="utf-8") as f:
+                    entries.append(json.load(f))
+        return sorted(entries, key=lambda e: e.get("saved_at", 0), reverse=True)
+
+    def score_csv(self, key, input_path, output_path, chunksize: int = 100_000):
+        """Stream input_path through the stored encoder and model, writing the
+        rows plus a prediction column (and confidence for classifiers)."""
+        bundle = self.load(key)
+        if bundle is None:
+            raise ValueError(f"No model registered under {key!r}")
+        model, spec, feature_names = bundle["model"], bundle["spec"], bundle["feature_names"]
+
+        # The encoder fills absent columns with 0, so check the header first
+        header = pd.read_csv(input_path, nrows=0).columns
+        missing = [col for col in feature_names if col not in header]
+        if missing:
+            raise ValueError(f"{input_path} is missing columns the model was trained on: {missing}")
+
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        tmp_path = output_path + ".tmp"
+        rows = 0
+        start = time.perf_counter()
+        try:
+            for i, chunk in enumerate(pd.read_csv(input_path, chunksize=chunksize)):
+                X = spec.transform(chunk)[feature_names]
+                chunk["prediction"] = model.predict(X)
+                if hasattr(model, "predict_proba"):
+                    chunk["prediction_confidence"] = np.max(model.predict_proba(X), axis=1).round(4)
+                chunk.to_csv(tmp_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+                rows += len(chunk)
+            if rows == 0:
+                raise ValueError(f"{input_path} has no rows to score")
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        print(f"[ModelRegistry] Scored {rows} rows in {time.perf_counter() - start:.1f}s -> {output_path}")
+        return {"rows": rows, "output_path": output_path}
@@ -1,33 +1,327 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+from PIL import Image as PILImage
+from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
+from reportlab.platypus import (
+    Image,
+    ListFlowable,
+    ListItem,
+    Paragraph,
+    Preformatted,
+    SimpleDocTemplate,
+    Spacer,
+    Table,
+    TableStyle,
+)
+
+from utils.disk_cache import data_digest, evict_lru, file_digest, touch
+
+
+# =======================================================
+# IMAGES
+# =======================================================
+class ImageDownsampler:
+    """Plot PNGs resized to the PDF's print size, recompressed, and cached on disk.
+
+    Cache entries are keyed by the source bytes and the output settings, so a
+    re-export only decodes images that changed.
+    """
+
+    VERSION = 1
+
+    def __init__(self, cache_dir="plots/cache/pdf", dpi=110, width_inches=6.0, jpeg_quality=80,
+                 workers=4, max_bytes=128 * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.dpi = dpi
+        self.width_inches = width_inches
+        self.jpeg_quality = jpeg_quality
+        self.workers = workers
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def resize(self, path):
+        """(cached JPEG path, width px, height px) for one source image."""
+        key = data_digest(self.VERSION, file_digest(path), self.dpi, self.width_inches, self.jpeg_quality)
+        out_path = os.path.join(self.cache_dir, f"{key[:24]}.jpg")
+        if os.path.exists(out_path):
+            touch(out_path)
+            with PILImage.open(out_path) as img:
+                return out_path, img.width, img.height
+
+        max_px = int(self.dpi * self.width_inches)
+        with PILImage.open(path) as img:
+            img.thumbnail((max_px, max_px * 4), PILImage.LANCZOS)
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGBA")
+                background = PILImage.new("RGB", img.size, "white")
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+            tmp_path = out_path + ".tmp"
+            img.save(tmp_path, "JPEG", quality=self.jpeg_quality, optimize=True)
+            size = img.size
+        os.replace(tmp_path, out_path)
+        return out_path, size[0], size[1]
+
+    def resize_all(self, paths):
+        """Resize paths in parallel ({source path: (path, w, h)}); unreadable images are skipped."""
+        def safe_resize(path):
+            try:
+                return path, self.resize(path)
+            except Exception as e:
+                print(f"[PDFExporter] Skipping image {path}: {e}")
+                return path, None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            resized = dict(pool.map(safe_resize, dict.fromkeys(paths)))
+        evict_lru(self.cache_dir, self.max_bytes, keep={r[0] for r in resized.values() if r})
+        return resized
+
+
+# =======================================================
+# MARKDOWN -> FLOWABLES
+# =======================================================
+def inline_markup(text):
+    """Escape XML and map **bold**, *italic* and `code` to ReportLab markup."""
+    text = escape(text)
+    text = re.sub(r"`([^`]+)`", r'<font face="Courier">\1</font>', text)
+    text = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", text)
+    text = re.sub(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])", r"<i>\1</i>", text)
+    return text
+
+
+def markdown_blocks(text):
+    """Group markdown lines into blocks: (kind, lines) with kind in
+    heading / list / table / code / paragraph."""
+    blocks = []
+    kind, lines = None, []
+
+    def flush():
+        nonlocal kind, lines
+        if lines:
+            blocks.append((kind, lines))
+        kind, lines = None, []
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if kind == "code":
+            if stripped.startswith("```"):
+                flush()
+            else:
+                lines.append(line)
+            continue
+        if stripped.startswith("```"):
+            flush()
+            kind = "code"
+            lines = []
+            continue
+        if not stripped:
+            flush()
+            continue
+        if stripped.startswith("#"):
+            flush()
+            blocks.append(("heading", [stripped]))
+            continue
+        line_kind = (
+            "list" if re.match(r"^([-*+]|\d+[.)])\s+", stripped)
+            else "table" if stripped.startswith("|")
+            else "paragraph"
+        )
+        if line_kind != kind:
+            flush()
+            kind = line_kind
+        lines.append(stripped)
+    flush()
+    return blocks
+
+
+def table_rows(lines):
+    """Cell texts of a markdown table, split on unescaped pipes ("\\|" stays
+    inside its cell); separator lines are dropped."""
+    rows = []
+    for line in lines:
+        if re.fullmatch(r"\|?[\s:|-]+\|?", line):
+            continue
+        line = line.strip()
+        if line.startswith("|"):
+            line = line[1:]
+        if line.endswith("|") and not line.endswith("\\|"):
+            line = line[:-1]
+        rows.append([cell.strip().replace("\\|", "|") for cell in re.split(r"(?<!\\)\|", line)])
+    return rows
 
-def export_report_to_pdf(report_text, plots, output_path="final_report.pdf"):
-    styles = getSampleStyleSheet()
-    story = []
 
-    # Add Title
-    story.append(Paragraph("<b>AI Multi-Agent Data Analyst Report</b>", styles["Title"]))
-    story.append(Spacer(1, 12))
+def block_flowables(kind, lines, styles):
+    if kind == "heading":
+        level = min(len(lines[0]) - len(lines[0].lstrip("#")), 3)
+        return [Paragraph(inline_markup(lines[0].lstrip("#").strip()), styles[f"Heading{level}"])]
+    if kind == "list":
+        items = [
+            ListItem(Paragraph(inline_markup(re.sub(r"^([-*+]|\d+[.)])\s+", "", line)), styles["BodyText"]))
+            for line in lines
+        ]
+        return [ListFlowable(items, bulletType="bullet", leftIndent=12)]
+    if kind == "code":
+        return [Preformatted("\n".join(lines), styles["Code"])]
+    if kind == "table":
+        rows = [[Paragraph(inline_markup(cell), styles["BodyText"]) for cell in row] for row in table_rows(lines)]
+        if not rows:
+            return []
+        width = max(len(row) for row in rows)
+        rows = [row + [""] * (width - len(row)) for row in rows]
+        table = Table(rows, repeatRows=1)
+        table.setStyle(TableStyle([
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ]))
+        return [table]
+    return [Paragraph(inline_markup(" ".join(lines)), styles["BodyText"])]
 
-    # Add report text
-    for line in report_text.split("\n"):
-        story.append(Paragraph(line, styles["BodyText"]))
-        story.append(Spacer(1, 6))
 
-    # Add Plots
-    story.append(Paragraph("<b>Visualizations</b>", styles["Heading2"]))
-    story.append(Spacer(1, 12))
+def split_sections(report_text):
+    """[(title, markdown)] split at level-1/2 headings; text before the first
+    heading is the "Preamble" section."""
+    sections = []
+    title, lines = "Preamble", []
 
-    for p in plots:
+    def flush():
+        if any(l.strip() for l in lines):
+            # Repeated headings get a suffix so every section keeps its own manifest entry
+            taken = {name for name, _ in sections}
+            name, n = title, 2
+            while name in taken:
+                name, n = f"{title} ({n})", n + 1
+            sections.append((name, "\n".join(lines)))
+
+    for line in report_text.splitlines():
+        match = re.match(r"^#{1,2}\s+(.*)", line)
+        if match:
+            flush()
+            title, lines = match.group(1).strip(), [line]
+        else:
+            lines.append(line)
+    flush()
+    return sections
+
+
+# =======================================================
+# EXPORT
+# =======================================================
+class PDFExporter:
+    """Block-level markdown + downsampled plots -> PDF, with a section manifest.
+
+    Every full export records a hash per section and the content hash of
+    every plot in manifest_dir/<manifest_key>.json. changed_only=True then
+    exports just the sections and plots that differ from that last full
+    export into <name>.changes.pdf (the full PDF is left in place). Pass the
+    dataset hash as manifest_key to compare across runs of the same data;
+    by default the key is the output path.
+    """
+
+    def __init__(self, image_cache_dir="plots/cache/pdf", dpi=110, image_width_inches=6.0,
+                 jpeg_quality=80, workers=4, manifest_dir="reports/manifests"):
+        self.images = ImageDownsampler(
+            image_cache_dir, dpi=dpi, width_inches=image_width_inches,
+            jpeg_quality=jpeg_quality, workers=workers,
+        )
+        self.image_width_inches = image_width_inches
+        self.manifest_dir = manifest_dir
+
+    def manifest_path(self, manifest_key):
+        return os.path.join(self.manifest_dir, f"{manifest_key}.json")
+
+    def read_manifest(self, manifest_key):
         try:
-            story.append(Image(p, width=5*inch, height=3*inch))
+            with open(self.manifest_path(manifest_key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_manifest(self, manifest_key, manifest):
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        tmp_path = self.manifest_path(manifest_key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path(manifest_key))
+
+    def export(self, report_text, plots, output_path, changed_only=False, manifest_key=None,
+               title="AI Multi-Agent Data Analyst Report"):
+        start = time.perf_counter()
+        styles = getSampleStyleSheet()
+
+        plots = [p for p in dict.fromkeys(plots) if os.path.exists(p)]
+        sections = [(name, text, data_digest(text)) for name, text in split_sections(report_text)]
+        # Plots are compared by content, since their paths differ between runs
+        plot_hashes = {p: file_digest(p) for p in plots}
+        manifest_key = manifest_key or data_digest(os.path.abspath(output_path))[:16]
+
+        if changed_only:
+            previous = self.read_manifest(manifest_key)
+            old_sections = previous.get("sections", {})
+            old_plots = set(previous.get("plots", []))
+            sections = [s for s in sections if old_sections.get(s[0]) != s[2]]
+            plots = [p for p in plots if plot_hashes[p] not in old_plots]
+
+        resized = self.images.resize_all(plots)
+
+        story = [Paragraph(f"<b>{escape(title)}</b>", styles["Title"]), Spacer(1, 12)]
+        if changed_only:
+            story.append(Paragraph(
+                f"Changes since the last full export: {len(sections)} section(s), {len(plots)} plot(s).",
+                styles["Italic"],
+            ))
             story.append(Spacer(1, 12))
-        except:
-            pass
 
-    doc = SimpleDocTemplate(output_path, pagesize=A4)
-    doc.build(story)
+        for _, text, _ in sections:
+            for kind, lines in markdown_blocks(text):
+                story.extend(block_flowables(kind, lines, styles))
+                story.append(Spacer(1, 6))
+
+        images = [(p, resized[p]) for p in plots if resized.get(p)]
+        if images:
+            story.append(Paragraph("<b>Visualizations</b>", styles["Heading2"]))
+            story.append(Spacer(1, 12))
+            width = self.image_width_inches * inch
+            for source, (path, w, h) in images:
+                story.append(Paragraph(escape(os.path.basename(source)), styles["Italic"]))
+                story.append(Image(path, width=width, height=width * h / w))
+                story.append(Spacer(1, 12))
+
+        pdf_path = os.path.splitext(output_path)[0] + ".changes.pdf" if changed_only else output_path
+        os.makedirs(os.path.dirname(pdf_path) or ".", exist_ok=True)
+        tmp_path = pdf_path + ".tmp"
+        SimpleDocTemplate(tmp_path, pagesize=A4).build(story)
+        os.replace(tmp_path, pdf_path)
+
+        if not changed_only:
+            self.write_manifest(manifest_key, {
+                "sections": {name: digest for name, _, digest in sections},
+                "plots": sorted(set(plot_hashes.values())),
+            })
+
+        stats = {
+            "path": pdf_path,
+            "sections": len(sections),
+            "plots": len(images),
+            "bytes": os.path.getsize(pdf_path),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        print(f"[PDFExporter] {stats}")
+        return stats
+
 
-    return output_path
\ No newline at end of file
+def export_report_to_pdf(report_text, plots, output_path="reports/report.pdf", changed_only=False,
+                         manifest_key=None, **exporter_kwargs):
+    return PDFExporter(**exporter_kwargs).export(
+        report_text, plots, output_path, changed_only, manifest_key=manifest_key
+    )["path"]
@@ -0,0 +1,98 @@
+import numpy as np
+
+
+MAX_FLIERS = 500
+
+
+def weighted_quantiles(values, weights, qs):
+    order = np.argsort(values, kind="mergesort")
+    values, weights = values[order], weights[order]
+    cum = np.cumsum(weights)
+    idx = np.searchsorted(cum, np.asarray(qs) * cum[-1], side="left")
+    return values[np.clip(idx, 0, values.size - 1)]
+
+
+def binned_kde(values, weights, grid_size=200):
+    """Gaussian KDE (Scott bandwidth) evaluated by convolving a fine histogram."""
+    n = weights.sum()
+    mean = np.average(values, weights=weights)
+    std = np.sqrt(np.average((values - mean) ** 2, weights=weights))
+    if n < 2 or std == 0:
+        return np.array([values.min()]), np.array([1.0])
+
+    bw = std * n ** (-1.0 / 5)
+    lo, hi = values.min() - 3 * bw, values.max() + 3 * bw
+    counts, edges = np.histogram(values, bins=grid_size, range=(lo, hi), weights=weights)
+    dx = edges[1] - edges[0]
+    centers = edges[:-1] + dx / 2
+
+    half = min(int(np.ceil(4 * bw / dx)), (grid_size - 1) // 2)
+    offsets = np.arange(-half, half + 1) * dx
+    kernel = np.exp(-0.5 * (offsets / bw) ** 2) / (bw * np.sqrt(2 * np.pi))
+    density = np.convolve(counts, kernel, mode="same") / n
+    return centers, density
+
+
+def column_aggregate(values, weights=None, stats=None, bins=50, grid_size=200):
+    """Small summary of one numeric column that is enough to draw its plots.
+
+    `values` may be raw data (weights=None) or weighted sketch items. `stats`
+    can carry already-computed mean/median/q1/q3/min/max (e.g. EDA's
+    numeric_stats) so they are not recomputed here.
+    """
+    values = np.asarray(values, dtype=float)
+    finite = np.isfinite(values)
+    values = values[finite]
+    weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=float)[finite]
+    if values.size == 0:
+        return None
+
+    stats = dict(stats or {})
+    missing = [k for k in ("q1", "median", "q3") if k not in stats]
+    if missing:
+        q1, median, q3 = weighted_quantiles(values, weights, [0.25, 0.5, 0.75])
+        stats.update({"q1": q1, "median": median, "q3": q3})
+    stats.setdefault("mean", np.average(values, weights=weights))
+    stats.setdefault("min", values.min())
+    stats.setdefault("max", values.max())
+
+    counts, edges = np.histogram(values, bins=bins, weights=weights)
+    kde_x, kde_y = binned_kde(values, weights, grid_size)
+
+    # Box-plot statistics in the layout matplotlib's Axes.bxp expects
+    iqr = stats["q3"] - stats["q1"]
+    lo, hi = stats["q1"] - 1.5 * iqr, stats["q3"] + 1.5 * iqr
+    inside = (values >= lo) & (values <= hi)
+    fliers = np.sort(values[~inside])
+    if fliers.size > MAX_FLIERS:
+        fliers = fliers[np.linspace(0, fliers.size - 1, MAX_FLIERS).astype(int)]
+
+    box = {
+        "med": float(stats["median"]),
+        "q1": float(stats["q1"]),
+        "q3": float(stats["q3"]),
+        "whislo": float(values[inside].min()) if inside.any() else float(stats["q1"]),
+        "whishi": float(values[inside].max()) if inside.any() else float(stats["q3"]),
+        "fliers": fliers,
+        "mean": float(stats["mean"]),
+    }
+
+    # Violin statistics in the layout matplotlib's Axes.violin expects
+    violin = {
+        "coords": kde_x,
+        "vals": kde_y,
+        "mean": float(stats["mean"]),
+        "median": float(stats["median"]),
+        "min": float(stats["min"]),
+        "max": float(stats["max"]),
+    }
+
+    return {
+        "n": float(weights.sum()),
+        "counts": counts,
+        "edges": edges,
+        "kde_x": kde_x,
+        "kde_y": kde_y,
+        "box": box,
+        "violin": violin,
+    }
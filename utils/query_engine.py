@@ -0,0 +1,254 @@
+import json
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from utils.dtype_optimizer import parse_dates_with
+from utils.lru_store import LRUStore
+
+
+FILTER_OPS = {"==", "!=", ">", ">=", "<", "<=", "in", "not_in", "contains", "isnull", "notnull"}
+AGG_FUNCS = {"count", "nunique", "sum", "mean", "median", "min", "max", "std"}
+NUMERIC_FUNCS = {"sum", "mean", "median", "std"}
+MAX_LIMIT = 100
+
+PLAN_GRAMMAR = """{
+  "filters": [{"column": "<col>", "op": "==|!=|>|>=|<|<=|in|not_in|contains|isnull|notnull", "value": <scalar or list>}],
+  "group_by": ["<col>", ...],
+  "aggregations": [{"column": "<col> or * (count only)", "func": "count|nunique|sum|mean|median|min|max|std", "alias": "<name>"}],
+  "select": ["<col>", ...],
+  "sort": [{"column": "<col or alias>", "descending": true}],
+  "limit": <1-100>
+}"""
+
+
+# =======================================================
+# VALIDATION
+# =======================================================
+def _check_column(df, column, where):
+    if isinstance(column, (list, dict, set)) or column not in df.columns:
+        raise ValueError(f"Unknown column {column!r} in {where}")
+    return column
+
+
+def _entries(plan, key, kind):
+    """plan[key] as a list whose items are all of type kind."""
+    entries = plan.get(key) or []
+    if not isinstance(entries, list):
+        raise ValueError(f"{key!r} must be a list")
+    for entry in entries:
+        if not isinstance(entry, kind):
+            raise ValueError(f"Malformed {key!r} entry {entry!r}")
+    return entries
+
+
+def validate_plan(plan: dict, df: pd.DataFrame) -> dict:
+    """Check a query plan against the frame and return its normalised form.
+
+    Only the keys of PLAN_GRAMMAR are accepted; anything else (or an unknown
+    column, operator or function) raises ValueError, so model output never
+    reaches pandas unchecked.
+    """
+    if not isinstance(plan, dict):
+        raise ValueError("Query plan must be a JSON object")
+    unknown = set(plan) - {"filters", "group_by", "aggregations", "select", "sort", "limit"}
+    if unknown:
+        raise ValueError(f"Unsupported plan keys: {sorted(unknown)}")
+
+    filters = []
+    for f in _entries(plan, "filters", dict):
+        column = _check_column(df, f.get("column"), "filters")
+        op = f.get("op")
+        if op not in FILTER_OPS:
+            raise ValueError(f"Unsupported filter op {op!r}")
+        value = f.get("value")
+        if op in ("in", "not_in") and not isinstance(value, list):
+            value = [value]
+        if op == "contains" and not isinstance(value, str):
+            raise ValueError("'contains' needs a string value")
+        filters.append({"column": column, "op": op, "value": None if op in ("isnull", "notnull") else value})
+
+    group_by = [_check_column(df, c, "group_by") for c in _entries(plan, "group_by", object)]
+
+    aggregations = []
+    for a in _entries(plan, "aggregations", dict):
+        func = a.get("func")
+        if func not in AGG_FUNCS:
+            raise ValueError(f"Unsupported aggregation {func!r}")
+        column = a.get("column")
+        if column == "*":
+            if func != "count":
+                raise ValueError("'*' can only be counted")
+        else:
+            _check_column(df, column, "aggregations")
+            if func in NUMERIC_FUNCS and not (
+                pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])
+            ):
+                raise ValueError(f"{func} needs a numeric column, {column!r} is {df[column].dtype}")
+        alias = a.get("alias") or (f"{func}_{column}" if column != "*" else "count")
+        aggregations.append({"column": column, "func": func, "alias": str(alias)})
+
+    if group_by and not aggregations:
+        aggregations = [{"column": "*", "func": "count", "alias": "count"}]
+
+    select = [_check_column(df, c, "select") for c in _entries(plan, "select", object)]
+
+    output_columns = (
+        group_by + [a["alias"] for a in aggregations] if aggregations else (select or list(df.columns))
+    )
+    sort = []
+    for s in _entries(plan, "sort", dict):
+        if isinstance(s.get("column"), (list, dict, set)) or s.get("column") not in output_columns:
+            raise ValueError(f"Cannot sort by {s.get('column')!r}; not in the result")
+        sort.append({"column": s["column"], "descending": bool(s.get("descending", False))})
+
+    limit = plan.get("limit", 20)
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+        raise ValueError("limit must be a positive integer")
+
+    return {
+        "filters": filters,
+        "group_by": group_by,
+        "aggregations": aggregations,
+        "select": select,
+        "sort": sort,
+        "limit": min(limit, MAX_LIMIT),
+    }
+
+
+# =======================================================
+# EXECUTION
+# =======================================================
+def _coerce(series, value):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.to_datetime(value)
+    if pd.api.types.is_numeric_dtype(series) and isinstance(value, str):
+        return float(value)
+    return value
+
+
+def _condition(series, op, value):
+    if op == "isnull":
+        return series.isna().to_numpy()
+    if op == "notnull":
+        return series.notna().to_numpy()
+    if op == "contains":
+        return series.astype(str).str.contains(value, case=False, regex=False).to_numpy()
+    if op in ("in", "not_in"):
+        mask = series.isin([_coerce(series, v) for v in value]).to_numpy()
+        return mask if op == "in" else ~mask
+
+    value = _coerce(series, value)
+    compare = {
+        "==": series.__eq__, "!=": series.__ne__, ">": series.__gt__,
+        ">=": series.__ge__, "<": series.__lt__, "<=": series.__le__,
+    }[op]
+    return compare(value).fillna(False).to_numpy(dtype=bool)
+
+
+def execute_plan(df: pd.DataFrame, plan: dict) -> pd.DataFrame:
+    """Run a validated plan with vectorised pandas operations (no row loops)."""
+    mask = np.ones(len(df), dtype=bool)
+    for f in plan["filters"]:
+        mask &= _condition(df[f["column"]], f["op"], f["value"])
+    frame = df.loc[mask]
+
+    aggregations = plan["aggregations"]
+    if plan["group_by"]:
+        named = {
+            a["alias"]: (plan["group_by"][0], "size") if a["column"] == "*" else (a["column"], a["func"])
+            for a in aggregations
+        }
+        result = frame.groupby(plan["group_by"], observed=True, dropna=False).agg(**named).reset_index()
+    elif aggregations:
+        result = pd.DataFrame({
+            a["alias"]: [len(frame) if a["column"] == "*" else frame[a["column"]].agg(a["func"])]
+            for a in aggregations
+        })
+    else:
+        result = frame[plan["select"]] if plan["select"] else frame
+
+    if plan["sort"]:
+        result = result.sort_values(
+            [s["column"] for s in plan["sort"]],
+            ascending=[not s["descending"] for s in plan["sort"]],
+        )
+    return result.head(plan["limit"]).reset_index(drop=True)
+
+
+def plan_columns(plan: dict, df: pd.DataFrame):
+    """Source columns a validated plan needs (in frame order)."""
+    needed = {f["column"] for f in plan["filters"]} | set(plan["group_by"])
+    if plan["aggregations"]:
+        needed |= {a["column"] for a in plan["aggregations"] if a["column"] != "*"}
+    else:
+        needed |= set(plan["select"] or df.columns)
+    return [c for c in df.columns if c in needed]
+
+
+@dataclass
+class CsvSource:
+    """The full CSV behind a sampled frame (large-file mode), read in chunks."""
+
+    path: str
+    chunksize: int = 200_000
+    # {column: parse settings} of the frame's date columns (utils.dtype_optimizer)
+    date_settings: dict = field(default_factory=dict)
+
+    def chunks(self, columns):
+        for chunk in pd.read_csv(self.path, usecols=columns, chunksize=self.chunksize):
+            for col, settings in self.date_settings.items():
+                if col in chunk:
+                    chunk[col] = parse_dates_with(chunk[col], settings)
+            yield chunk[columns]
+
+
+def execute_plan_chunked(source: CsvSource, plan: dict, df: pd.DataFrame) -> pd.DataFrame:
+    """Run a validated plan over every row of source, one chunk at a time.
+
+    df is the in-memory sample (for the column order). Only the plan's columns
+    of the rows passing the filters are kept: row plans keep at most `limit`
+    rows (the running top-k when sorted); aggregations run once over the
+    filtered projection.
+    """
+    columns = plan_columns(plan, df)
+    row_plan = dict(plan, filters=[])
+    kept = []
+    for chunk in source.chunks(columns):
+        mask = np.ones(len(chunk), dtype=bool)
+        for f in plan["filters"]:
+            mask &= _condition(chunk[f["column"]], f["op"], f["value"])
+        kept.append(chunk.loc[mask])
+        if not plan["aggregations"]:
+            kept = [execute_plan(pd.concat(kept, ignore_index=True), row_plan)]
+            if not plan["sort"] and len(kept[0]) >= plan["limit"]:
+                break
+
+    frame = pd.concat(kept, ignore_index=True) if kept else df[columns].iloc[:0]
+    return execute_plan(frame, row_plan)
+
+
+# =======================================================
+# CACHED ENGINE
+# =======================================================
+class QueryEngine:
+    """Validates and runs query plans; results are LRU-cached per (dataset hash, plan)."""
+
+    def __init__(self, max_entries: int = 256):
+        self.results = LRUStore(max_entries=max_entries)
+
+    def run(self, df: pd.DataFrame, plan: dict, dataset_hash: str, source: CsvSource | None = None):
+        """Return (normalised plan, result frame); raises ValueError on an invalid plan.
+
+        With a source, df is only a sample used for validation and the plan
+        runs over the source's full CSV in chunks.
+        """
+        plan = validate_plan(plan, df)
+        key = (dataset_hash, source is not None, json.dumps(plan, sort_keys=True, default=str))
+
+        result = self.results.get(key)
+        if result is None:
+            result = execute_plan(df, plan) if source is None else execute_plan_chunked(source, plan, df)
+            self.results.put(key, result)
+        return plan, result.copy()
@@ -0,0 +1,32 @@
+import os
+
+from utils.disk_cache import data_digest, evict_lru, touch
+
+
+class RenderCache:
+    """Content-addressed PNG store: one file per (plot spec, input data) hash."""
+
+    VERSION = 1
+
+    def __init__(self, cache_dir="plots/cache", max_bytes=256 * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path(self, filename, *inputs, **params):
+        key = data_digest(self.VERSION, filename, params, inputs)
+        stem, ext = os.path.splitext(filename)
+        return os.path.join(self.cache_dir, f"{stem}_{key[:16]}{ext}")
+
+    def hit(self, path):
+        if os.path.exists(path):
+            touch(path)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def evict(self, keep=()):
+        return evict_lru(self.cache_dir, self.max_bytes, keep=set(keep))
@@ -0,0 +1,355 @@
+import base64
+import datetime
+import html
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, List
+
+import numpy as np
+import pandas as pd
+
+from utils.disk_cache import data_digest, file_digest
+from utils.lru_store import LRUStore
+from utils.pdf_exporter import ImageDownsampler, markdown_blocks, table_rows
+
+
+# A section is a list of typed blocks, rendered per format:
+#   ("text", markdown)   ("facts", {label: value})
+#   ("table", DataFrame) ("images", [plot paths])
+@dataclass
+class ReportSection:
+    id: str
+    title: str
+    blocks: List[tuple] = field(default_factory=list)
+    # Machine-readable payload for the JSON output
+    data: Any = None
+
+    def digest(self):
+        """Content hash of everything any format renders: blocks, the JSON
+        payload and the bytes of each image (plots can be redrawn in place)."""
+        images = [
+            file_digest(path) if os.path.exists(path) else None
+            for kind, payload in self.blocks if kind == "images" for path in payload
+        ]
+        return data_digest(self.id, self.title, self.blocks, json.dumps(jsonable(self.data), sort_keys=True), images)
+
+
+def jsonable(value):
+    """Plain JSON value for numpy scalars/arrays and pandas objects (NaN -> None)."""
+    if isinstance(value, pd.DataFrame):
+        return json.loads(value.to_json(orient="records", date_format="iso"))
+    if isinstance(value, pd.Series):
+        return json.loads(value.to_json(date_format="iso"))
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return jsonable(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+# =======================================================
+# CONTEXT -> SECTIONS (one pass)
+# =======================================================
+def build_sections(context, max_table_rows=50) -> List[ReportSection]:
+    summary = context.summary
+    sections = []
+
+    rows, cols = summary.get("shape") or (summary.get("num_rows"), len(summary.get("dtypes", {})))
+    overview = {
+        "Rows": summary.get("num_rows", rows),
+        "Columns": cols,
+        "Memory (KB)": round(summary["memory_usage"] / 1024, 2) if summary.get("memory_usage") is not None else None,
+        "Duplicate rows": summary.get("duplicate_rows"),
+    }
+    groups = {
+        name: summary.get(f"{name}_columns", [])
+        for name in ("numeric", "categorical", "datetime", "boolean")
+    }
+    dtypes = summary.get("dtypes", {})
+    sections.append(ReportSection(
+        "overview", "📁 Dataset Overview",
+        [("facts", overview)]
+        + ([("table", pd.DataFrame({"Column": list(dtypes), "Type": list(dtypes.values())}))] if dtypes else []),
+        {**overview, "column_groups": groups, "dtypes": dtypes},
+    ))
+
+    for key, section_id, title in (
+        ("numeric_table", "numeric_summary", "📊 Numeric Feature Summary"),
+        ("categorical_table", "categorical_summary", "🔠 Categorical Feature Summary"),
+        ("missing_table", "missing_values", "❗ Missing Values"),
+    ):
+        table = summary.get(key)
+        if table is None or len(table) == 0:
+            continue
+        if key == "missing_table":
+            table = table[table["Missing Count"] > 0].sort_values("Missing Count", ascending=False)
+            if table.empty:
+                sections.append(ReportSection(section_id, title, [("text", "No missing values.")], []))
+                continue
+        blocks = [("table", table.head(max_table_rows))]
+        if len(table) > max_table_rows:
+            blocks.append(("text", f"*{len(table) - max_table_rows} more rows in the JSON export.*"))
+        sections.append(ReportSection(section_id, title, blocks, table))
+
+    if context.insights:
+        text = "\n".join(context.insights)
+        sections.append(ReportSection("insights", "💡 Key Insights", [("text", text)], list(context.insights)))
+
+    fi = getattr(context, "feature_importance", None)
+    if fi:
+        table = pd.DataFrame(fi["importance_table"])
+        blocks = [
+            ("facts", {"Target": fi["target_column"], "Task": fi["task_type"]}),
+            ("table", table.head(max_table_rows).round(4)),
+        ]
+        if fi.get("plot_path"):
+            blocks.append(("images", [fi["plot_path"]]))
+        data = {k: v for k, v in fi.items() if k != "plot_path"}
+        sections.append(ReportSection("feature_importance", "🤖 Feature Importance", blocks, data))
+
+    clustering = getattr(context, "clustering", None)
+    if clustering:
+        stats = clustering["cluster_stats"]
+        blocks = [
+            ("facts", {"Clusters": clustering["n_clusters"]}),
+            ("table", stats.reset_index()),
+        ]
+        if clustering.get("plot_path"):
+            blocks.append(("images", [clustering["plot_path"]]))
+        data = {
+            "n_clusters": clustering["n_clusters"],
+            "cluster_stats": stats.reset_index(),
+            "k_selection": clustering.get("k_selection"),
+            "cluster_sizes": clustering.get("cluster_sizes"),
+        }
+        sections.append(ReportSection("clustering", "🌀 Clustering", blocks, data))
+
+    plots = [p for p in dict.fromkeys(context.plots) if os.path.exists(p)]
+    if plots:
+        sections.append(ReportSection("visualizations", "📈 Visualizations", [("images", plots)], plots))
+
+    if context.metrics:
+        timings = pd.DataFrame(context.metrics)[["stage", "wall_seconds", "cpu_seconds"]]
+        blocks = [("table", timings)]
+        if context.stage_errors:
+            blocks.append(("facts", dict(context.stage_errors)))
+        sections.append(ReportSection(
+            "timings", "⏱️ Pipeline Timings", blocks,
+            {"stages": timings, "errors": dict(context.stage_errors)},
+        ))
+    return sections
+
+
+# =======================================================
+# FORMATS
+# =======================================================
+def frame_to_markdown(df: pd.DataFrame) -> str:
+    def cell(value):
+        if isinstance(value, float):
+            value = round(value, 4)
+        return str(value).replace("|", "\\|").replace("\n", " ")
+
+    lines = [
+        "| " + " | ".join(cell(c) for c in df.columns) + " |",
+        "| " + " | ".join("---" for _ in df.columns) + " |",
+    ]
+    lines += ["| " + " | ".join(cell(v) for v in row) + " |" for row in df.itertuples(index=False)]
+    return "\n".join(lines)
+
+
+def inline_html(text):
+    text = html.escape(text, quote=False)
+    text = re.sub(r"`([^`]+)`", r"<code>\1</code>", text)
+    text = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", text)
+    text = re.sub(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])", r"<em>\1</em>", text)
+    return text
+
+
+def markdown_to_html(text):
+    """Block-level markdown (as split for the PDF) to HTML."""
+    parts = []
+    for kind, lines in markdown_blocks(text):
+        if kind == "heading":
+            level = min(len(lines[0]) - len(lines[0].lstrip("#")) + 1, 6)
+            parts.append(f"<h{level}>{inline_html(lines[0].lstrip('#').strip())}</h{level}>")
+        elif kind == "list":
+            items = "".join(
+                f"<li>{inline_html(re.sub(r'^([-*+]|[0-9]+[.)])[ ]+', '', line))}</li>" for line in lines
+            )
+            parts.append(f"<ul>{items}</ul>")
+        elif kind == "code":
+            parts.append(f"<pre><code>{html.escape(chr(10).join(lines))}</code></pre>")
+        elif kind == "table":
+            body = "".join(
+                "<tr>" + "".join(f"<td>{inline_html(c)}</td>" for c in row) + "</tr>" for row in table_rows(lines)
+            )
+            if body:
+                parts.append(f"<table>{body}</table>")
+        else:
+            parts.append(f"<p>{inline_html(' '.join(lines))}</p>")
+    return "\n".join(parts)
+
+
+HTML_STYLE = """
+body { font-family: -apple-system, Segoe UI, Helvetica, Arial, sans-serif; max-width: 1100px;
+       margin: 2rem auto; padding: 0 1rem; color: #222; line-height: 1.5; }
+table { border-collapse: collapse; margin: 0.5rem 0 1rem; font-size: 0.9rem; }
+th, td { border: 1px solid #ddd; padding: 0.25rem 0.5rem; text-align: left; }
+th { background: #f5f5f5; }
+.thumbs { display: flex; flex-wrap: wrap; gap: 1rem; }
+figure { margin: 0; } figcaption { font-size: 0.8rem; color: #666; }
+img { max-width: 440px; height: auto; border: 1px solid #eee; }
+nav a { margin-right: 1rem; }
+"""
+
+
+class ReportRenderer:
+    """Markdown, self-contained HTML and JSON reports from one pass over a context.
+
+    Sections are built once; each (section, format) rendering is cached in
+    memory by the section's content hash, so re-rendering after a change
+    (or in another format) only redoes the sections that differ.
+    """
+
+    _cache = LRUStore(max_entries=512)
+
+    def __init__(self, context, title="📊 AI Multi-Agent Data Analyst Report", max_table_rows=50,
+                 thumbnail_dir="plots/cache/html", thumbnail_width_inches=4.0, thumbnail_dpi=110):
+        self.title = title
+        self.generated_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.sections = build_sections(context, max_table_rows=max_table_rows)
+        self.digests = [s.digest() for s in self.sections]
+        self.thumbnails = ImageDownsampler(
+            thumbnail_dir, dpi=thumbnail_dpi, width_inches=thumbnail_width_inches, jpeg_quality=75,
+        )
+
+    def selected(self, include=None):
+        return [
+            (section, digest) for section, digest in zip(self.sections, self.digests)
+            if include is None or section.id in include
+        ]
+
+    def cached(self, fmt, section, digest, render):
+        key = (fmt, digest)
+        text = self._cache.get(key)
+        if text is None:
+            text = render(section)
+            self._cache.put(key, text)
+        return text
+
+    # ---------------- Markdown ----------------
+    def section_markdown(self, section: ReportSection, images=True) -> str:
+        parts = [f"## {section.title}"]
+        for kind, payload in section.blocks:
+            if kind == "text":
+                parts.append(payload)
+            elif kind == "facts":
+                parts.append("\n".join(f"- **{k}**: {v}" for k, v in payload.items() if v is not None))
+            elif kind == "table":
+                parts.append(frame_to_markdown(payload))
+            elif kind == "images" and images:
+                parts.append("\n".join(f"![{os.path.basename(p)}]({p})" for p in payload))
+        return "\n\n".join(parts)
+
+    def markdown(self, include=None, header=True, images=True) -> str:
+        """Markdown report; header=False / images=False give the text-only body
+        used by the PDF exporter (which places images() itself)."""
+        body = [
+            self.cached(("md", images), s, d, lambda section: self.section_markdown(section, images))
+            for s, d in self.selected(include)
+            if images or any(kind != "images" for kind, _ in s.blocks)
+        ]
+        if header:
+            body.insert(0, f"# {self.title}\n\nGenerated on: `{self.generated_at}`")
+        return "\n\n".join(body) + "\n"
+
+    def images(self, include=None):
+        """Every image path in section order."""
+        return list(dict.fromkeys(
+            path for s, _ in self.selected(include)
+            for kind, payload in s.blocks if kind == "images" for path in payload
+        ))
+
+    # ---------------- HTML ----------------
+    def section_html(self, section: ReportSection) -> str:
+        parts = [f'<section id="{section.id}"><h2>{html.escape(section.title)}</h2>']
+        for kind, payload in section.blocks:
+            if kind == "text":
+                parts.append(markdown_to_html(payload))
+            elif kind == "facts":
+                items = "".join(
+                    f"<li><strong>{html.escape(str(k))}</strong>: {html.escape(str(v))}</li>"
+                    for k, v in payload.items() if v is not None
+                )
+                parts.append(f"<ul>{items}</ul>")
+            elif kind == "table":
+                parts.append(payload.to_html(index=False, border=0, na_rep="", float_format=lambda v: f"{v:.4g}"))
+            elif kind == "images":
+                resized = self.thumbnails.resize_all(payload)
+                figures = []
+                for source in payload:
+                    if not resized.get(source):
+                        continue
+                    path, w, h = resized[source]
+                    with open(path, "rb") as f:
+                        encoded = base64.b64encode(f.read()).decode("ascii")
+                    name = html.escape(os.path.basename(source))
+                    figures.append(
+                        f'<figure><img loading="lazy" decoding="async" width="{w}" height="{h}" '
+                        f'alt="{name}" src="data:image/jpeg;base64,{encoded}"><figcaption>{name}</figcaption></figure>'
+                    )
+                parts.append(f'<div class="thumbs">{"".join(figures)}</div>')
+        parts.append("</section>")
+        return "\n".join(parts)
+
+    def html(self, include=None) -> str:
+        selected = self.selected(include)
+        nav = "".join(f'<a href="#{s.id}">{html.escape(s.title)}</a>' for s, _ in selected)
+        body = "\n".join(self.cached("html", s, d, self.section_html) for s, d in selected)
+        return (
+            "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(self.title)}</title><style>{HTML_STYLE}</style></head><body>\n"
+            f"<h1>{html.escape(self.title)}</h1><p>Generated on: <code>{self.generated_at}</code></p>\n"
+            f"<nav>{nav}</nav>\n{body}\n</body></html>\n"
+        )
+
+    # ---------------- JSON ----------------
+    def to_dict(self, include=None) -> dict:
+        return {
+            "title": self.title,
+            "generated_at": self.generated_at,
+            "sections": {
+                s.id: self.cached("json", s, d, lambda section: {
+                    "title": section.title, "data": jsonable(section.data),
+                })
+                for s, d in self.selected(include)
+            },
+        }
+
+    def json(self, include=None) -> str:
+        return json.dumps(self.to_dict(include), indent=2, ensure_ascii=False)
+
+    # ---------------- Files ----------------
+    def write(self, output_dir, stem="report", formats=("md", "html", "json")) -> dict:
+        """Write the requested formats (atomically) and return {format: path}."""
+        os.makedirs(output_dir, exist_ok=True)
+        render = {"md": self.markdown, "html": self.html, "json": self.json}
+        paths = {}
+        for fmt in formats:
+            path = os.path.join(output_dir, f"{stem}.{fmt}")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(render[fmt]())
+            os.replace(tmp_path, path)
+            paths[fmt] = path
+        return paths
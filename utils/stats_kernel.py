@@ -0,0 +1,86 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+NUMERIC_STATS = [
+    "count", "mean", "std", "min", "q1", "median", "q3", "max",
+    "skewness", "kurtosis", "outliers",
+]
+
+
+# =======================================================
+# MOMENT HELPERS (match pandas' bias-corrected estimators)
+# =======================================================
+def sample_skewness(n, m2, m3):
+    """Adjusted Fisher-Pearson skewness from central moment sums (arrays allowed)."""
+    n, m2, m3 = np.asarray(n, dtype=float), np.asarray(m2, dtype=float), np.asarray(m3, dtype=float)
+    with np.errstate(all="ignore"):
+        result = n * np.sqrt(n - 1) / (n - 2) * m3 / m2 ** 1.5
+    result = np.where(m2 <= 0, 0.0, result)
+    return np.where(n < 3, np.nan, result)
+
+
+def sample_kurtosis(n, m2, m4):
+    """Excess kurtosis (same correction as pandas .kurt()) from moment sums."""
+    n, m2, m4 = np.asarray(n, dtype=float), np.asarray(m2, dtype=float), np.asarray(m4, dtype=float)
+    with np.errstate(all="ignore"):
+        g2 = n * m4 / (m2 * m2) - 3.0
+        result = ((n + 1) * g2 + 6.0) * (n - 1) / ((n - 2) * (n - 3))
+    result = np.where(m2 <= 0, 0.0, result)
+    return np.where(n < 4, np.nan, result)
+
+
+# =======================================================
+# BATCHED NUMERIC STATS
+# =======================================================
+def _numeric_block(values: np.ndarray) -> np.ndarray:
+    present = ~np.isnan(values)
+    count = present.sum(axis=0).astype(float)
+
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+        mean = np.nansum(values, axis=0) / count
+        d = np.where(present, values - mean, 0.0)
+        d2 = d * d
+        m2 = d2.sum(axis=0)
+        m3 = (d2 * d).sum(axis=0)
+        m4 = (d2 * d2).sum(axis=0)
+
+        q = np.nanquantile(values, [0.0, 0.25, 0.5, 0.75, 1.0], axis=0)
+        iqr = q[3] - q[1]
+        outliers = ((values < q[1] - 1.5 * iqr) | (values > q[3] + 1.5 * iqr)).sum(axis=0)
+        std = np.sqrt(m2 / (count - 1))
+
+    return np.vstack([
+        count, mean, std, q[0], q[1], q[2], q[3], q[4],
+        sample_skewness(count, m2, m3), sample_kurtosis(count, m2, m4), outliers,
+    ])
+
+
+def numeric_summary(numeric_df: pd.DataFrame, block_size: int = 64) -> pd.DataFrame:
+    """All moments, quantiles and IQR outlier counts for every numeric column.
+
+    Columns are processed in blocks so peak memory stays a few copies of
+    `block_size` columns rather than of the whole frame.
+    """
+    columns = list(numeric_df.columns)
+    blocks = []
+    for start in range(0, len(columns), block_size):
+        block = numeric_df.iloc[:, start:start + block_size].to_numpy(dtype=float, na_value=np.nan)
+        blocks.append(_numeric_block(block))
+
+    stats = np.hstack(blocks) if blocks else np.empty((len(NUMERIC_STATS), 0))
+    return pd.DataFrame(stats.T, index=columns, columns=NUMERIC_STATS)
+
+
+# =======================================================
+# CATEGORICAL COUNTS (one value_counts per column)
+# =======================================================
+def categorical_counts(categorical_df: pd.DataFrame) -> dict:
+    counts = {}
+    for col in categorical_df.columns:
+        vc = categorical_df[col].value_counts(dropna=True)
+        counts[col] = vc[vc > 0]
+    return counts
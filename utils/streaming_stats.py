@@ -0,0 +1,491 @@
+import copy
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from utils.stats_kernel import NUMERIC_STATS, sample_kurtosis, sample_skewness
+
+
+def column_hashes(values: pd.Series) -> np.ndarray:
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+# =======================================================
+# QUANTILE SKETCH (compacting, KLL-style)
+# =======================================================
+class QuantileSketch:
+    """Mergeable quantile sketch. Level i holds items of weight 2**i."""
+
+    def __init__(self, k: int = 512, seed: int = 0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray):
+        if values.size == 0:
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values.astype(float, copy=False)])
+        self._compress()
+
+    def merge(self, other: "QuantileSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for i, items in enumerate(other.levels):
+            self.levels[i] = np.concatenate([self.levels[i], items])
+        self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self.k:
+                items = np.sort(items)
+                n_pairs = items.size // 2 * 2
+                offset = int(self._rng.integers(2))
+                promoted = items[offset:n_pairs:2]
+                self.levels[level] = items[n_pairs:]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def weighted_items(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(items.size, 2.0 ** i) for i, items in enumerate(self.levels)
+        ])
+        order = np.argsort(values, kind="mergesort")
+        return values[order], weights[order]
+
+    def quantiles(self, qs):
+        values, weights = self.weighted_items()
+        if values.size == 0:
+            return np.full(len(qs), np.nan)
+        cum = np.cumsum(weights)
+        idx = np.searchsorted(cum, np.asarray(qs) * cum[-1], side="left")
+        return values[np.clip(idx, 0, values.size - 1)]
+
+    def rank(self, x):
+        """Approximate number of items <= x (x may be an array)."""
+        values, weights = self.weighted_items()
+        cum = np.concatenate([[0.0], np.cumsum(weights)])
+        return cum[np.searchsorted(values, x, side="right")]
+
+
+# =======================================================
+# DISTINCT COUNT (k minimum values) + HEAVY HITTERS
+# =======================================================
+class DistinctSketch:
+    def __init__(self, k: int = 2048):
+        self.k = k
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def update(self, hashes: np.ndarray):
+        self.hashes = np.unique(np.concatenate([self.hashes, hashes]))[: self.k]
+
+    def merge(self, other: "DistinctSketch"):
+        self.update(other.hashes)
+
+    def estimate(self) -> int:
+        if self.hashes.size < self.k:
+            return int(self.hashes.size)
+        kth = float(self.hashes[self.k - 1]) / 2.0 ** 64
+        return int(round((self.k - 1) / kth))
+
+
+class HeavyHitters:
+    """Misra-Gries summary over pre-aggregated value counts."""
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype="int64")
+        self.error = 0
+
+    def update(self, counts: pd.Series):
+        if counts.empty:
+            return
+        combined = counts if self.counts.empty else self.counts.add(counts, fill_value=0)
+        if len(combined) > self.capacity:
+            threshold = combined.nlargest(self.capacity + 1).iloc[-1]
+            combined = combined[combined > threshold] - threshold
+            self.error += int(threshold)
+        self.counts = combined.astype("int64")
+
+    def merge(self, other: "HeavyHitters"):
+        self.error += other.error
+        self.update(other.counts)
+
+    def top(self, n: int) -> pd.Series:
+        return self.counts.sort_values(ascending=False, kind="mergesort").head(n)
+
+
+# =======================================================
+# PER-COLUMN ACCUMULATORS
+# =======================================================
+class NumericAccumulator:
+    def __init__(self, sketch_k: int = 512):
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = float("nan")
+        self.max = float("nan")
+        self.sketch = QuantileSketch(k=sketch_k)
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=float)
+        mask = np.isnan(values)
+        self.nulls += int(mask.sum())
+        values = values[~mask]
+        if values.size == 0:
+            return
+
+        mean = values.mean()
+        d = values - mean
+        d2 = d * d
+        self._merge_moments(values.size, mean, d2.sum(), (d2 * d).sum(), (d2 * d2).sum())
+        self.min = float(np.fmin(self.min, values.min()))
+        self.max = float(np.fmax(self.max, values.max()))
+        self.sketch.update(values)
+
+    def merge(self, other: "NumericAccumulator"):
+        self.nulls += other.nulls
+        if other.count:
+            self._merge_moments(other.count, other.mean, other.m2, other.m3, other.m4)
+            self.min = float(np.fmin(self.min, other.min))
+            self.max = float(np.fmax(self.max, other.max))
+        self.sketch.merge(other.sketch)
+
+    def _merge_moments(self, nb, mb, m2b, m3b, m4b):
+        na, ma = self.count, self.mean
+        n = na + nb
+        delta = mb - ma
+        d_n = delta / n
+
+        m2a, m3a, m4a = self.m2, self.m3, self.m4
+        self.mean = ma + nb * d_n
+        self.m2 = m2a + m2b + delta * d_n * na * nb
+        self.m3 = (
+            m3a + m3b
+            + delta * d_n * d_n * na * nb * (na - nb)
+            + 3.0 * d_n * (na * m2b - nb * m2a)
+        )
+        self.m4 = (
+            m4a + m4b
+            + delta * d_n ** 3 * na * nb * (na * na - na * nb + nb * nb)
+            + 6.0 * d_n * d_n * (na * na * m2b + nb * nb * m2a)
+            + 4.0 * d_n * (na * m3b - nb * m3a)
+        )
+        self.count = n
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else float("nan")
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.variance))
+
+    @property
+    def skewness(self):
+        return float(sample_skewness(self.count, self.m2, self.m3))
+
+    @property
+    def kurtosis(self):
+        return float(sample_kurtosis(self.count, self.m2, self.m4))
+
+    def quantiles(self, qs):
+        return self.sketch.quantiles(qs)
+
+    def outliers(self):
+        """Approximate count of values outside the 1.5 * IQR fences."""
+        if self.count == 0:
+            return 0
+        q1, q3 = self.quantiles([0.25, 0.75])
+        iqr = q3 - q1
+        below = self.sketch.rank(np.nextafter(q1 - 1.5 * iqr, -np.inf))
+        above = self.count - self.sketch.rank(q3 + 1.5 * iqr)
+        return int(round(below + max(above, 0)))
+
+
+class CategoricalAccumulator:
+    def __init__(self, capacity: int = 1000, distinct_k: int = 2048):
+        self.count = 0
+        self.nulls = 0
+        self.heavy = HeavyHitters(capacity)
+        self.distinct = DistinctSketch(distinct_k)
+
+    def update(self, values: pd.Series):
+        counts = values.value_counts(dropna=True)
+        self.nulls += int(values.isna().sum())
+        self.count += int(counts.sum())
+        self.heavy.update(counts)
+        self.distinct.update(column_hashes(counts.index.to_series()))
+
+    def merge(self, other: "CategoricalAccumulator"):
+        self.count += other.count
+        self.nulls += other.nulls
+        self.heavy.merge(other.heavy)
+        self.distinct.merge(other.distinct)
+
+    @property
+    def unique_values(self):
+        return self.distinct.estimate()
+
+    def top(self, n: int = 5) -> pd.Series:
+        return self.heavy.top(n)
+
+
+# =======================================================
+# PAIRWISE CO-MOMENTS (pairwise-complete correlation)
+# =======================================================
+class CoMomentAccumulator:
+    def __init__(self, columns):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.shift = None
+        self.n = np.zeros((p, p))
+        self.sx = np.zeros((p, p))
+        self.sxx = np.zeros((p, p))
+        self.sxy = np.zeros((p, p))
+
+    def update(self, values: np.ndarray):
+        present = ~np.isnan(values)
+        if self.shift is None:
+            with warnings.catch_warnings():
+                # Columns with no values yet shift by 0
+                warnings.simplefilter("ignore", RuntimeWarning)
+                self.shift = np.nan_to_num(np.nanmean(values, axis=0))
+        x = np.where(present, values - self.shift, 0.0)
+        m = present.astype(float)
+        self.n += m.T @ m
+        self.sx += x.T @ m
+        self.sxx += (x * x).T @ m
+        self.sxy += x.T @ x
+
+    def merge(self, other: "CoMomentAccumulator"):
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge co-moments over different numeric columns")
+        if other.shift is None:
+            return
+        if self.shift is None:
+            self.shift = other.shift
+        c = other.shift - self.shift
+        ci, cj = c[:, None], c[None, :]
+        self.n += other.n
+        self.sx += other.sx + ci * other.n
+        self.sxx += other.sxx + 2 * ci * other.sx + ci * ci * other.n
+        self.sxy += other.sxy + cj * other.sx + ci * other.sx.T + ci * cj * other.n
+
+    def drop(self, column):
+        """Forget a column (exact only while it has no observed values)."""
+        i = self.columns.index(column)
+        del self.columns[i]
+        for name in ("n", "sx", "sxx", "sxy"):
+            setattr(self, name, np.delete(np.delete(getattr(self, name), i, axis=0), i, axis=1))
+        if self.shift is not None:
+            self.shift = np.delete(self.shift, i)
+
+    def correlation(self) -> pd.DataFrame:
+        n, sx, sy = self.n, self.sx, self.sx.T
+        with np.errstate(all="ignore"):
+            num = n * self.sxy - sx * sy
+            den = np.sqrt((n * self.sxx - sx * sx) * (n * self.sxx.T - sy * sy))
+            corr = np.clip(num / den, -1.0, 1.0)
+        corr[n < 2] = np.nan
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+# =======================================================
+# BOUNDED ROW SAMPLE (bottom-k random keys, mergeable)
+# =======================================================
+class RowSampler:
+    def __init__(self, size: int = 50_000, seed: int = 42):
+        self.size = size
+        self._rng = np.random.default_rng(seed)
+        self.frame = None
+        self.keys = np.empty(0)
+
+    def update(self, chunk: pd.DataFrame):
+        self._combine(chunk, self._rng.random(len(chunk)))
+
+    def merge(self, other: "RowSampler"):
+        if other.frame is not None:
+            self._combine(other.frame, other.keys)
+
+    def _combine(self, frame, keys):
+        if self.frame is not None:
+            frame = pd.concat([self.frame, frame], ignore_index=True)
+            keys = np.concatenate([self.keys, keys])
+        if len(keys) > self.size:
+            keep = np.sort(np.argpartition(keys, self.size)[: self.size])
+            frame, keys = frame.iloc[keep], keys[keep]
+        self.frame = frame.reset_index(drop=True)
+        self.keys = keys
+
+
+# =======================================================
+# DATASET PROFILE
+# =======================================================
+class DatasetProfile:
+    """One-pass, mergeable profile of a CSV read in chunks."""
+
+    STATE_VERSION = 1
+
+    def __init__(self, sample_size: int = 50_000):
+        self.num_rows = 0
+        self.memory_usage = 0
+        self.columns = []
+        self.dtypes = {}
+        self.null_counts = {}
+        self.numeric = {}
+        self.categorical = {}
+        self.co_moments = None
+        self.sampler = RowSampler(sample_size)
+        # Columns that have only held nulls so far: read as float, but their
+        # kind is decided by the first chunk with a value
+        self.unresolved = set()
+        # Append mode: content digest -> {"path", "rows"} of every batch merged in
+        self.batches = {}
+
+    def update(self, chunk: pd.DataFrame):
+        if not self.columns:
+            self._init_schema(chunk)
+
+        for col in chunk.columns:
+            if col not in self.dtypes:
+                raise ValueError(f"Column '{col}' not present in the first chunk")
+            if col in self.unresolved and chunk[col].notna().any():
+                self._resolve(col, chunk[col])
+            dtype = str(chunk[col].dtype)
+            if dtype != self.dtypes[col]:
+                both_numeric = col in self.numeric and pd.api.types.is_numeric_dtype(chunk[col])
+                self.dtypes[col] = "float64" if both_numeric else "object"
+
+        self.num_rows += len(chunk)
+        self.memory_usage += int(chunk.memory_usage(deep=True).sum())
+        for col, nulls in chunk.isna().sum().items():
+            self.null_counts[col] += int(nulls)
+
+        numeric_cols = list(self.numeric)
+        if numeric_cols:
+            values = chunk[numeric_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+            for i, col in enumerate(numeric_cols):
+                self.numeric[col].update(values[:, i])
+            self.co_moments.update(values)
+
+        for col, acc in self.categorical.items():
+            acc.update(chunk[col])
+
+        self.sampler.update(chunk)
+
+    def _init_schema(self, chunk: pd.DataFrame):
+        self.columns = list(chunk.columns)
+        self.dtypes = chunk.dtypes.astype(str).to_dict()
+        self.null_counts = {col: 0 for col in self.columns}
+        numeric_cols = chunk.select_dtypes(include="number").columns.tolist()
+        categorical_cols = chunk.select_dtypes(include=["object", "str", "category"]).columns.tolist()
+        self.numeric = {col: NumericAccumulator() for col in numeric_cols}
+        self.categorical = {col: CategoricalAccumulator() for col in categorical_cols}
+        self.co_moments = CoMomentAccumulator(numeric_cols)
+        self.unresolved = {col for col in numeric_cols if chunk[col].isna().all()}
+
+    def _resolve(self, col, values: pd.Series):
+        """Settle the kind of an all-null-so-far column from its first values."""
+        self.unresolved.discard(col)
+        if pd.api.types.is_numeric_dtype(values):
+            return
+        self._make_categorical(col)
+        self.dtypes[col] = str(values.dtype)
+
+    def _make_categorical(self, col):
+        nulls = self.numeric.pop(col).nulls
+        self.co_moments.drop(col)
+        self.categorical[col] = CategoricalAccumulator()
+        self.categorical[col].nulls = nulls
+        self.unresolved.discard(col)
+
+    def merge(self, other: "DatasetProfile"):
+        if not other.columns:
+            return
+        if not self.columns:
+            self.columns = list(other.columns)
+            self.dtypes = dict(other.dtypes)
+            self.null_counts = {col: 0 for col in self.columns}
+            self.numeric = {col: NumericAccumulator() for col in other.numeric}
+            self.categorical = {col: CategoricalAccumulator() for col in other.categorical}
+            self.co_moments = CoMomentAccumulator(other.co_moments.columns)
+            self.unresolved = set(other.unresolved)
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge profiles with different columns")
+
+        # A column that only held nulls on one side takes the other side's kind
+        for col in self.unresolved & set(other.categorical):
+            self._make_categorical(col)
+            self.dtypes[col] = other.dtypes[col]
+        pending = other.unresolved & set(self.categorical)
+        if pending:
+            other = copy.deepcopy(other)
+            for col in pending:
+                other._make_categorical(col)
+                other.dtypes[col] = self.dtypes[col]
+        self.unresolved &= other.unresolved
+        overlap = set(self.batches) & set(other.batches)
+        if overlap:
+            raise ValueError(f"Cannot merge profiles that both contain batch(es) {sorted(overlap)}")
+        self.batches.update(other.batches)
+
+        self.num_rows += other.num_rows
+        self.memory_usage += other.memory_usage
+        for col in self.columns:
+            self.null_counts[col] += other.null_counts[col]
+            if other.dtypes[col] != self.dtypes[col]:
+                self.dtypes[col] = "object"
+        for col, acc in self.numeric.items():
+            acc.merge(other.numeric[col])
+        for col, acc in self.categorical.items():
+            acc.merge(other.categorical[col])
+        self.co_moments.merge(other.co_moments)
+        self.sampler.merge(other.sampler)
+
+    def numeric_summary(self) -> pd.DataFrame:
+        """Same layout as utils.stats_kernel.numeric_summary."""
+        rows = {}
+        for col, acc in self.numeric.items():
+            q1, median, q3 = acc.quantiles([0.25, 0.5, 0.75])
+            rows[col] = [
+                acc.count, acc.mean if acc.count else np.nan, acc.std, acc.min,
+                q1, median, q3, acc.max, acc.skewness, acc.kurtosis, acc.outliers(),
+            ]
+        return pd.DataFrame.from_dict(rows, orient="index", columns=NUMERIC_STATS, dtype=float)
+
+    @property
+    def sample(self) -> pd.DataFrame | None:
+        return self.sampler.frame
+
+    # -----------------------------------------
+    # Persistence (append-aware EDA state)
+    # -----------------------------------------
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": self.STATE_VERSION, "profile": self}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path) -> "DatasetProfile":
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != cls.STATE_VERSION:
+            raise ValueError(f"Unsupported profile state version in {path}")
+        profile = state["profile"]
+        # States saved before these fields existed
+        profile.__dict__.setdefault("unresolved", set())
+        profile.__dict__.setdefault("batches", {})
+        return profile
@@ -0,0 +1,95 @@
+import datetime
+import json
+import os
+import shutil
+import time
+import uuid
+
+from utils.disk_cache import touch
+
+
+class RunWorkspace:
+    """Per-run directory tree (runs/<run_id>/{data,plots,reports}).
+
+    It also carries the run's file-based control channel (progress.json and a
+    CANCEL marker), which works the same whether the pipeline runs in a thread
+    or in a worker process.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.run_id = os.path.basename(os.path.normpath(root))
+        self.data_dir = os.path.join(root, "data")
+        self.plots_dir = os.path.join(root, "plots")
+        self.reports_dir = os.path.join(root, "reports")
+        self.progress_path = os.path.join(root, "progress.json")
+        self.cancel_path = os.path.join(root, "CANCEL")
+        self.live_insights_path = os.path.join(root, "llm_insights.partial.md")
+
+    @classmethod
+    def create(cls, base_dir: str = "runs"):
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        workspace = cls(os.path.join(base_dir, f"{timestamp}_{uuid.uuid4().hex[:8]}"))
+        for directory in (workspace.data_dir, workspace.plots_dir, workspace.reports_dir):
+            os.makedirs(directory, exist_ok=True)
+        return workspace
+
+    def touch(self):
+        """Mark the workspace as in use (prune_workspaces goes by its mtime);
+        False when it no longer exists."""
+        try:
+            touch(self.root)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def save_upload(self, data: bytes, filename: str = "uploaded.csv"):
+        path = os.path.join(self.data_dir, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    # ---------------- progress ----------------
+    def write_progress(self, stages: dict):
+        tmp_path = self.progress_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stages": stages, "updated_at": time.time()}, f)
+        os.replace(tmp_path, self.progress_path)
+
+    def read_progress(self):
+        try:
+            with open(self.progress_path, "r", encoding="utf-8") as f:
+                return json.load(f)["stages"]
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def read_live_insights(self):
+        try:
+            with open(self.live_insights_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return ""
+
+    # ---------------- cancellation ----------------
+    def request_cancel(self):
+        open(self.cancel_path, "w").close()
+
+    def cancel_requested(self):
+        return os.path.exists(self.cancel_path)
+
+
+def prune_workspaces(base_dir: str = "runs", max_age_seconds: float = 24 * 3600, keep=()):
+    """Delete run directories not modified within max_age_seconds (except `keep`).
+
+    Open sessions call RunWorkspace.touch() on every rerun, so only abandoned
+    workspaces age out.
+    """
+    if not os.path.isdir(base_dir):
+        return []
+    cutoff = time.time() - max_age_seconds
+    removed = []
+    for entry in os.scandir(base_dir):
+        if entry.is_dir() and entry.name not in keep and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed.append(entry.path)
+    return removed